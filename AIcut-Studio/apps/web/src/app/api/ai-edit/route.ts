@@ -19,6 +19,9 @@ import { NextRequest, NextResponse } from "next/server";
 import fs from "fs";
 import path from "path";
 import os from "os";
+import { spawn } from "child_process";
+import { decodeSnapshot } from "@/lib/element-defaults";
+import { SNAPSHOT_FILE, hasSnapshot, readSnapshot, readSnapshotContent, removeSnapshot, snapshotMtime, writeSnapshot } from "@/lib/snapshot-store";
 
 // File-based storage for AI edits (cross-process communication)
 // Resolve the edits directory to a folder named '.aicut' at the workspace root
@@ -28,10 +31,11 @@ const WORKSPACE_ROOT = path.join(process.cwd(), "../../../");
 const EDITS_DIR = path.join(WORKSPACE_ROOT, "ai_workspace");
 const PROJECTS_DIR = path.join(WORKSPACE_ROOT, "projects");
 const HISTORY_DIR = path.join(EDITS_DIR, "history");
-const SNAPSHOT_FILE = path.join(EDITS_DIR, "project-snapshot.json");
 const PENDING_EDITS_FILE = path.join(EDITS_DIR, "pending-edits.json");
 const SYNC_FILE = path.join(EDITS_DIR, "sync-input.json");
-const MAX_HISTORY = 20;
+const HISTORY_SCRIPT = path.join(WORKSPACE_ROOT, "tools", "core", "snapshot_history.py");
+// Minimum spacing between history backups (AICUT_HISTORY_INTERVAL_MS=0 backs up every update)
+const HISTORY_INTERVAL_MS = Number(process.env.AICUT_HISTORY_INTERVAL_MS ?? 10000);
 const PROJECT_ID_MAP_FILE = path.join(PROJECTS_DIR, "projectIdMap.json");
 
 // Helper: Load/Save Project ID Map (Folder Name -> Internal ID)
@@ -84,16 +88,55 @@ function findProjectFolder(idOrName: string): string | null {
 });
 
 // Helper: Backup current snapshot to history
-function backupSnapshot() {
-    if (!fs.existsSync(SNAPSHOT_FILE)) return;
-    const timestamp = new Date().toISOString().replace(/[:.]/g, "-").slice(0, 19);
-    const backupPath = path.join(HISTORY_DIR, `snapshot_${timestamp}.json`);
-    fs.copyFileSync(SNAPSHOT_FILE, backupPath);
-    // Cleanup old versions
-    const files = fs.readdirSync(HISTORY_DIR)
-        .filter(f => f.startsWith("snapshot_") && f.endsWith(".json"))
-        .sort().reverse();
-    files.slice(MAX_HISTORY).forEach(f => fs.unlinkSync(path.join(HISTORY_DIR, f)));
+// Backups are coalesced: at most one per HISTORY_INTERVAL_MS (leading edge keeps the
+// state before the burst, one trailing backup keeps the state after it). Project
+// switch/archive force an immediate backup. The content is read synchronously and
+// handed to tools/core/snapshot_history.py, which stores it as a keyframe or a
+// compressed element-level delta; the writes run one at a time, off the request path.
+let historyQueue: Promise<void> = Promise.resolve();
+let lastBackupAt = 0;
+let trailingBackup: ReturnType<typeof setTimeout> | null = null;
+
+function writeBackup(content: Buffer) {
+    historyQueue = historyQueue.then(() => new Promise<void>((resolve) => {
+        const child = spawn("python", [HISTORY_SCRIPT, "backup", "-"], { stdio: ["pipe", "ignore", "pipe"] });
+        let errorLog = "";
+        child.stderr.on("data", (d) => { errorLog += d.toString(); });
+        child.on("close", (code) => {
+            if (code !== 0) console.error(`[History] Backup failed (${code}): ${errorLog.slice(-200)}`);
+            resolve();
+        });
+        child.on("error", (err) => {
+            console.error("[History] Backup failed:", err);
+            resolve();
+        });
+        child.stdin.on("error", () => { });
+        child.stdin.end(content);
+    }));
+}
+
+function backupSnapshot(options: { force?: boolean } = {}) {
+    if (!hasSnapshot()) return;
+    const now = Date.now();
+    if (options.force || now - lastBackupAt >= HISTORY_INTERVAL_MS) {
+        if (trailingBackup) {
+            clearTimeout(trailingBackup);
+            trailingBackup = null;
+        }
+        lastBackupAt = now;
+        const content = readSnapshotContent();
+        if (content) writeBackup(content);
+        return;
+    }
+    // Inside the window: back up whatever is current once the window closes
+    if (!trailingBackup) {
+        trailingBackup = setTimeout(() => {
+            trailingBackup = null;
+            lastBackupAt = Date.now();
+            const content = readSnapshotContent();
+            if (content) writeBackup(content);
+        }, lastBackupAt + HISTORY_INTERVAL_MS - now);
+    }
 }
 
 // Helper: Determine which snapshot is newer (Workspace vs Archive)
@@ -105,15 +148,14 @@ function getNewestSnapshotPath(projectId: string): { path: string; isWorkspace:
         return { path: SNAPSHOT_FILE, isWorkspace: true, folderName: null };
     }
 
-    if (fs.existsSync(SNAPSHOT_FILE)) {
+    if (hasSnapshot()) {
         try {
-            const workspaceContent = fs.readFileSync(SNAPSHOT_FILE, "utf-8");
-            const workspaceSnapshot = JSON.parse(workspaceContent);
+            const workspaceSnapshot = readSnapshot();
             if (workspaceSnapshot?.project?.id === projectId) {
-                const statWorkspace = fs.statSync(SNAPSHOT_FILE);
+                const workspaceMtime = snapshotMtime();
                 const statArchive = fs.statSync(archivePath);
                 // Compare modification times
-                if (statWorkspace.mtime > statArchive.mtime) {
+                if (workspaceMtime && workspaceMtime > statArchive.mtime) {
                     return { path: SNAPSHOT_FILE, isWorkspace: true };
                 }
             }
@@ -126,14 +168,16 @@ function getNewestSnapshotPath(projectId: string): { path: string; isWorkspace:
 
 // Helper: Archive workspace to project folder
 function archiveToProject(idOrName: string) {
-    if (!fs.existsSync(SNAPSHOT_FILE)) return false;
+    if (!hasSnapshot()) return false;
+    backupSnapshot({ force: true });
 
     let internalId = idOrName;
     let folderName = idOrName;
     let displayName = idOrName;
+    let snapshot: any = null;
 
     try {
-        const snapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+        snapshot = readSnapshot();
         internalId = snapshot?.project?.id || idOrName;
 
         // Safety check: Don't archive deleted or temp projects
@@ -177,7 +221,11 @@ function archiveToProject(idOrName: string) {
     saveToIdMap(folderName, internalId);
 
     // 5. Save snapshot
-    fs.copyFileSync(SNAPSHOT_FILE, path.join(projectDir, "snapshot.json"));
+    if (snapshot) {
+        fs.writeFileSync(path.join(projectDir, "snapshot.json"), JSON.stringify(snapshot, null, 2));
+    } else if (fs.existsSync(SNAPSHOT_FILE)) {
+        fs.copyFileSync(SNAPSHOT_FILE, path.join(projectDir, "snapshot.json"));
+    }
     console.log(`[Archive] Saved workspace to projects/${folderName}/snapshot.json (ID: ${internalId})`);
     return true;
 }
@@ -186,7 +234,7 @@ function archiveToProject(idOrName: string) {
 function loadProjectToWorkspace(projectId: string) {
     const { path: newestPath, isWorkspace, folderName } = getNewestSnapshotPath(projectId);
 
-    if (!fs.existsSync(newestPath)) {
+    if (newestPath === SNAPSHOT_FILE ? !hasSnapshot() : !fs.existsSync(newestPath)) {
         console.log(`[Load] Project ${projectId} not found anywhere`);
         return false;
     }
@@ -200,9 +248,9 @@ function loadProjectToWorkspace(projectId: string) {
     }
 
     // Backup current workspace first
-    backupSnapshot();
+    backupSnapshot({ force: true });
     // Copy project snapshot to workspace
-    fs.copyFileSync(newestPath, SNAPSHOT_FILE);
+    writeSnapshot(JSON.parse(fs.readFileSync(newestPath, "utf-8")));
 
     // Switch materials link to this project
     const targetFolder = folderName || projectId;
@@ -324,8 +372,10 @@ export async function GET(request: NextRequest) {
                     snapshotPath = newestPath;
                 }
 
-                if (fs.existsSync(snapshotPath)) {
-                    const snapshot = JSON.parse(fs.readFileSync(snapshotPath, "utf-8"));
+                const snapshot = snapshotPath === SNAPSHOT_FILE
+                    ? readSnapshot()
+                    : (fs.existsSync(snapshotPath) ? decodeSnapshot(JSON.parse(fs.readFileSync(snapshotPath, "utf-8"))) : null);
+                if (snapshot) {
                     return NextResponse.json({ success: true, snapshot });
                 }
             } catch (e) {
@@ -568,11 +618,9 @@ export async function POST(request: NextRequest) {
                     backupSnapshot();
 
                     let currentSnapshot: any = {};
-                    if (fs.existsSync(SNAPSHOT_FILE)) {
-                        try {
-                            currentSnapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
-                        } catch (e) { /* ignore corrupt */ }
-                    }
+                    try {
+                        currentSnapshot = readSnapshot() || {};
+                    } catch (e) { /* ignore corrupt */ }
 
                     // Merge incoming data (Project & Tracks) with existing Assets
                     const mergedData = {
@@ -588,7 +636,7 @@ export async function POST(request: NextRequest) {
                         assets: data.assets || currentSnapshot.assets || []
                     };
 
-                    fs.writeFileSync(SNAPSHOT_FILE, JSON.stringify(mergedData, null, 2));
+                    writeSnapshot(mergedData);
                     return NextResponse.json({ success: true });
                 } catch (e) {
                     return NextResponse.json({ success: false, error: "Failed to save snapshot" }, { status: 500 });
@@ -612,12 +660,10 @@ export async function POST(request: NextRequest) {
             case "saveSnapshot": {
                 // Save project and tracks to workspace snapshot
                 try {
-                    let existingSnapshot = {};
-                    if (fs.existsSync(SNAPSHOT_FILE)) {
-                        try {
-                            existingSnapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
-                        } catch (e) { }
-                    }
+                    let existingSnapshot: any = {};
+                    try {
+                        existingSnapshot = readSnapshot() || {};
+                    } catch (e) { }
 
                     const newSnapshot = {
                         ...existingSnapshot,
@@ -625,7 +671,7 @@ export async function POST(request: NextRequest) {
                         tracks: data?.tracks || existingSnapshot.tracks,
                     };
 
-                    fs.writeFileSync(SNAPSHOT_FILE, JSON.stringify(newSnapshot, null, 2));
+                    writeSnapshot(newSnapshot);
                     console.log(`[API] Saved snapshot for project ${data?.project?.name || 'unknown'}`);
                     return NextResponse.json({ success: true, message: "Snapshot saved" });
                 } catch (e) {
@@ -640,7 +686,7 @@ export async function POST(request: NextRequest) {
                 if (!projectId) {
                     // Try to get projectId from current snapshot
                     try {
-                        const snapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+                        const snapshot = readSnapshot();
                         const id = snapshot?.project?.id;
                         if (id) {
                             archiveToProject(id);
@@ -666,7 +712,7 @@ export async function POST(request: NextRequest) {
 
                 // 1. Archive current project (if any)
                 try {
-                    const currentSnapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+                    const currentSnapshot = readSnapshot();
                     const currentId = currentSnapshot?.project?.id;
                     // Only archive if it's a valid, non-deleted project and different from new one
                     if (currentId && currentId !== newProjectId && !currentId.startsWith("deleted_")) {
@@ -712,8 +758,8 @@ export async function POST(request: NextRequest) {
                     };
 
                     try {
-                        backupSnapshot();
-                        fs.writeFileSync(SNAPSHOT_FILE, JSON.stringify(newSnapshot, null, 2));
+                        backupSnapshot({ force: true });
+                        writeSnapshot(newSnapshot);
                         // Immediately archive it to create the folder structure on disk
                         archiveToProject(newProjectId);
                         // Also switch materials link to the new folder
@@ -775,11 +821,11 @@ export async function POST(request: NextRequest) {
 
                         // CRITICAL: Check and reset workspace snapshot if it matches the deleted project
                         try {
-                            if (fs.existsSync(SNAPSHOT_FILE)) {
-                                const currentSnapshot = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+                            if (hasSnapshot()) {
+                                const currentSnapshot = readSnapshot();
                                 if (currentSnapshot?.project?.id === projectId) {
                                     console.log(`[Delete] Removing workspace snapshot as it matched deleted project ${projectId}`);
-                                    fs.unlinkSync(SNAPSHOT_FILE);
+                                    removeSnapshot();
                                 }
                             }
                         } catch (e) {
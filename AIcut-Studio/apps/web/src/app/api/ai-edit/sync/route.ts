@@ -2,10 +2,37 @@ import { NextRequest, NextResponse } from "next/server";
 import fs from "fs";
 import path from "path";
 import os from "os";
+import { decodeSnapshot } from "@/lib/element-defaults";
+import { EDITS_DIR, MANIFEST_FILE, SHARD_DIR, SnapshotManifest, readManifest, readShard, readSnapshot, readTrackShard } from "@/lib/snapshot-store";
 
-const EDITS_DIR = path.resolve(process.cwd(), "../../..", "ai_workspace");
 const SYNC_FILE = path.join(EDITS_DIR, "sync-input.json");
 
+/**
+ * Compare two shard manifests and collect only the shards that changed.
+ * Returns null when nothing changed.
+ */
+function buildShardPatch(previous: SnapshotManifest | null, current: SnapshotManifest) {
+    const patch: any = { trackOrder: current.tracks.map((entry) => entry.id), tracks: {} };
+    let changed = !previous || previous.tracks.map((entry) => entry.id).join("\u0000") !== patch.trackOrder.join("\u0000");
+
+    if (!previous || previous.meta.hash !== current.meta.hash) {
+        patch.meta = decodeSnapshot(readShard(current.meta));
+        changed = true;
+    }
+    if (!previous || previous.assets.hash !== current.assets.hash) {
+        patch.assets = readShard(current.assets);
+        changed = true;
+    }
+    const previousHashes = new Map((previous?.tracks || []).map((entry) => [entry.id, entry.hash]));
+    for (const entry of current.tracks) {
+        if (previousHashes.get(entry.id) !== entry.hash) {
+            patch.tracks[entry.id] = readTrackShard(current, entry);
+            changed = true;
+        }
+    }
+    return changed ? patch : null;
+}
+
 /**
  * SSE 实时同步接口 - 实现“监控文件，自动热更新时间轴”
  */
@@ -23,18 +50,16 @@ export async function GET(req: NextRequest) {
             controller.enqueue(encoder.encode("event: connected\ndata: { \"status\": \"ready\" }\n\n"));
 
             // --- NEW: 发送初始快照 (初始全量同步) ---
-            const SNAPSHOT_FILE = path.join(EDITS_DIR, "project-snapshot.json");
-            if (fs.existsSync(SNAPSHOT_FILE)) {
-                try {
-                    const content = fs.readFileSync(SNAPSHOT_FILE, "utf-8");
-                    if (content.trim()) {
-                        const data = JSON.parse(content);
-                        console.log("[SSE] Sending initial project snapshot to new client...");
-                        controller.enqueue(encoder.encode(`event: snapshot_update\ndata: ${JSON.stringify(data)}\n\n`));
-                    }
-                } catch (e) {
-                    console.error("[SSE] Failed to send initial snapshot:", e);
+            // 分片布局下记录本连接已推送的 manifest，之后只推送变化的分片
+            let lastManifest: SnapshotManifest | null = readManifest();
+            try {
+                const data = readSnapshot();
+                if (data) {
+                    console.log("[SSE] Sending initial project snapshot to new client...");
+                    controller.enqueue(encoder.encode(`event: snapshot_update\ndata: ${JSON.stringify(data)}\n\n`));
                 }
+            } catch (e) {
+                console.error("[SSE] Failed to send initial snapshot:", e);
             }
 
             // --- 核心逻辑：监听文件系统 ---
@@ -66,7 +91,7 @@ export async function GET(req: NextRequest) {
                             const content = fs.readFileSync(targetFile, "utf-8");
                             if (!content.trim()) return;
 
-                            const data = JSON.parse(content);
+                            const data = isSnapshotFile ? decodeSnapshot(JSON.parse(content)) : JSON.parse(content);
 
                             if (isSnapshotFile) {
                                 // project-snapshot.json changed (external edit)
@@ -100,9 +125,30 @@ export async function GET(req: NextRequest) {
                 }
             });
 
+            // --- 分片布局：manifest 最后写入，变化时只推送哈希改变的分片 ---
+            if (!fs.existsSync(SHARD_DIR)) {
+                fs.mkdirSync(SHARD_DIR, { recursive: true });
+            }
+            const shardWatcher = fs.watch(SHARD_DIR, (eventType, filename) => {
+                if (filename !== path.basename(MANIFEST_FILE)) return;
+                try {
+                    const manifest = readManifest();
+                    if (!manifest) return;
+                    const patch = buildShardPatch(lastManifest, manifest);
+                    lastManifest = manifest;
+                    if (patch) {
+                        console.log(`[SSE] Snapshot shards changed (${Object.keys(patch.tracks).length} tracks), pushing to Web...`);
+                        controller.enqueue(encoder.encode(`event: snapshot_shards\ndata: ${JSON.stringify(patch)}\n\n`));
+                    }
+                } catch (e) {
+                    // 忽略读取时的瞬时错误（如分片正在被写入）
+                }
+            });
+
             // 当连接关闭时，停止监听
             req.signal.addEventListener("abort", () => {
                 watcher.close();
+                shardWatcher.close();
                 controller.close();
                 console.log("[SSE] Client disconnected, watcher closed.");
             });
@@ -2,6 +2,7 @@ import { NextResponse } from 'next/server';
 import path from 'path';
 import fs from 'fs';
 import { spawn } from 'child_process';
+import { readSnapshotProject } from '@/lib/snapshot-store';
 
 export async function POST(request: Request) {
     try {
@@ -19,11 +20,10 @@ export async function POST(request: Request) {
             // Attempt to find the project root and read snapshot
             // We assume workspace root is 3 levels up from apps/web (f:\桌面\开发\AIcut)
             const workspaceRoot = path.resolve(process.cwd(), '../../../');
-            const snapshotPath = path.join(workspaceRoot, 'ai_workspace', 'project-snapshot.json');
+            const project = readSnapshotProject();
 
-            if (fs.existsSync(snapshotPath)) {
-                const snapshot = JSON.parse(fs.readFileSync(snapshotPath, 'utf-8'));
-                const projectId = snapshot.project?.id;
+            if (project) {
+                const projectId = project.id;
 
                 if (projectId) {
                     outputDir = path.join(workspaceRoot, 'projects', projectId, 'assets', 'images');
@@ -2,10 +2,10 @@ import { NextRequest, NextResponse } from "next/server";
 import fs from "fs";
 import path from "path";
 import mime from "mime"; // Need to check if 'mime' package is available or just use simple map
+import { readSnapshotProject } from "@/lib/snapshot-store";
 
 const WORKSPACE_ROOT = path.join(process.cwd(), "../../../");
 const PROJECTS_DIR = path.join(WORKSPACE_ROOT, "projects");
-const SNAPSHOT_FILE = path.join(WORKSPACE_ROOT, "ai_workspace", "project-snapshot.json");
 
 function getMimeType(filePath: string): string {
     const ext = path.extname(filePath).toLowerCase();
@@ -43,14 +43,12 @@ export async function GET(
             "demo"; // fallback
 
         // Try reading snapshot
-        if (fs.existsSync(SNAPSHOT_FILE)) {
-            try {
-                const data = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
-                if (data.project?.id) {
-                    projectId = data.project.id;
-                }
-            } catch { }
-        }
+        try {
+            const project = readSnapshotProject();
+            if (project?.id) {
+                projectId = project.id;
+            }
+        } catch { }
 
         // Construct Path: projects/<id>/assets/<...slug>
         const filePath = path.join(PROJECTS_DIR, projectId, "assets", ...assetPathParts);
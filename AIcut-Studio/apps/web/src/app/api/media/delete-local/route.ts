@@ -1,18 +1,18 @@
 import { NextRequest, NextResponse } from "next/server";
 import * as fs from "fs";
 import * as path from "path";
+import { hasSnapshot, readSnapshot, readSnapshotProject, writeSnapshot } from "@/lib/snapshot-store";
 
 // --- Path Configuration ---
 const WORKSPACE_ROOT = path.resolve(process.cwd(), "../../..");
 const PROJECTS_DIR = path.join(WORKSPACE_ROOT, "projects");
-const SNAPSHOT_FILE = path.join(WORKSPACE_ROOT, "ai_workspace", "project-snapshot.json");
 
 // Helper: Get current project ID from snapshot
 function getCurrentProjectId(): string {
     try {
-        if (fs.existsSync(SNAPSHOT_FILE)) {
-            const data = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
-            return data.project?.id || "demo";
+        const project = readSnapshotProject();
+        if (project) {
+            return project.id || "demo";
         }
     } catch (e) { }
     return "demo";
@@ -52,11 +52,11 @@ export async function DELETE(req: NextRequest) {
             return NextResponse.json({ error: "Missing asset id" }, { status: 400 });
         }
 
-        if (!fs.existsSync(SNAPSHOT_FILE)) {
+        if (!hasSnapshot()) {
             return NextResponse.json({ error: "Snapshot file not found" }, { status: 404 });
         }
 
-        const data = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+        const data = readSnapshot();
 
         if (!data.assets) {
             return NextResponse.json({ error: "No assets in snapshot" }, { status: 404 });
@@ -117,7 +117,7 @@ export async function DELETE(req: NextRequest) {
             });
         }
 
-        fs.writeFileSync(SNAPSHOT_FILE, JSON.stringify(data, null, 2));
+        writeSnapshot(data);
         console.log(`[Delete API] Successfully deleted asset ${id} (linked: ${isLinked})`);
 
         // Archive to project directory for persistence
@@ -1,18 +1,19 @@
 import { NextRequest, NextResponse } from "next/server";
 import * as fs from "fs";
 import * as path from "path";
+import { assetIdFor } from "@/lib/asset-id";
+import { hasSnapshot, readSnapshot, readSnapshotProject, writeSnapshot } from "@/lib/snapshot-store";
 
 // --- Path Configuration ---
 const WORKSPACE_ROOT = path.resolve(process.cwd(), "../../..");
 const PROJECTS_DIR = path.join(WORKSPACE_ROOT, "projects");
-const SNAPSHOT_FILE = path.join(WORKSPACE_ROOT, "ai_workspace", "project-snapshot.json");
 
 // Helper: Get current project ID from snapshot
 function getCurrentProjectId(): string {
     try {
-        if (fs.existsSync(SNAPSHOT_FILE)) {
-            const data = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
-            return data.project?.id || "demo";
+        const project = readSnapshotProject();
+        if (project) {
+            return project.id || "demo";
         }
     } catch (e) { }
     return "demo";
@@ -39,7 +40,6 @@ export async function POST(req: NextRequest) {
         const projectId = getCurrentProjectId();
         // Use originalPath filename if available, otherwise use file.name
         const fileName = originalPath ? path.basename(originalPath) : file.name;
-        const assetId = `asset_${Date.now().toString().slice(-6)}`;
 
         // Determine media type from MIME type or file extension
         const ext = path.extname(fileName).toLowerCase();
@@ -82,6 +82,9 @@ export async function POST(req: NextRequest) {
             console.log(`[Upload API] Linking file from: ${absolutePath}`);
         }
 
+        // Same sampled content fingerprint as the Python SDK / reconcile tools
+        let assetId = assetIdFor(absolutePath);
+
         // Handle thumbnail - save to project thumbnails folder
         let thumbnailUrl: string | undefined;
         const thumbnailsDir = getThumbnailsDir(projectId);
@@ -103,8 +106,8 @@ export async function POST(req: NextRequest) {
         const mediaUrl = `/api/media/serve?path=${encodeURIComponent(absolutePath)}`;
 
         // Update Snapshot (Add asset)
-        if (fs.existsSync(SNAPSHOT_FILE)) {
-            const data = JSON.parse(fs.readFileSync(SNAPSHOT_FILE, "utf-8"));
+        if (hasSnapshot()) {
+            const data = readSnapshot();
 
             const newAsset: any = {
                 id: assetId,
@@ -119,18 +122,20 @@ export async function POST(req: NextRequest) {
             if (height) newAsset.height = height;
             if (duration) newAsset.duration = duration;
 
-            // Check for duplicates by name (same file might be added multiple times)
+            // Check for duplicates by content id or path (same file might be added multiple times)
             if (!data.assets) data.assets = [];
-            const existingIndex = data.assets.findIndex((a: any) => a.name === newAsset.name);
+            const existingIndex = data.assets.findIndex((a: any) => a.id === assetId || a.filePath === absolutePath);
             if (existingIndex >= 0) {
-                data.assets[existingIndex] = { ...data.assets[existingIndex], ...newAsset };
+                // Keep the existing id so timeline elements stay linked
+                assetId = data.assets[existingIndex].id;
+                data.assets[existingIndex] = { ...data.assets[existingIndex], ...newAsset, id: assetId };
                 console.log(`[Upload API] Updated existing asset: ${newAsset.name}`);
             } else {
                 data.assets.push(newAsset);
                 console.log(`[Upload API] Added new asset: ${newAsset.name} (linked: ${!!originalPath})`);
             }
 
-            fs.writeFileSync(SNAPSHOT_FILE, JSON.stringify(data, null, 2));
+            writeSnapshot(data);
 
             // Archive to project directory for persistence
             try {
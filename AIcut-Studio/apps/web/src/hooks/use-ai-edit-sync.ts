@@ -82,10 +82,16 @@ export function useAIEditSync(enabled: boolean = true) {
                     placeholderTracks.forEach(t => store.removeTrack(t.id));
                 }
 
-                // 1. 总是新建一条轨道
-                const targetTrackId = store.addTrack("text");
-                // 重构轨道名称
-                store.updateTrack(targetTrackId, { name: `AI 字幕` });
+                // 1. 指定了 trackName 且同名文本轨道已存在时追加 (分批导入)，否则新建一条轨道
+                const trackName = edit.data.trackName || "AI 字幕";
+                const namedTrack = edit.data.trackName
+                    ? store.tracks.find(t => t.type === "text" && t.name === trackName)
+                    : undefined;
+                const targetTrackId = namedTrack ? namedTrack.id : store.addTrack("text");
+                if (!namedTrack) {
+                    // 重构轨道名称
+                    store.updateTrack(targetTrackId, { name: trackName });
+                }
 
                 if (targetTrackId) {
                     console.log(`[AI Edit] Syncing ${subtitles.length} subtitles to NEW track ${targetTrackId}`);
@@ -489,6 +495,7 @@ export function useAIEditSync(enabled: boolean = true) {
                 const needsUpdate =
                     (remoteAsset.url && existingAsset.url !== remoteAsset.url) ||
                     (remoteAsset.thumbnailUrl && existingAsset.thumbnailUrl !== remoteAsset.thumbnailUrl) ||
+                    (remoteAsset.proxyUrl && existingAsset.proxyUrl !== remoteAsset.proxyUrl) ||
                     (remoteAsset.duration && existingAsset.duration !== remoteAsset.duration);
 
                 if (needsUpdate) {
@@ -712,16 +719,43 @@ export function useAIEditSync(enabled: boolean = true) {
         console.log("[AI Sync] Establishing SSE connection...");
         const eventSource = new EventSource("/api/ai-edit/sync");
 
+        // Last full snapshot received, so shard-level updates can be patched in
+        let lastSnapshot: any = null;
+
         eventSource.addEventListener("snapshot_update", (event) => {
             try {
                 const data = JSON.parse(event.data);
                 console.log("[AI Sync] <SSE> Got full snapshot update");
+                lastSnapshot = data;
                 handleSnapshotData(data);
             } catch (e) {
                 console.error("[AI Sync] Snapshot parse error:", e);
             }
         });
 
+        // Sharded snapshot layout: only changed shards (meta / assets / tracks) are sent
+        eventSource.addEventListener("snapshot_shards", (event) => {
+            try {
+                const patch = JSON.parse(event.data);
+                if (!lastSnapshot && !patch.meta) return;
+                const base = lastSnapshot || {};
+                const previousTracks = new Map((base.tracks || []).map((t: any) => [t.id, t]));
+                const { tracks: _tracks, assets: _assets, ...baseMeta } = base;
+                const next = {
+                    ...(patch.meta ?? baseMeta),
+                    assets: patch.assets ?? base.assets ?? [],
+                    tracks: patch.trackOrder
+                        .map((id: string) => patch.tracks[id] ?? previousTracks.get(id))
+                        .filter(Boolean),
+                };
+                console.log(`[AI Sync] <SSE> Got ${Object.keys(patch.tracks).length} changed track shard(s)`);
+                lastSnapshot = next;
+                handleSnapshotData(next);
+            } catch (e) {
+                console.error("[AI Sync] Snapshot shard parse error:", e);
+            }
+        });
+
         eventSource.addEventListener("update", (event) => {
             try {
                 const data = JSON.parse(event.data);
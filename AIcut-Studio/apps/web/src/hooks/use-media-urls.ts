@@ -11,12 +11,13 @@ export function useMediaUrls(mediaFiles: MediaFile[]) {
 
         // Create URLs for new files
         mediaFiles.forEach((file) => {
-            if (!newUrls[file.id]) {
-                if (file.url) {
-                    // Use existing URL (linked asset)
-                    newUrls[file.id] = file.url;
-                    changed = true;
-                } else if (file.file) {
+            // Linked assets preview from their proxy once one has been generated
+            const linkedUrl = file.proxyUrl || file.url;
+            if (linkedUrl && newUrls[file.id] !== linkedUrl && !newUrls[file.id]?.startsWith("blob:")) {
+                newUrls[file.id] = linkedUrl;
+                changed = true;
+            } else if (!newUrls[file.id]) {
+                if (file.file) {
                     // Create blob URL for uploaded files
                     const url = URL.createObjectURL(file.file);
                     newUrls[file.id] = url;
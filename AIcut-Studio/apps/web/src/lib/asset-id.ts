@@ -0,0 +1,50 @@
+/**
+ * Asset ID - stable asset ids from a sampled content fingerprint.
+ *
+ * The fingerprint covers the file size plus 64 KiB blocks from the head, middle
+ * and tail (files up to 192 KiB are hashed whole), so it costs the same for any
+ * file size and the same file always maps to the same id across imports,
+ * projects and tools.
+ *
+ * Must stay in sync with tools/core/asset_id.py.
+ */
+import fs from "fs";
+import path from "path";
+import crypto from "crypto";
+
+const SCHEME = "aicut-asset-v1";
+const BLOCK_SIZE = 64 * 1024;
+const ID_PREFIX = "asset_";
+const ID_LENGTH = 16;
+
+export function contentFingerprint(filePath: string): string {
+    const size = fs.statSync(filePath).size;
+    const hasher = crypto.createHash("blake2b512").update(SCHEME);
+    const sizeBytes = Buffer.alloc(8);
+    sizeBytes.writeBigUInt64LE(BigInt(size));
+    hasher.update(sizeBytes);
+
+    const fd = fs.openSync(filePath, "r");
+    try {
+        const offsets = size <= 3 * BLOCK_SIZE ? [0] : [0, Math.floor((size - BLOCK_SIZE) / 2), size - BLOCK_SIZE];
+        const length = size <= 3 * BLOCK_SIZE ? size : BLOCK_SIZE;
+        const block = Buffer.alloc(length);
+        for (const offset of offsets) {
+            const read = fs.readSync(fd, block, 0, length, offset);
+            hasher.update(block.subarray(0, read));
+        }
+    } finally {
+        fs.closeSync(fd);
+    }
+    return hasher.digest("hex").slice(0, ID_LENGTH);
+}
+
+/** Asset id for a file; falls back to a digest of the path when the file is missing */
+export function assetIdFor(filePath: string): string {
+    try {
+        return ID_PREFIX + contentFingerprint(filePath);
+    } catch (e) {
+        const digest = crypto.createHash("blake2b512").update(`${SCHEME}|path|${path.resolve(filePath)}`).digest("hex");
+        return ID_PREFIX + digest.slice(0, ID_LENGTH);
+    }
+}
@@ -0,0 +1,89 @@
+/**
+ * Element Defaults - default-elision encoding for stored snapshot elements.
+ *
+ * Every element written by the SDK, the daemon or the editor carries a dozen
+ * fields at their default value (trimStart: 0, opacity: 1, textDecoration: "none" ...).
+ * Encoding drops fields equal to the schema default; decoding restores them.
+ * Schema fields an element never had are listed under "$absent" so decoding
+ * reproduces the original element exactly.
+ *
+ * Encoded snapshots carry the version tag `"encoding": { "defaults": 1 }`;
+ * snapshots without the tag are returned untouched.
+ *
+ * Must stay in sync with tools/core/element_defaults.py.
+ */
+
+export const ELEMENT_DEFAULTS_VERSION = 1;
+const ABSENT_KEY = "$absent";
+
+// Per element type (matches DEFAULT_TEXT_ELEMENT and the SDK's import_media values)
+const ELEMENT_DEFAULTS: Record<string, Record<string, string | number | boolean>> = {
+    text: {
+        trimStart: 0, trimEnd: 0, rotation: 0, opacity: 1,
+        fontSize: 48, fontFamily: "Arial", color: "#ffffff", backgroundColor: "transparent",
+        textAlign: "center", fontWeight: "normal", fontStyle: "normal", textDecoration: "none",
+    },
+    media: {
+        trimStart: 0, trimEnd: 0, rotation: 0, opacity: 1,
+        muted: false, volume: 1, x: 960, y: 540, scale: 1,
+    },
+};
+
+export function encodeElement(element: any): any {
+    const defaults = ELEMENT_DEFAULTS[element?.type];
+    if (!defaults) return element;
+    const encoded: any = {};
+    for (const [key, value] of Object.entries(element)) {
+        if (!(key in defaults && defaults[key] === value)) encoded[key] = value;
+    }
+    const absent = Object.keys(defaults).filter((key) => !(key in element));
+    if (absent.length) encoded[ABSENT_KEY] = absent;
+    return encoded;
+}
+
+export function decodeElement(element: any): any {
+    const defaults = ELEMENT_DEFAULTS[element?.type];
+    if (!defaults) return element;
+    const absent: string[] = element[ABSENT_KEY] || [];
+    const decoded: any = {};
+    for (const [key, value] of Object.entries(defaults)) {
+        if (!absent.includes(key)) decoded[key] = value;
+    }
+    Object.assign(decoded, element);
+    delete decoded[ABSENT_KEY];
+    return decoded;
+}
+
+export function encodeTracks(tracks: any[]): any[] {
+    return tracks.map((track) => track?.elements ? { ...track, elements: track.elements.map(encodeElement) } : track);
+}
+
+export function decodeTracks(tracks: any[]): any[] {
+    return tracks.map((track) => track?.elements ? { ...track, elements: track.elements.map(decodeElement) } : track);
+}
+
+export function elementDefaultsVersion(snapshot: any): number | undefined {
+    return snapshot?.encoding?.defaults;
+}
+
+/** Drop default-valued fields and tag the snapshot */
+export function encodeSnapshot(snapshot: any): any {
+    if (!snapshot || elementDefaultsVersion(snapshot)) return snapshot;
+    const encoded = { ...snapshot, encoding: { ...(snapshot.encoding || {}), defaults: ELEMENT_DEFAULTS_VERSION } };
+    if (Array.isArray(snapshot.tracks)) encoded.tracks = encodeTracks(snapshot.tracks);
+    return encoded;
+}
+
+/** Restore default-valued fields and drop the tag; untagged snapshots pass through */
+export function decodeSnapshot(snapshot: any): any {
+    const version = elementDefaultsVersion(snapshot);
+    if (!version) return snapshot;
+    if (version > ELEMENT_DEFAULTS_VERSION) {
+        throw new Error(`snapshot uses element defaults v${version}, this build supports v${ELEMENT_DEFAULTS_VERSION}`);
+    }
+    const { encoding, ...decoded } = snapshot;
+    const { defaults, ...rest } = encoding;
+    if (Object.keys(rest).length) decoded.encoding = rest;
+    if (Array.isArray(snapshot.tracks)) decoded.tracks = decodeTracks(snapshot.tracks);
+    return decoded;
+}
@@ -0,0 +1,228 @@
+/**
+ * Snapshot Store - reads/writes the workspace project snapshot.
+ *
+ * Two layouts are supported:
+ * - Monolithic (default): ai_workspace/project-snapshot.json
+ * - Sharded (AICUT_SNAPSHOT_SHARDS=1): ai_workspace/snapshot/ with
+ *     manifest.json          shard list + content hashes (written last)
+ *     meta.json              every top-level key except tracks/assets
+ *     assets.json            the asset list
+ *     tracks/<id>.json       one file per track
+ *     tracks/<id>.aict       large text tracks in columnar binary form
+ *                            (opt-in with AICUT_TEXT_COLUMNS=1, see text-columns.ts)
+ *   A write only touches shards whose content changed, and the SSE route pushes
+ *   only those shards to the browser.
+ *
+ * With AICUT_ELIDE_DEFAULTS=1 elements are stored with default-valued fields
+ * left out (see element-defaults.ts). Readers always return expanded snapshots.
+ *
+ * Readers pick the layout from disk (manifest present => sharded). Writers use
+ * the env flag when it is set and otherwise keep the layout already on disk (the
+ * same rule as the Python store), removing the other layout so the two never diverge.
+ * Every file is written atomically (temp file + rename).
+ * tools/core/snapshot_store.py implements the same format for Python tools.
+ */
+import fs from "fs";
+import path from "path";
+import crypto from "crypto";
+import { decodeTextTrack, encodeTextTrack, isColumnarTextTrack } from "@/lib/text-columns";
+import { decodeSnapshot, decodeTracks, encodeSnapshot } from "@/lib/element-defaults";
+
+export const EDITS_DIR = path.join(process.cwd(), "../../../", "ai_workspace");
+export const SNAPSHOT_FILE = path.join(EDITS_DIR, "project-snapshot.json");
+export const SHARD_DIR = path.join(EDITS_DIR, "snapshot");
+export const MANIFEST_FILE = path.join(SHARD_DIR, "manifest.json");
+const MANIFEST_VERSION = 1;
+
+export interface ShardEntry {
+    file: string;
+    hash: string;
+}
+
+export interface TrackShardEntry extends ShardEntry {
+    id: string;
+}
+
+export interface SnapshotManifest {
+    version: number;
+    updatedAt: number;
+    meta: ShardEntry;
+    assets: ShardEntry;
+    tracks: TrackShardEntry[];
+    /** Present when the shards hold default-elided elements */
+    encoding?: { defaults: number };
+}
+
+/** Write layout: the env flag wins, otherwise keep whatever layout is on disk */
+export function isShardedLayoutEnabled(): boolean {
+    const flag = process.env.AICUT_SNAPSHOT_SHARDS;
+    if (flag !== undefined) return flag === "1";
+    return fs.existsSync(MANIFEST_FILE);
+}
+
+function isTextColumnsEnabled(): boolean {
+    return process.env.AICUT_TEXT_COLUMNS === "1";
+}
+
+function isElisionEnabled(): boolean {
+    return process.env.AICUT_ELIDE_DEFAULTS === "1";
+}
+
+function hashContent(content: string | Buffer): string {
+    return crypto.createHash("sha1").update(content).digest("hex").slice(0, 16);
+}
+
+function trackShardFile(trackId: string, ext = ".json"): string {
+    const safe = String(trackId).replace(/[^A-Za-z0-9_-]/g, "_").slice(0, 48);
+    return `tracks/${safe}-${hashContent(String(trackId)).slice(0, 8)}${ext}`;
+}
+
+function writeAtomic(filePath: string, content: string | Buffer) {
+    fs.mkdirSync(path.dirname(filePath), { recursive: true });
+    // Per-process temp name: the Python tools write the same files
+    const tmpPath = `${filePath}.${process.pid}.tmp`;
+    fs.writeFileSync(tmpPath, content);
+    fs.renameSync(tmpPath, filePath);
+}
+
+export function readManifest(): SnapshotManifest | null {
+    try {
+        if (fs.existsSync(MANIFEST_FILE)) {
+            const manifest = JSON.parse(fs.readFileSync(MANIFEST_FILE, "utf-8"));
+            if (manifest?.version === MANIFEST_VERSION) return manifest;
+        }
+    } catch (e) { /* partially written or corrupt */ }
+    return null;
+}
+
+export function readShard(entry: ShardEntry): any {
+    const filePath = path.join(SHARD_DIR, entry.file);
+    if (entry.file.endsWith(".aict")) return decodeTextTrack(fs.readFileSync(filePath));
+    return JSON.parse(fs.readFileSync(filePath, "utf-8"));
+}
+
+/** A track shard with default-elided elements expanded */
+export function readTrackShard(manifest: SnapshotManifest, entry: TrackShardEntry): any {
+    const track = readShard(entry);
+    return manifest.encoding?.defaults ? decodeTracks([track])[0] : track;
+}
+
+export function hasSnapshot(): boolean {
+    return fs.existsSync(MANIFEST_FILE) || fs.existsSync(SNAPSHOT_FILE);
+}
+
+/** Read the workspace snapshot in whichever layout is on disk (null if none) */
+export function readSnapshot(): any | null {
+    const manifest = readManifest();
+    if (manifest) {
+        return decodeSnapshot({
+            ...readShard(manifest.meta),
+            tracks: manifest.tracks.map((entry) => readShard(entry)),
+            assets: readShard(manifest.assets),
+        });
+    }
+    if (fs.existsSync(SNAPSHOT_FILE)) {
+        const content = fs.readFileSync(SNAPSHOT_FILE, "utf-8");
+        return content.trim() ? decodeSnapshot(JSON.parse(content)) : null;
+    }
+    return null;
+}
+
+/** Only the `project` object (reads just the meta shard in the sharded layout) */
+export function readSnapshotProject(): any | null {
+    const manifest = readManifest();
+    if (manifest) return readShard(manifest.meta)?.project ?? null;
+    return readSnapshot()?.project ?? null;
+}
+
+/** Raw snapshot bytes (for history backups, which expand elided elements themselves) */
+export function readSnapshotContent(): Buffer | null {
+    if (readManifest()) {
+        const snapshot = readSnapshot();
+        return snapshot ? Buffer.from(JSON.stringify(snapshot)) : null;
+    }
+    return fs.existsSync(SNAPSHOT_FILE) ? fs.readFileSync(SNAPSHOT_FILE) : null;
+}
+
+/** Modification time of the workspace snapshot */
+export function snapshotMtime(): Date | null {
+    const file = fs.existsSync(MANIFEST_FILE) ? MANIFEST_FILE : SNAPSHOT_FILE;
+    return fs.existsSync(file) ? fs.statSync(file).mtime : null;
+}
+
+/**
+ * Write the workspace snapshot. In the sharded layout only changed shards are
+ * rewritten; returns the names of the changed shards ("meta", "assets", "order", track ids).
+ */
+export function writeSnapshot(snapshot: any): string[] {
+    snapshot = decodeSnapshot(snapshot);
+    if (isElisionEnabled()) snapshot = encodeSnapshot(snapshot);
+    if (!isShardedLayoutEnabled()) {
+        writeAtomic(SNAPSHOT_FILE, JSON.stringify(snapshot, null, 2));
+        removeShards();
+        return ["*"];
+    }
+
+    const previous = readManifest();
+    const changed: string[] = [];
+    const { tracks = [], assets = [], ...meta } = snapshot || {};
+
+    const writeShard = (name: string, file: string, value: any, prev?: ShardEntry): ShardEntry => {
+        const content = file.endsWith(".aict") ? encodeTextTrack(value) : JSON.stringify(value, null, 2);
+        const hash = hashContent(content);
+        if (!prev || prev.hash !== hash || prev.file !== file || !fs.existsSync(path.join(SHARD_DIR, file))) {
+            writeAtomic(path.join(SHARD_DIR, file), content);
+            changed.push(name);
+        }
+        return { file, hash };
+    };
+
+    const prevTracks = new Map((previous?.tracks || []).map((entry) => [entry.id, entry]));
+    const manifest: SnapshotManifest = {
+        version: MANIFEST_VERSION,
+        updatedAt: Date.now(),
+        meta: writeShard("meta", "meta.json", meta, previous?.meta),
+        assets: writeShard("assets", "assets.json", assets, previous?.assets),
+        tracks: tracks.map((track: any) => {
+            const ext = isTextColumnsEnabled() && isColumnarTextTrack(track) ? ".aict" : ".json";
+            return {
+                id: track.id,
+                ...writeShard(track.id, trackShardFile(track.id, ext), track, prevTracks.get(track.id)),
+            };
+        }),
+    };
+    if (meta.encoding?.defaults) manifest.encoding = { defaults: meta.encoding.defaults };
+
+    const liveFiles = new Set(manifest.tracks.map((entry) => entry.file));
+    for (const entry of previous?.tracks || []) {
+        if (!liveFiles.has(entry.file)) {
+            fs.rmSync(path.join(SHARD_DIR, entry.file), { force: true });
+            changed.push(entry.id);
+        }
+    }
+
+    const trackOrder = (entries: TrackShardEntry[]) => entries.map((entry) => entry.id).join("\u0000");
+    if (previous && trackOrder(previous.tracks) !== trackOrder(manifest.tracks)) {
+        changed.push("order");
+    }
+
+    if (changed.length || !previous) {
+        writeAtomic(MANIFEST_FILE, JSON.stringify(manifest, null, 2));
+    }
+    if (fs.existsSync(SNAPSHOT_FILE)) fs.unlinkSync(SNAPSHOT_FILE);
+    return changed;
+}
+
+// Remove the shard files but keep SHARD_DIR itself (the SSE route watches it)
+function removeShards() {
+    if (!fs.existsSync(MANIFEST_FILE)) return;
+    fs.rmSync(MANIFEST_FILE, { force: true });
+    for (const name of ["meta.json", "assets.json", "tracks"]) {
+        fs.rmSync(path.join(SHARD_DIR, name), { recursive: true, force: true });
+    }
+}
+
+export function removeSnapshot() {
+    if (fs.existsSync(SNAPSHOT_FILE)) fs.unlinkSync(SNAPSHOT_FILE);
+    removeShards();
+}
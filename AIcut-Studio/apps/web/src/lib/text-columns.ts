@@ -0,0 +1,196 @@
+/**
+ * Text Columns - columnar binary storage (.aict) for large text tracks.
+ *
+ * Numeric fields become packed float64 columns (constant columns are stored once
+ * in the header), id/content/name become string tables, and the remaining fields
+ * are deduplicated into a style table referenced by a u32 index per element.
+ *
+ * Layout (little endian):
+ *   "AICT" | u32 version | u32 header length | header JSON | 8-byte aligned data
+ *
+ * Columns whose values are all integers are listed in intColumns; columns that mix
+ * integers and fractions get a u1 mask column (<field>.int) marking the integer values
+ * (Python keeps int/float apart). Each style entry records the element key order
+ * (orders) and the track key order is kept in trackKeys, so decoding reproduces the
+ * input exactly and re-encoding yields the same bytes.
+ *
+ * Must stay in sync with tools/core/text_columns.py.
+ */
+
+const MAGIC = "AICT";
+const VERSION = 1;
+const NUMERIC_FIELDS = ["startTime", "duration", "trimStart", "trimEnd", "x", "y", "fontSize", "rotation", "opacity"];
+const STRING_FIELDS = ["id", "content", "name"];
+/** Text tracks with at least this many elements are worth storing as columns */
+export const TEXT_COLUMNS_MIN_ELEMENTS = 1000;
+
+interface ColumnSpec {
+    dtype: "f8" | "u4" | "u1";
+    offset?: number;
+    size?: number;
+    const?: number;
+}
+
+const align = (n: number) => (n + 7) & ~7;
+
+function stableKey(value: any): string {
+    if (value === null || typeof value !== "object") return JSON.stringify(value);
+    if (Array.isArray(value)) return `[${value.map(stableKey).join(",")}]`;
+    return `{${Object.keys(value).sort().map((k) => `${JSON.stringify(k)}:${stableKey(value[k])}`).join(",")}}`;
+}
+
+export function isColumnarTextTrack(track: any): boolean {
+    return track?.type === "text" && (track.elements?.length || 0) >= TEXT_COLUMNS_MIN_ELEMENTS;
+}
+
+export function encodeTextTrack(track: any): Buffer {
+    const { elements = [], ...trackFields } = track;
+    const count = elements.length;
+    const numeric: Record<string, Float64Array> = {};
+    const ints: Record<string, Uint8Array> = {};
+    for (const name of NUMERIC_FIELDS) {
+        numeric[name] = new Float64Array(count).fill(NaN);
+        ints[name] = new Uint8Array(count);
+    }
+    const stringFields = STRING_FIELDS.filter((name) => elements.every((el: any) => typeof el[name] === "string"));
+    const strings: Record<string, string[]> = Object.fromEntries(stringFields.map((name) => [name, []]));
+    const styleIds = new Uint32Array(count);
+    const styles: any[] = [];
+    const orders: string[][] = [];
+    const styleIndex = new Map<string, number>();
+
+    elements.forEach((element: any, i: number) => {
+        const style: any = {};
+        for (const [key, value] of Object.entries(element)) {
+            if (key in strings) {
+                strings[key].push(value as string);
+            } else if (key in numeric && typeof value === "number" && Number.isFinite(value)) {
+                numeric[key][i] = value;
+                ints[key][i] = Number.isInteger(value) ? 1 : 0;
+            } else {
+                style[key] = value;
+            }
+        }
+        // Elements with a different key order get their own style entry
+        const key = stableKey([Object.keys(element), style]);
+        if (!styleIndex.has(key)) {
+            styleIndex.set(key, styles.length);
+            styles.push(style);
+            orders.push(Object.keys(element));
+        }
+        styleIds[i] = styleIndex.get(key)!;
+    });
+
+    const columns: Record<string, ColumnSpec> = {};
+    const blobs: [string, ColumnSpec["dtype"], Uint8Array][] = [];
+    const intColumns: string[] = [];
+    const intMasks: string[] = [];
+    for (const name of NUMERIC_FIELDS) {
+        const values = numeric[name];
+        if (values.every((v) => Number.isNaN(v))) continue;
+        if (values.every((v, i) => Number.isNaN(v) || ints[name][i])) {
+            intColumns.push(name);
+        } else if (ints[name].some((flag) => flag)) {
+            intMasks.push(name);
+            blobs.push([`${name}.int`, "u1", ints[name]]);
+        }
+        if (count && values.every((v) => v === values[0])) {
+            columns[name] = { dtype: "f8", const: values[0] };
+        } else {
+            blobs.push([name, "f8", new Uint8Array(values.buffer)]);
+        }
+    }
+    blobs.push(["style", "u4", new Uint8Array(styleIds.buffer)]);
+    const encoder = new TextEncoder();
+    for (const name of stringFields) {
+        const encoded = strings[name].map((s) => encoder.encode(s));
+        const offsets = new Uint32Array(count + 1);
+        encoded.forEach((bytes, i) => { offsets[i + 1] = offsets[i] + bytes.length; });
+        blobs.push([`${name}.offsets`, "u4", new Uint8Array(offsets.buffer)]);
+        blobs.push([`${name}.bytes`, "u1", Buffer.concat(encoded)]);
+    }
+
+    const parts: Uint8Array[] = [];
+    let pos = 0;
+    for (const [name, dtype, blob] of blobs) {
+        columns[name] = { dtype, offset: pos, size: blob.length };
+        parts.push(blob, new Uint8Array(align(blob.length) - blob.length));
+        pos += align(blob.length);
+    }
+
+    const headerJson = Buffer.from(JSON.stringify({
+        count,
+        track: trackFields,
+        trackKeys: Object.keys(track),
+        styles,
+        orders,
+        intColumns,
+        intMasks,
+        stringColumns: stringFields,
+        columns,
+    }));
+    const header = Buffer.concat([headerJson, Buffer.alloc(align(12 + headerJson.length) - 12 - headerJson.length, 0x20)]);
+    const prefix = Buffer.alloc(12);
+    prefix.write(MAGIC, 0, "ascii");
+    prefix.writeUInt32LE(VERSION, 4);
+    prefix.writeUInt32LE(header.length, 8);
+    return Buffer.concat([prefix, header, ...parts]);
+}
+
+export function decodeTextTrack(data: Uint8Array): any {
+    const buf = Buffer.from(data.buffer, data.byteOffset, data.byteLength);
+    if (buf.toString("ascii", 0, 4) !== MAGIC) throw new Error("not an .aict file");
+    const version = buf.readUInt32LE(4);
+    if (version !== VERSION) throw new Error(`unsupported .aict version ${version}`);
+    const headerLength = buf.readUInt32LE(8);
+    const header = JSON.parse(buf.toString("utf-8", 12, 12 + headerLength));
+    const base = 12 + headerLength;
+    const count: number = header.count;
+
+    // Copy each column out so typed arrays are aligned regardless of the source buffer
+    const bytes = (spec: ColumnSpec) => buf.subarray(base + spec.offset!, base + spec.offset! + spec.size!);
+    const f64 = (spec: ColumnSpec) => spec.const !== undefined
+        ? new Float64Array(count).fill(spec.const)
+        : new Float64Array(Uint8Array.from(bytes(spec)).buffer);
+    const u32 = (spec: ColumnSpec) => new Uint32Array(Uint8Array.from(bytes(spec)).buffer);
+
+    const decoder = new TextDecoder();
+    const strings: [string, string[]][] = header.stringColumns.map((name: string) => {
+        const offsets = u32(header.columns[`${name}.offsets`]);
+        const raw = bytes(header.columns[`${name}.bytes`]);
+        const values: string[] = [];
+        for (let i = 0; i < count; i++) values.push(decoder.decode(raw.subarray(offsets[i], offsets[i + 1])));
+        return [name, values];
+    });
+    const intColumns = new Set<string>(header.intColumns);
+    const intMasks = new Set<string>(header.intMasks || []);
+    // ints: true for all-integer columns, a per-value mask for mixed columns, null otherwise
+    const numeric: [string, Float64Array, true | Uint8Array | null][] = NUMERIC_FIELDS
+        .filter((name) => name in header.columns)
+        .map((name) => [
+            name,
+            f64(header.columns[name]),
+            intColumns.has(name) ? true : intMasks.has(name) ? Uint8Array.from(bytes(header.columns[`${name}.int`])) : null,
+        ]);
+    const styleIds = u32(header.columns.style);
+    // Templates with the keys already in the original order; assignments keep their position
+    const styles: any[] = header.orders
+        ? header.styles.map((style: any, s: number) =>
+            Object.fromEntries(header.orders[s].map((key: string) => [key, style[key]])))
+        : header.styles;
+
+    const elements = [];
+    for (let i = 0; i < count; i++) {
+        const element: any = { ...styles[styleIds[i]] };
+        for (const [name, values] of strings) element[name] = values[i];
+        for (const [name, values, ints] of numeric) {
+            const value = values[i];
+            if (Number.isNaN(value)) continue;
+            element[name] = ints === true || (ints !== null && ints[i]) ? Math.round(value) : value;
+        }
+        elements.push(element);
+    }
+    const track = { ...header.track, elements };
+    if (!header.trackKeys) return track;
+    return Object.fromEntries(header.trackKeys.map((key: string) => [key, (track as any)[key]]));
+}
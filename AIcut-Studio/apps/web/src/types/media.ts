@@ -8,6 +8,8 @@ export interface MediaFile {
   file?: File;
   url?: string; // Object URL for preview
   thumbnailUrl?: string; // For video thumbnails
+  proxyUrl?: string; // Low-resolution proxy used for editing preview (export uses the original)
+  proxyPath?: string; // Absolute path of the proxy file
   duration?: number; // For video/audio duration
   width?: number; // For video/image width
   height?: number; // For video/image height
@@ -96,22 +96,21 @@ def main():
     images = [f for f in os.listdir(source_dir) if f.endswith(".png")]
     images.sort() # 保证顺序一致
     
-    img_duration = narration_duration / len(images)
-    print(f"🖼️  平分时长: 每张图片展示 {img_duration:.2f}秒")
-    
-    for i, img_name in enumerate(images):
-        start_t = i * img_duration
-        img_path = os.path.join(source_dir, img_name)
-        
-        print(f"   [{i+1}/{len(images)}] 导入: {img_name}")
-        # 使用 SDK 导入，我们会后续手动补上缩放属性
-        client.import_media(
-            file_path=img_path,
-            media_type="image",
-            name=f"素材_{i+1}",
-            start_time=start_t,
-            duration=img_duration
-        )
+    # 图片切换点吸附到 BGM 的节拍 (BGM 从 0 秒开始)，检测不到节拍时退回平分
+    print(f"🖼️  按 BGM 节拍切换 {len(images)} 张图片 (共 {narration_duration:.2f}秒)")
+    # 使用 SDK 导入，我们会后续手动补上缩放属性
+    result = client.import_image_sequence(
+        [os.path.join(source_dir, img_name) for img_name in images],
+        start_time=0,
+        duration=narration_duration,
+        layout="beats",
+        music_path=bgm_path,
+        names=[f"素材_{i+1}" for i in range(len(images))]
+    )
+    if result.get("tempo"):
+        print(f"   BGM 速度: {result['tempo']:.1f} BPM")
+    for i, (img_name, (start_t, img_duration)) in enumerate(zip(images, result.get("layout", []))):
+        print(f"   [{i+1}/{len(images)}] {img_name}: {start_t:.2f}s 起，展示 {img_duration:.2f}秒")
 
     # 4. 再次获取 snapshot，应用“缩放效果” (这里我们模仿运动效果，给一个较长的 scale 设定)
     # 虽然目前没有 Keyframe 系统，但我们可以给每个元素一个不同的初始 Scale
@@ -1,5 +1,6 @@
 import os
 import json
+import queue
 import time
 import requests
 import subprocess
@@ -7,6 +8,13 @@ import sys
 import tempfile
 from typing import List, Dict, Optional
 from aicut_sdk import AIcutClient
+from media_duration import get_media_duration
+from tts_batch import synthesize_batch
+from narration import build_narration
+from waveform import build_peaks
+from proxy_media import DONE, PRIORITY_NORMAL, ProxyQueue
+from thumbnail_service import serve_url
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import asyncio
 import edge_tts
@@ -31,6 +39,12 @@ WORKSPACE_ROOT = os.environ.get('WORKSPACE_ROOT', os.path.dirname(os.path.dirnam
 api_port = os.environ.get('API_PORT', '3000')
 BASE_URL = f"http://localhost:{api_port}"
 POLL_INTERVAL = 0.5
+# 合并同音色的连续片段为一次 TTS 请求 (AICUT_TTS_BATCH=0 关闭)
+TTS_BATCH_MODE = os.environ.get('AICUT_TTS_BATCH', '1') != '0'
+# 识别结果追加到时间轴时对重复字幕的处理: skip / replace / merge (AICUT_SUBTITLE_DEDUPE)
+SUBTITLE_DEDUPE = os.environ.get('AICUT_SUBTITLE_DEDUPE', 'replace')
+# 后台波形生成的并发数
+WAVEFORM_WORKERS = 2
 
 class AIDaemon:
     def __init__(self):
@@ -38,6 +52,11 @@ class AIDaemon:
         self.client = AIcutClient(BASE_URL)
         self.processed_tasks = set()
         self.tts_cooldowns = {}
+        # 波形生成不阻塞轮询循环
+        self.waveform_pool = ThreadPoolExecutor(max_workers=WAVEFORM_WORKERS)
+        # 代理转码在后台队列中进行 (有优先级，可取消)；完成的任务交回轮询循环写入快照
+        self.proxy_queue = ProxyQueue(on_done=self._on_proxy_done)
+        self.finished_proxies = queue.Queue()
         
     def log(self, msg):
         print(f"[AI Daemon] {msg}", flush=True)
@@ -51,15 +70,7 @@ class AIDaemon:
             return None
 
     def get_file_duration(self, file_path):
-        try:
-            cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-            result = subprocess.run(cmd, capture_output=True, check=False)
-            if result.returncode == 0:
-                output = result.stdout.decode('utf-8', errors='replace').strip()
-                return float(output)
-        except Exception as e:
-            pass
-        return None
+        return get_media_duration(file_path)
 
     def find_local_file(self, filename, target_duration=None, hint_path=None):
         skip_dirs = {'.git', 'node_modules', '.next', 'dist-electron', 'dist', 'bin', 'obj', 'ai_workspace'}
@@ -293,7 +304,8 @@ class AIDaemon:
                     })
 
             if subtitles:
-                self.client.add_subtitles(subtitles)
+                # 追加模式下重复识别同一片段时，替换时间重叠且文本几乎相同的旧字幕
+                self.client.add_subtitles(subtitles, dedupe=SUBTITLE_DEDUPE)
                 self.log(f"Synced {len(subtitles)} subtitles.")
             else:
                 self.log("No speech segments detected.")
@@ -305,6 +317,58 @@ class AIDaemon:
                 try: os.remove(temp_audio)
                 except: pass
 
+    def generate_waveform(self, file_path):
+        """生成音频的波形峰值金字塔，完成后通知前端"""
+        try:
+            t0 = time.time()
+            peaks_path = build_peaks(file_path)
+        except Exception as e:
+            self.log(f"  X Waveform failed for {os.path.basename(file_path)}: {e}")
+            return
+        if peaks_path:
+            self.log(f"  > Waveform ready: {os.path.basename(file_path)} ({time.time() - t0:.2f}s)")
+            self.emit_event("waveformReady", {"filePath": file_path, "peaksPath": peaks_path})
+        else:
+            self.log(f"  X Could not decode audio for waveform: {file_path}")
+
+    def _on_proxy_done(self, job):
+        """在代理队列的工作线程中调用：只把任务交给轮询循环，快照的读写都在主线程进行"""
+        self.finished_proxies.put(job)
+
+    def record_finished_proxies(self):
+        """把本轮完成的代理路径写回快照中对应的素材 (预览使用代理，导出仍使用原文件)"""
+        ready = []
+        while True:
+            try:
+                job = self.finished_proxies.get_nowait()
+            except queue.Empty:
+                break
+            if job.status == DONE:
+                ready.append(job)
+            else:
+                self.log(f"  > Proxy {job.status}: {os.path.basename(job.source)}")
+        if not ready:
+            return
+        try:
+            snapshot = self.client.get_snapshot()
+            by_source = {job.source: job for job in ready}
+            matched = False
+            for asset in snapshot.get("assets", []):
+                job = by_source.get(asset.get("filePath"))
+                if job:
+                    asset["proxyPath"] = job.proxy_path
+                    asset["proxyUrl"] = serve_url(job.proxy_path)
+                    matched = True
+            if matched:
+                self.client.update_snapshot(snapshot)
+        except Exception as e:
+            self.log(f"  X Failed to record proxies: {e}")
+            return
+        for job in ready:
+            self.log(f"  > Proxy ready: {os.path.basename(job.source)}")
+            self.emit_event("proxyReady", {"filePath": job.source, "proxyPath": job.proxy_path,
+                                           "proxyUrl": serve_url(job.proxy_path)})
+
     def emit_event(self, action, data):
         """
         通过标准输出直接发送事件给 Electron 前端 (IPC)
@@ -319,7 +383,7 @@ class AIDaemon:
         # 使用特殊前缀供前端解析
         print(f"::AI_EVENT::{json.dumps(payload)}", flush=True)
 
-    async def generate_tts(self, text_elements):
+    async def generate_tts(self, text_elements, consolidate=False):
         # 去重: 根据 ID 去重，防止前端发来重复请求
         unique_elements = {}
         now = time.time()
@@ -365,48 +429,108 @@ class AIDaemon:
             
         os.makedirs(output_dir, exist_ok=True)
         
-        # 并发处理
-        # Create tasks
-        tasks = [self._process_single_tts(el, output_dir) for el in text_elements]
-        results = await asyncio.gather(*tasks)
+        results = None
+        if TTS_BATCH_MODE:
+            try:
+                results = await self._process_tts_batch(text_elements, output_dir)
+            except Exception as e:
+                self.log(f"  ! Batch TTS failed, falling back to per-segment: {e}")
+
+        if results is None:
+            # 并发处理
+            # Create tasks
+            tasks = [self._process_single_tts(el, output_dir) for el in text_elements]
+            results = await asyncio.gather(*tasks)
         
         # 过滤掉失败的结果 (None)
         valid_results = [r for r in results if r is not None]
 
         if valid_results:
-            # 为本次生成创建一个新的专用轨道，防止重叠
-            import datetime
-            time_str = datetime.datetime.now().strftime("%H:%M:%S")
-            batch_track_name = f"AI 语音 {time_str}"
-            
-            self.log(f"Importing clean TTS batch to new track: {batch_track_name}")
+            # 不指定轨道: SDK 按区间划分放入该时段空闲的音频轨道，只有都被占用时才新建轨道
+            # 按起点顺序导入 (place_all 内部也按起点排序，贪心分配得到的轨道数最少)
+            valid_results.sort(key=lambda r: r["startTime"])
+            self.log(f"Importing TTS batch ({len(valid_results)} clips) into free audio tracks")
 
-            for item in valid_results:
+            if consolidate and len(valid_results) > 1:
                 try:
-                    # 使用 SDK 直接导入到项目快照，类似 aicut_tool.py 的行为
-                    # 这会更新 project-snapshot.json
-                    res = self.client.import_media(
-                        file_path=item["filePath"],
-                        media_type="audio", 
-                        name=item["name"],
-                        start_time=item["startTime"],
-                        track_name=batch_track_name
-                    )
-                    
-                    if res and res.get("success"):
-                         self.log(f"  > Imported asset: {item['name']}")
-                    else:
-                         self.log(f"  ! Import failed for {item['name']}: {res}")
-                         
+                    self._import_narration(valid_results, output_dir)
+                    return
                 except Exception as e:
-                    self.log(f"  ! API Error importing {item['name']}: {e}")
+                    self.log(f"  ! Narration merge failed, importing segments separately: {e}")
+
+            try:
+                # 使用 SDK 一次导入全部片段: 只读写一次项目快照，轨道由 place_all 统一分配
+                res = self.client.import_media_batch([
+                    {"filePath": item["filePath"], "name": item["name"],
+                     "startTime": item["startTime"], "duration": item.get("duration")}
+                    for item in valid_results
+                ], media_type="audio")
+
+                if res and res.get("success"):
+                    for item in valid_results:
+                        self.log(f"  > Imported asset: {item['name']}")
+                else:
+                    self.log(f"  ! Import failed for TTS batch: {res}")
+
+            except Exception as e:
+                self.log(f"  ! API Error importing TTS batch: {e}")
 
-            # 通知前端刷新 (可选，如果 import_media 内部已经触发了 updateSnapshot，前端 SSE 会收到通知)
+            # 通知前端刷新 (可选，如果 import_media_batch 内部已经触发了 updateSnapshot，前端 SSE 会收到通知)
             # 但为了保险，我们可以发一个简单的 refresh 信号或者什么都不做
             # self.emit_event("refreshProject", {}) 
         else:
             self.log("TTS generation completed but no audio files were generated.")
 
+    def _import_narration(self, results, output_dir):
+        """把本批配音拼成一个旁白文件导入，各段偏移写入元素 metadata"""
+        results = sorted(results, key=lambda r: r["startTime"])
+        base = results[0]["startTime"]
+        out_path = os.path.join(output_dir, f"narration_{int(time.time())}.mp3")
+        meta = build_narration(
+            [r["filePath"] for r in results],
+            out_path,
+            starts=[r["startTime"] - base for r in results],
+            segment_ids=[r["id"] for r in results]
+        )
+        res = self.client.import_media(
+            file_path=out_path,
+            media_type="audio",
+            name=os.path.basename(out_path),
+            start_time=base,
+            duration=meta["duration"],
+            metadata={"narrationSegments": meta["segments"]}
+        )
+        if not (res and res.get("success")):
+            raise RuntimeError(res)
+        self.log(f"  > Imported narration ({len(results)} segments, {meta['duration']:.2f}s)")
+
+    async def _process_tts_batch(self, text_elements, output_dir):
+        """按时间顺序把同音色的连续片段合并为一次请求，再拆分写出各段音频"""
+        elements = sorted(
+            (el for el in text_elements if el.get("content")),
+            key=lambda el: el.get("startTime", 0)
+        )
+        batch = [(el["content"], el.get("voiceId", "zh-CN-XiaoxiaoNeural")) for el in elements]
+        self.log(f"  > Batch synthesizing {len(batch)} segments...")
+        pieces = await synthesize_batch(batch)
+
+        results = []
+        for el, piece in zip(elements, pieces):
+            if not piece or len(piece.audio) < 100:
+                self.log(f"  X Empty audio for segment {el.get('id')}")
+                continue
+            filepath = os.path.join(output_dir, f"tts_{el.get('id')}.mp3")
+            with open(filepath, "wb") as f:
+                f.write(piece.audio)
+            results.append({
+                "id": el.get("id"),
+                "filePath": filepath,
+                "name": f"TTS: {el['content'][:10]}",
+                "startTime": el.get("startTime", 0),
+                "duration": piece.duration
+            })
+        return results
+
     async def _process_single_tts(self, el, output_dir):
         text = el.get("content", "")
         el_id = el.get("id")
@@ -439,6 +563,7 @@ class AIDaemon:
             
             # 返回结果而不是直接发送
             return {
+                "id": el_id,
                 "filePath": filepath,
                 "name": f"TTS: {text[:10]}",
                 "startTime": start_time,
@@ -546,7 +671,20 @@ class AIDaemon:
                                 self.log(f"Element {e_id} not found in project snapshot.")
                         elif data.get("taskType") == "tts_generation":
                             text_elements = data.get("textElements", [])
-                            asyncio.run(self.generate_tts(text_elements))
+                            asyncio.run(self.generate_tts(text_elements, consolidate=data.get("consolidate", False)))
+                        elif data.get("taskType") == "waveform_generation":
+                            for file_path in data.get("filePaths", []):
+                                self.waveform_pool.submit(self.generate_waveform, file_path)
+                        elif data.get("taskType") == "proxy_generation":
+                            priority = int(data.get("priority", PRIORITY_NORMAL))
+                            for file_path in data.get("filePaths", []):
+                                try:
+                                    self.proxy_queue.submit(file_path, priority)
+                                except OSError as e:
+                                    self.log(f"  X Cannot queue proxy for {file_path}: {e}")
+                        elif data.get("taskType") == "proxy_cancel":
+                            for file_path in data.get("filePaths", []):
+                                self.proxy_queue.cancel(file_path)
                         elif data.get("taskType") == "tts_preview":
                             voice_id = data.get("voiceId", "zh-CN-XiaoxiaoNeural")
                             text = data.get("text", "这是一段试听文本")
@@ -554,7 +692,8 @@ class AIDaemon:
 
             except Exception as e:
                 self.log(f"Poll error: {e}")
-                
+
+            self.record_finished_proxies()
             time.sleep(POLL_INTERVAL)
 
 if __name__ == "__main__":
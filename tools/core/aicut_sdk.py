@@ -17,7 +17,20 @@ AIcut Python SDK - 用于程序化编辑视频项目
 """
 
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+from asset_id import asset_id_for
+from beat_grid import detect_beats, snap_boundaries
+from filmstrip import build_filmstrips
+from media_duration import get_media_duration
+from scene_detect import analyze as analyze_scenes, find_cuts
+from silence_detect import detect_silences
+from subtitle_io import read_subtitles, write_subtitles, cue_to_subtitle, iter_snapshot_cues
+from timebase import FrameClock, find_overlaps, snap_snapshot
+import timeline_ops
+from track_allocator import DEFAULT_TRACK_NAMES, TrackAllocator
+from subtitle_dedupe import apply_plan, plan_append
+from thumbnail_service import thumbnail_url as get_thumbnail_url
 
 
 class AIcutClient:
@@ -58,15 +71,8 @@ class AIcutClient:
     
     
     def _get_media_duration(self, file_path: str) -> float:
-        """使用 ffprobe 获取媒体文件时长"""
-        import subprocess
-        try:
-            cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
-            output = subprocess.check_output(cmd).decode('utf-8').strip()
-            return float(output)
-        except Exception as e:
-            # print(f"警告: 无法获取媒体时长 {file_path}: {e}")
-            return 0.0
+        """获取媒体文件时长 (优先解析文件头，必要时回退到 ffprobe)"""
+        return get_media_duration(file_path) or 0.0
 
     def add_subtitle(
         self,
@@ -108,7 +114,7 @@ class AIcutClient:
             "fontFamily": font_family
         })
     
-    def add_subtitles(self, subtitles: List[Dict]) -> Dict:
+    def add_subtitles(self, subtitles: List[Dict], track_name: str = None, dedupe: str = None) -> Dict:
         """批量添加字幕
         
         Args:
@@ -119,6 +125,9 @@ class AIcutClient:
                 - x, y: 坐标
                 - fontSize: 字体大小
                 - color: 颜色
+            track_name: 目标文本轨道名称（可选，同名轨道存在时追加到该轨道，否则新建）
+            dedupe: 与已有文本元素重复（时间大幅重叠且文本几乎相同）时的处理策略（可选）:
+                "skip" 丢弃新字幕 / "replace" 替换原有元素 / "merge" 合并到原有元素
         
         示例:
             client.add_subtitles([
@@ -126,9 +135,107 @@ class AIcutClient:
                 {"text": "第二段", "startTime": 2, "duration": 2},
             ])
         """
-        return self._post("addMultipleSubtitles", {
-            "subtitles": subtitles
-        })
+        if dedupe:
+            # 删除/更新与追加写入同一份快照，一次提交
+            snapshot = self.get_snapshot()
+            plan = plan_append(snapshot, subtitles, dedupe)
+            if not (plan.add or plan.remove or plan.update):
+                return {"success": True, "duplicates": plan.duplicates}
+            # 替换的字幕追加回原来的轨道，未指定轨道时使用已有的文本轨道
+            target_id = self._subtitle_track_id(snapshot, plan.remove, track_name)
+            snapshot = apply_plan(snapshot, plan, keep_track=target_id)
+            if plan.add:
+                self._append_subtitles(snapshot, plan.add, track_name, target_id)
+            result = self.update_snapshot(snapshot)
+            return {**(result or {}), "duplicates": plan.duplicates}
+        payload = {"subtitles": subtitles}
+        if track_name:
+            payload["trackName"] = track_name
+        return self._post("addMultipleSubtitles", payload)
+
+    @staticmethod
+    def _subtitle_track_id(snapshot: Dict, removed_ids: List[str], track_name: str = None) -> Optional[str]:
+        """去重追加的目标文本轨道: 同名轨道 > 被替换字幕所在的轨道 > 第一条文本轨道，都没有时返回 None"""
+        text_tracks = [t for t in snapshot.get("tracks", []) if t.get("type") == "text"]
+        if track_name:
+            return next((t["id"] for t in text_tracks if t.get("name") == track_name), None)
+        removed = set(removed_ids)
+        source = next((t for t in text_tracks if any(el.get("id") in removed for el in t.get("elements", []))),
+                      None)
+        track = source or (text_tracks[0] if text_tracks else None)
+        return track["id"] if track else None
+
+    @staticmethod
+    def _append_subtitles(snapshot: Dict, subtitles: List[Dict], track_name: str = None,
+                          track_id: str = None) -> None:
+        """把字幕作为文本元素追加到 track_id 指定的轨道 (为空时新建轨道，元素默认值同前端的 addMultipleSubtitles)"""
+        import uuid
+
+        tracks = snapshot.setdefault("tracks", [])
+        track = next((t for t in tracks if t.get("id") == track_id), None) if track_id else None
+        if track is None:
+            track = {"id": str(uuid.uuid4()), "name": track_name or "AI 字幕", "type": "text",
+                     "elements": [], "muted": False}
+            tracks.append(track)
+        track.setdefault("elements", []).extend({
+            "id": str(uuid.uuid4()),
+            "type": "text",
+            "content": sub.get("text") or sub.get("content"),
+            "startTime": sub.get("startTime") or 0,
+            "duration": sub.get("duration") or 3,
+            "trimStart": 0,
+            "trimEnd": 0,
+            "x": sub.get("x", 960),
+            "y": sub.get("y", 900),
+            "fontSize": sub.get("fontSize", 48),
+            "fontFamily": sub.get("fontFamily", "Arial"),
+            "color": sub.get("color", "#FFFFFF"),
+            "backgroundColor": sub.get("backgroundColor", "rgba(0,0,0,0.7)"),
+            "textAlign": sub.get("textAlign", "center"),
+            "fontWeight": "normal",
+            "fontStyle": "normal",
+            "textDecoration": "none",
+            "rotation": 0,
+            "opacity": 1,
+        } for sub in subtitles)
+
+    def import_subtitles(self, path: str, batch_size: int = 5000, track_name: str = None, style: Dict = None) -> Dict:
+        """流式导入 SRT/VTT/ASS 字幕文件
+        
+        字幕按 batch_size 分批通过 addMultipleSubtitles 发送，所有批次写入同一条轨道。
+        
+        Args:
+            path: 字幕文件路径（格式由扩展名决定）
+            batch_size: 每批发送的字幕条数
+            track_name: 目标轨道名称（默认使用文件名）
+            style: 附加到每条字幕的样式（如 fontSize, color, y）
+        """
+        import os
+        track_name = track_name or f"字幕: {os.path.basename(path)}"
+        edit_ids = []
+        count = 0
+        batch = []
+        for cue in read_subtitles(path):
+            batch.append(cue_to_subtitle(cue, style))
+            if len(batch) >= batch_size:
+                edit_ids.append(self.add_subtitles(batch, track_name=track_name).get("editId"))
+                count += len(batch)
+                batch = []
+        if batch:
+            edit_ids.append(self.add_subtitles(batch, track_name=track_name).get("editId"))
+            count += len(batch)
+        return {"success": True, "count": count, "editIds": edit_ids}
+
+    def export_subtitles(self, path: str, track_id: str = None) -> Dict:
+        """将时间轴上的文本元素导出为 SRT/VTT/ASS 文件
+        
+        Args:
+            path: 输出路径（格式由扩展名决定）
+            track_id: 仅导出指定文本轨道（可选，默认导出全部文本轨道）
+        """
+        snapshot = self.get_snapshot()
+        count = write_subtitles(path, iter_snapshot_cues(snapshot, track_id))
+        return {"success": True, "count": count, "path": path}
     
     def clear_subtitles(self, start_time: float = None, duration: float = None) -> Dict:
         """清除指定范围内的字幕
@@ -194,26 +301,182 @@ class AIcutClient:
         """全量更新项目快照"""
         return self._post("updateSnapshot", snapshot)
 
-    def import_media(self, file_path: str, media_type: str = "video", name: str = None, start_time: float = 0, duration: float = None, track_id: str = None, track_name: str = None) -> Dict:
-        """导入媒体文件 (模仿 demo_file_driven 逻辑)
+    def snap_to_frames(self, fps: float = None) -> Dict:
+        """把所有元素的起点/时长/裁剪吸附到帧边界 (一次提交)
         
-        通过直接更新 Snapshot 的方式实现，这种方式最稳定，支持本地绝对路径。
+        Args:
+            fps: 帧率（可选，默认使用 project.fps）
+        """
+        snapshot = self.get_snapshot()
+        snapped, moved = snap_snapshot(snapshot, fps)
+        if moved:
+            self.update_snapshot(snapped)
+        return {"success": True, "moved": moved}
+
+    def _apply_timeline_op(self, op, *args, tracks: List[str] = None) -> Dict:
+        """对当前快照执行时间轴操作，有变化时一次性提交"""
+        snapshot, count = op(self.get_snapshot(), *args, track_ids=tracks)
+        if count:
+            self.update_snapshot(snapshot)
+        return {"success": True, "count": count}
+
+    def ripple_insert(self, at: float, duration: float, tracks: List[str] = None) -> Dict:
+        """涟漪插入: 在 at 处插入 duration 秒空白，之后的元素整体后移
+        
+        Args:
+            at: 插入位置（秒）
+            duration: 插入时长（秒）
+            tracks: 受影响的轨道 ID 列表（可选，默认全部轨道，字幕与配音一起移动）
+        """
+        return self._apply_timeline_op(timeline_ops.ripple_insert, at, duration, tracks=tracks)
+
+    def ripple_delete(self, start: float, end: float, tracks: List[str] = None) -> Dict:
+        """涟漪删除: 删除 [start, end) 区间并前移后续元素，跨越边界的元素被裁剪
+        
+        Args:
+            start: 区间开始（秒）
+            end: 区间结束（秒）
+            tracks: 受影响的轨道 ID 列表（可选，默认全部轨道）
+        """
+        return self._apply_timeline_op(timeline_ops.ripple_delete, start, end, tracks=tracks)
+
+    def shift(self, time_range: Tuple[float, float], delta: float, tracks: List[str] = None) -> Dict:
+        """平移起点落在 time_range 内的元素
+        
+        Args:
+            time_range: (开始, 结束)（秒）
+            delta: 平移量（秒，负数为前移）
+            tracks: 受影响的轨道 ID 列表（可选，默认全部轨道）
+        """
+        start, end = time_range
+        return self._apply_timeline_op(timeline_ops.shift, start, end, delta, tracks=tracks)
+
+    def split_at_scenes(self, element_id: str, **thresholds) -> Dict:
+        """在镜头切换处把视频元素切成多段 (一次提交)
+        
+        切换点由 scene_detect 检测 (逐帧指标按内容指纹缓存)，各段通过 trimStart/trimEnd 引用同一素材。
+        
+        Args:
+            element_id: 视频元素 ID
+            **thresholds: 检测阈值（可选，pixel_threshold / hist_threshold / adaptive_ratio / min_scene）
+        
+        Returns:
+            {"success", "cuts": 素材时间切点, "elements": 切分后的元素 ID 列表}
+        """
+        snapshot = self.get_snapshot()
+        element = next((el for t in snapshot.get("tracks", []) for el in t.get("elements", [])
+                        if el.get("id") == element_id), None)
+        if element is None:
+            return {"success": False, "error": f"元素不存在: {element_id}"}
+        asset = next((a for a in snapshot.get("assets", []) if a.get("id") == element.get("mediaId")), None)
+        if asset is None or asset.get("type") != "video" or not asset.get("filePath"):
+            return {"success": False, "error": "元素没有可分析的视频素材"}
+
+        metrics = analyze_scenes(asset["filePath"])
+        if metrics is None:
+            return {"success": False, "error": f"无法解码视频: {asset['filePath']}"}
+        cuts = find_cuts(metrics, **thresholds)
+        snapshot, pieces = timeline_ops.split_element(snapshot, element_id, cuts)
+        if len(pieces) > 1:
+            self.update_snapshot(snapshot)
+        return {"success": True, "cuts": [p["trimStart"] for p in pieces[1:]],
+                "elements": [p["id"] for p in pieces]}
+
+    def remove_silences(self, element_id: str, tracks: List[str] = None, **params) -> Dict:
+        """剪掉音频/视频元素中的静音段，并涟漪前移后续内容 (一次提交)
+        
+        元素在静音段两端被切开，静音段对应的时间区间在所有轨道 (或 tracks 指定的轨道) 上一起
+        涟漪删除，时间轴上的字幕随之前移或裁剪。
+        
+        Args:
+            element_id: 音频/视频元素 ID
+            tracks: 受影响的轨道 ID 列表（可选，默认全部轨道；元素所在轨道总是包含在内）
+            **params: 检测参数（可选，threshold_db / min_silence / padding）
+        
+        Returns:
+            {"success", "removed": 删除的总时长, "ranges": 被删除的时间轴区间, "elements": 保留的元素 ID 列表}
+        """
+        snapshot = self.get_snapshot()
+        found = next(((t, el) for t in snapshot.get("tracks", []) for el in t.get("elements", [])
+                      if el.get("id") == element_id), None)
+        if found is None:
+            return {"success": False, "error": f"元素不存在: {element_id}"}
+        track, element = found
+        asset = next((a for a in snapshot.get("assets", []) if a.get("id") == element.get("mediaId")), None)
+        if asset is None or asset.get("type") not in ("audio", "video") or not asset.get("filePath"):
+            return {"success": False, "error": "元素没有可分析的音频/视频素材"}
+
+        # 静音区间 (素材时间) 限制在元素的可见部分内，再换算为时间轴区间
+        trim_start = element.get("trimStart") or 0
+        source_end = (element.get("duration") or 0) - (element.get("trimEnd") or 0)
+        offset = (element.get("startTime") or 0) - trim_start
+        spans = [(max(a, trim_start), min(b, source_end)) for a, b in detect_silences(asset["filePath"], **params)]
+        spans = [(a, b) for a, b in spans if b - a > timeline_ops.EPSILON]
+        if not spans:
+            return {"success": True, "removed": 0, "ranges": [], "elements": [element_id]}
+
+        snapshot, pieces = timeline_ops.split_element(snapshot, element_id, [t for span in spans for t in span])
+        ranges = [(a + offset, b + offset) for a, b in spans]
+        if tracks is not None:
+            tracks = list(tracks) + [track.get("id")]
+        snapshot, _ = timeline_ops.ripple_delete_ranges(snapshot, ranges, track_ids=tracks)
+        self.update_snapshot(snapshot)
+        kept = {el.get("id") for t in snapshot.get("tracks", []) for el in t.get("elements", [])}
+        return {
+            "success": True,
+            "removed": round(sum(b - a for a, b in spans), 6),
+            "ranges": [[round(a, 6), round(b, 6)] for a, b in ranges],
+            "elements": [p["id"] for p in pieces if p["id"] in kept],
+        }
+
+    def find_overlaps(self, track_id: str = None) -> List[Dict]:
+        """按整数帧精确检测同一轨道内的重叠元素
+        
+        Args:
+            track_id: 仅检查指定轨道（可选，默认检查全部轨道）
+        
+        Returns:
+            [{"trackId", "a", "b", "start", "frames"}]，frames 为重叠帧数
         """
+        snapshot = self.get_snapshot()
+        clock = FrameClock.for_snapshot(snapshot)
+        return [
+            {"trackId": track.get("id"), **overlap}
+            for track in snapshot.get("tracks", [])
+            if track_id is None or track.get("id") == track_id
+            for overlap in find_overlaps(track, clock)
+        ]
+
+    def get_filmstrips(self, asset_ids: List[str] = None, mode: str = "fps", interval: float = 1.0) -> Dict[str, Dict]:
+        """为项目中的视频素材生成胶片条 (雪碧图 + 帧时间索引，按内容指纹缓存)
+        
+        Args:
+            asset_ids: 仅处理指定素材（可选，默认全部视频素材）
+            mode: "fps" 按固定间隔取帧，"keyframes" 只取关键帧
+            interval: 取帧间隔（秒）
+        
+        Returns:
+            {asset_id: 索引}，索引格式见 filmstrip.py；生成失败的素材不出现在结果中
+        """
+        assets = [
+            a for a in self.get_snapshot().get("assets", [])
+            if a.get("type") == "video" and a.get("filePath")
+            and (asset_ids is None or a.get("id") in asset_ids)
+        ]
+        indices = build_filmstrips([a["filePath"] for a in assets], mode=mode, interval=interval)
+        return {a["id"]: index for a, index in zip(assets, indices) if index is not None}
+
+    def _prepare_asset(self, snapshot: Dict, abs_path: str, media_type: str, name: str = None,
+                       duration: float = None) -> Tuple[str, str, float]:
+        """在 snapshot 中登记素材 (已存在时复用)，返回 (asset_id, 缩略图 URL, 时长)"""
         import os
         import urllib.parse
-        import uuid
-        import time
 
-        abs_path = os.path.abspath(file_path)
         file_name = name or os.path.basename(abs_path)
-        
-        # 1. 获取当前状态
-        snapshot = self.get_snapshot()
         assets = snapshot.get("assets", [])
-        tracks = snapshot.get("tracks", [])
-        
-        # 2. 构造 Asset
-        asset_id = f"asset_{hash(abs_path) % 1000000}_{int(os.path.getmtime(abs_path) if os.path.exists(abs_path) else 0)}"
+
+        # 构造 Asset (id 为采样内容指纹，同一文件在任何进程、工具中都得到同一个 id)
+        asset_id = asset_id_for(abs_path)
         
         # 路径编码
         encoded_path = urllib.parse.quote(abs_path)
@@ -222,15 +485,9 @@ class AIcutClient:
         # 默认使用路径本身作为缩略图 (如图片)
         thumbnail_url = serve_url
         
-        # 如果是视频，尝试生成真实的缩略图
+        # 如果是视频，使用按内容指纹缓存的缩略图 (重复导入同一文件不会再启动 ffmpeg)
         if media_type == "video":
-            try:
-                thumb_res = self._post_raw("/api/media/generate-thumbnail", {"filePath": abs_path})
-                if thumb_res.get("success"):
-                    thumbnail_url = thumb_res.get("thumbnailUrl")
-            except Exception as e:
-                pass
-                # print(f"警告: 视频缩略图生成失败: {e}")
+            thumbnail_url = get_thumbnail_url(abs_path) or serve_url
         
         # 如果没有指定时长，尝试自动探测
         if duration is None:
@@ -240,7 +497,8 @@ class AIcutClient:
                 duration = self._get_media_duration(abs_path)
         
         # 检查是否已存在
-        existing_asset = next((a for a in assets if a.get("filePath") == abs_path or a.get("id") == asset_id), None)
+        existing_asset = {a.get("id"): a for a in assets}.get(asset_id) \
+            or next((a for a in assets if a.get("filePath") == abs_path), None)
         if not existing_asset:
             new_asset = {
                 "id": asset_id,
@@ -258,46 +516,18 @@ class AIcutClient:
             asset_id = existing_asset["id"]
             # 即使 Asset 存在，也更新其 thumbnailUrl
             existing_asset["thumbnailUrl"] = thumbnail_url
-            serve_url = existing_asset.get("url", serve_url)
-
-        # 3. 找到或创建目标轨道
-        target_track = None
-        
-        # 确定轨道类型
-        track_type = "audio" if media_type == "audio" else "media"
-        default_name = "Audio Track" if media_type == "audio" else "Media Track"
+        return asset_id, thumbnail_url, duration
 
-        if track_id:
-            target_track = next((t for t in tracks if t.get("id") == track_id), None)
-        
-        if not target_track and track_name:
-            # 搜索同名轨道
-            target_track = next((t for t in tracks if t.get("name") == track_name), None)
-
-        if not target_track:
-            # 只有在没有显式指定轨道名称时，才寻找匹配类型的默认轨道
-            if not track_name:
-                target_track = next((t for t in tracks if t.get("type") == track_type and not t.get("isMain")), None)
-
-        if not target_track:
-            # 如果没有，创建一个新的匹配类型的轨道
-            new_track_id = str(uuid.uuid4())
-            target_track = {
-                "id": new_track_id,
-                "name": track_name or default_name,
-                "type": track_type,
-                "elements": [],
-                "muted": False
-            }
-            tracks.append(target_track)
-            snapshot["tracks"] = tracks # Ensure list is attached
+    @staticmethod
+    def _media_element(asset_id: str, name: str, thumbnail_url: str, start_time: float, duration: float,
+                       metadata: Dict = None) -> Dict:
+        import uuid
 
-        # 4. 构造 Element
-        new_element = {
+        return {
             "id": str(uuid.uuid4()),
             "type": "media",
             "mediaId": asset_id,
-            "name": file_name,
+            "name": name,
             "thumbnailUrl": thumbnail_url,   # 使用实际生成的缩略图 URL
             "startTime": start_time,
             "duration": duration or 5.0,
@@ -311,14 +541,206 @@ class AIcutClient:
             "rotation": 0,
             "opacity": 1,
             "metadata": {
-                "importSource": "sdk_v2"
+                "importSource": "sdk_v2",
+                **(metadata or {})
             }
         }
+
+    @staticmethod
+    def _new_track(tracks: List[Dict], name: str, track_type: str) -> Dict:
+        import uuid
+
+        track = {
+            "id": str(uuid.uuid4()),
+            "name": name,
+            "type": track_type,
+            "elements": [],
+            "muted": False
+        }
+        tracks.append(track)
+        return track
+
+    def _request_media_tasks(self, media_type: str, abs_paths: List[str]) -> None:
+        """音频交给守护进程在后台生成波形峰值，视频生成预览用的代理 (均按内容指纹缓存)"""
+        if media_type == "audio":
+            self.request_waveforms(abs_paths)
+        elif media_type == "video":
+            self.request_proxies(abs_paths)
+
+    def import_media(self, file_path: str, media_type: str = "video", name: str = None, start_time: float = 0, duration: float = None, track_id: str = None, track_name: str = None, metadata: Dict = None) -> Dict:
+        """导入媒体文件 (模仿 demo_file_driven 逻辑)
         
-        target_track["elements"].append(new_element)
+        通过直接更新 Snapshot 的方式实现，这种方式最稳定，支持本地绝对路径。
+        metadata 会合并进元素的 metadata 字段 (如合并旁白的分段偏移)。
+        一次导入多个文件时使用 import_media_batch (只读写一次 Snapshot)。
+        """
+        import os
+
+        abs_path = os.path.abspath(file_path)
+        file_name = name or os.path.basename(abs_path)
+        
+        # 1. 获取当前状态
+        snapshot = self.get_snapshot()
+        tracks = snapshot.get("tracks", [])
+        snapshot["tracks"] = tracks # Ensure list is attached
+        
+        # 2. 登记 Asset
+        asset_id, thumbnail_url, duration = self._prepare_asset(snapshot, abs_path, media_type, name, duration)
+
+        # 3. 找到或创建目标轨道
+        target_track = None
+        
+        # 确定轨道类型
+        track_type = "audio" if media_type == "audio" else "media"
+        default_name = DEFAULT_TRACK_NAMES[track_type]
+
+        if track_id:
+            target_track = next((t for t in tracks if t.get("id") == track_id), None)
+        
+        if not target_track and track_name:
+            # 搜索同名轨道
+            target_track = next((t for t in tracks if t.get("name") == track_name), None)
+
+        if not target_track and not track_name:
+            # 没有显式指定轨道时，放入该时段空闲的最靠前同类型轨道 (都被占用时新建)
+            allocator = TrackAllocator(tracks, FrameClock.for_snapshot(snapshot))
+            target_track = allocator.place(start_time, duration or 5.0, track_type, default_name)
+
+        if not target_track:
+            # 如果没有，创建一个新的匹配类型的轨道
+            target_track = self._new_track(tracks, track_name or default_name, track_type)
+
+        # 4. 构造 Element
+        target_track["elements"].append(
+            self._media_element(asset_id, file_name, thumbnail_url, start_time, duration, metadata))
         
         # 5. 回写状态
-        return self.update_snapshot(snapshot)
+        result = self.update_snapshot(snapshot)
+        self._request_media_tasks(media_type, [abs_path])
+        return result
+
+    def import_media_batch(self, items: List[Dict], media_type: str = "video", track_name: str = None) -> Dict:
+        """一次导入多个同类型媒体文件，只读写一次 Snapshot
+        
+        未指定 track_name 时所有片段一起交给 TrackAllocator.place_all 分配轨道
+        (与逐个 import_media 的结果相同)，否则全部放入该名称的轨道 (不存在时新建)。
+        
+        Args:
+            items: 每项包含 filePath (必需)、name、startTime、duration、metadata，含义同 import_media
+            media_type: 媒体类型
+            track_name: 目标轨道名称（可选）
+        
+        Returns:
+            update_snapshot 的结果，附加 elementIds (与 items 顺序一致)
+        """
+        if not items:
+            return {"success": True, "elementIds": []}
+        import os
+
+        snapshot = self.get_snapshot()
+        tracks = snapshot.get("tracks", [])
+        snapshot["tracks"] = tracks # Ensure list is attached
+
+        abs_paths, elements = [], []
+        for item in items:
+            abs_path = os.path.abspath(item["filePath"])
+            file_name = item.get("name") or os.path.basename(abs_path)
+            asset_id, thumbnail_url, duration = self._prepare_asset(
+                snapshot, abs_path, media_type, file_name, item.get("duration"))
+            abs_paths.append(abs_path)
+            elements.append(self._media_element(asset_id, file_name, thumbnail_url, item.get("startTime", 0),
+                                                duration, item.get("metadata")))
+
+        track_type = "audio" if media_type == "audio" else "media"
+        if track_name:
+            target = next((t for t in tracks if t.get("name") == track_name), None) \
+                or self._new_track(tracks, track_name, track_type)
+            targets = [target] * len(elements)
+        else:
+            allocator = TrackAllocator(tracks, FrameClock.for_snapshot(snapshot))
+            targets = allocator.place_all([(e["startTime"], e["duration"]) for e in elements], track_type,
+                                          DEFAULT_TRACK_NAMES[track_type])
+        for track, element in zip(targets, elements):
+            track["elements"].append(element)
+
+        result = self.update_snapshot(snapshot)
+        self._request_media_tasks(media_type, list(dict.fromkeys(abs_paths)))
+        return {**(result or {}), "elementIds": [e["id"] for e in elements]}
+
+    def import_image_sequence(self, file_paths: List[str], start_time: float = 0, duration: float = None,
+                              layout: str = "even", music_path: str = None, music_offset: float = 0,
+                              names: List[str] = None, track_name: str = None) -> Dict:
+        """按顺序把图片序列依次排在时间轴上
+        
+        Args:
+            file_paths: 图片路径列表（按显示顺序）
+            start_time: 第一张图片的开始时间（秒）
+            duration: 整个序列的总时长（秒，默认每张 5 秒）
+            layout: "even" 平分总时长；"beats" 把相邻图片的切换点吸附到 music_path 最近的节拍
+            music_path: 用于节拍分析的音乐文件 (layout="beats" 时必填，节拍按内容指纹缓存)
+            music_offset: 音乐在时间轴上的开始时间（秒）
+            names: 各元素名称（可选，默认使用文件名）
+            track_name: 目标轨道名称（可选）
+        
+        Returns:
+            {"success", "layout": [[开始, 时长], ...], "tempo": BPM (仅 beats 布局)}
+        """
+        count = len(file_paths)
+        if count == 0:
+            return {"success": True, "layout": []}
+        total = duration if duration is not None else 5.0 * count
+        slot = total / count
+        bounds = [start_time + i * slot for i in range(count)] + [start_time + total]
+
+        tempo = None
+        if layout == "beats":
+            if not music_path:
+                return {"success": False, "error": "layout='beats' 需要 music_path"}
+            grid = detect_beats(music_path)
+            if grid is not None:
+                tempo = grid.tempo
+                # 每张图片至少保留平均时长的一半
+                bounds = snap_boundaries(bounds, grid.beats + music_offset, min_gap=slot / 2)
+        elif layout != "even":
+            return {"success": False, "error": f"未知的布局: {layout}"}
+
+        placed = [[bounds[i], round(bounds[i + 1] - bounds[i], 6)] for i in range(count)]
+        self.import_media_batch([
+            {"filePath": path, "name": names[i] if names else None, "startTime": start, "duration": length}
+            for i, (path, (start, length)) in enumerate(zip(file_paths, placed))
+        ], media_type="image", track_name=track_name)
+        result = {"success": True, "layout": placed}
+        if layout == "beats":
+            result["tempo"] = tempo
+        return result
+
+    def request_proxies(self, file_paths: List[str], priority: int = None) -> Optional[Dict]:
+        """请求守护进程在后台为视频生成低分辨率代理 (见 proxy_media.py)，失败时返回 None
+        
+        Args:
+            priority: 数值越小越先处理 (默认 10，0 为最高)
+        """
+        data = {"taskType": "proxy_generation", "filePaths": file_paths}
+        if priority is not None:
+            data["priority"] = priority
+        try:
+            return self._post("requestTask", data)
+        except Exception:
+            return None
+
+    def cancel_proxies(self, file_paths: List[str]) -> Optional[Dict]:
+        """取消排队中或正在进行的代理生成"""
+        try:
+            return self._post("requestTask", {"taskType": "proxy_cancel", "filePaths": file_paths})
+        except Exception:
+            return None
+
+    def request_waveforms(self, file_paths: List[str]) -> Optional[Dict]:
+        """请求守护进程为音频文件生成波形峰值金字塔 (见 waveform.py)，失败时返回 None"""
+        try:
+            return self._post("requestTask", {"taskType": "waveform_generation", "filePaths": file_paths})
+        except Exception:
+            return None
 
     def import_video(self, file_path: str, name: str = None, start_time: float = 0, track_id: str = None) -> Dict:
         """导入视频"""
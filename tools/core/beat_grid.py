@@ -0,0 +1,224 @@
+"""
+Beat Grid - 背景音乐的起音包络、速度与节拍网格
+
+音频按块流式读入 (见 waveform.audio_blocks)，每块切成帧后一次 rfft，幅度谱合并为对数间隔的
+BANDS 个频带 (类似 mel，低频的鼓点不会被宽带的镲片淹没)，取对数后相邻帧正向差分之和
+(spectral flux) 作为起音包络，块间保留未成帧的采样和上一帧频谱。
+速度由包络的自相关 (FFT) 在 MIN_BPM~MAX_BPM 内取峰得到 (以 PRIOR_BPM 为中心的对数高斯先验，
+抛物线插值得到小数周期)；节拍用动态规划跟踪: 每帧的累计得分为起音强度加上前一拍的最优得分，
+与前一拍的间隔偏离周期越多惩罚越大，因此节拍跟随实际起音而不会因周期误差逐渐漂移。
+相邻帧只依赖至少半个周期之前的得分，按半周期一段向量化计算。
+
+结果按内容指纹缓存在 ai_workspace/cache/beats/<指纹>.npz。
+
+用法:
+    from beat_grid import detect_beats, snap_boundaries
+
+    grid = detect_beats("bgm.wav")                    # grid.tempo (BPM), grid.beats (秒)
+    bounds = snap_boundaries([0, 4, 8, 12], grid.beats)   # 内部边界吸附到最近的节拍
+
+    python beat_grid.py <files...>
+"""
+import os
+from collections import namedtuple
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from asset_id import content_fingerprint
+from thumbnail_service import CACHE_DIR
+from waveform import audio_blocks
+
+BEAT_DIR = os.path.join(CACHE_DIR, "beats")
+# ffmpeg 解码的采样率 (PCM WAV 保留原采样率)
+SAMPLE_RATE = 22050
+# 帧长约 23ms (取 2 的幂)，帧移为半帧
+FRAME_SECONDS = 0.023
+# 对数间隔频带数及最低频率 (Hz)
+BANDS = 32
+MIN_FREQ = 30.0
+# 对数压缩系数 log(1 + C * |X|)
+COMPRESSION = 100.0
+# 起音包络减去的局部均值窗口 (秒)
+LOCAL_MEAN = 0.4
+
+MIN_BPM, MAX_BPM, PRIOR_BPM = 60.0, 200.0, 120.0
+# 先验的标准差 (倍频程)
+PRIOR_OCTAVES = 1.0
+# 节拍间隔偏离周期的惩罚系数
+TIGHTNESS = 100.0
+
+BeatGrid = namedtuple("BeatGrid", ["tempo", "beats", "hop", "offset", "onset"])
+
+
+def frame_size(sample_rate: int) -> int:
+    return 1 << int(round(np.log2(sample_rate * FRAME_SECONDS)))
+
+
+def band_starts(n_fft: int, sample_rate: int) -> np.ndarray:
+    """各频带的起始 rfft 下标 (去重后可能少于 BANDS 个)"""
+    freqs = np.geomspace(MIN_FREQ, sample_rate / 2, BANDS + 1)[:-1]
+    return np.unique(np.round(freqs * n_fft / sample_rate).astype(np.int64))
+
+
+def compute_onset(blocks, sample_rate: int) -> np.ndarray:
+    """流式计算 spectral flux 起音包络，每帧一个值 (帧移为 frame_size // 2)"""
+    n_fft = frame_size(sample_rate)
+    hop = n_fft // 2
+    window = np.hanning(n_fft).astype(np.float32)
+    starts = band_starts(n_fft, sample_rate)
+    widths = np.diff(np.append(starts, n_fft // 2 + 1)).astype(np.float32)
+    flux = []
+    carry = np.zeros(0, dtype=np.int16)
+    prev = None
+    for block in blocks:
+        samples = np.concatenate([carry, block]) if len(carry) else block
+        count = (len(samples) - n_fft) // hop + 1 if len(samples) >= n_fft else 0
+        if count <= 0:
+            carry = samples
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(samples, n_fft)[::hop][:count]
+        spectrum = np.abs(np.fft.rfft(frames * (window / 32768.0), axis=1)).astype(np.float32)
+        # 频带内取平均，宽的高频带不因包含更多 bin 而占优
+        bands = np.add.reduceat(spectrum, starts, axis=1) / widths
+        spectrum = np.log1p(COMPRESSION * bands)
+        stack = spectrum if prev is None else np.concatenate([prev[None], spectrum])
+        diff = np.maximum(np.diff(stack, axis=0), 0).sum(axis=1)
+        flux.append(diff if prev is not None else np.concatenate([[0.0], diff]).astype(np.float32))
+        prev = spectrum[-1]
+        carry = samples[count * hop:]
+    return np.concatenate(flux) if flux else np.zeros(0, dtype=np.float32)
+
+
+def _normalize(flux: np.ndarray, hop_seconds: float) -> np.ndarray:
+    """减去局部均值并半波整流，突出起音"""
+    width = max(1, int(round(LOCAL_MEAN / hop_seconds)))
+    prefix = np.concatenate([[0.0], np.cumsum(flux, dtype=np.float64)])
+    idx = np.arange(len(flux))
+    lo, hi = np.maximum(idx - width // 2, 0), np.minimum(idx + width // 2 + 1, len(flux))
+    local = (prefix[hi] - prefix[lo]) / (hi - lo)
+    return np.maximum(flux - local, 0).astype(np.float32)
+
+
+def estimate_period(onset: np.ndarray, hop_seconds: float) -> Optional[float]:
+    """节拍周期 (帧，可为小数)；包络太短或没有起音时返回 None"""
+    n = len(onset)
+    lo = int(np.floor(60.0 / (MAX_BPM * hop_seconds)))
+    hi = int(np.ceil(60.0 / (MIN_BPM * hop_seconds)))
+    if n < 2 * hi or not onset.any():
+        return None
+    centered = onset - onset.mean()
+    spectrum = np.fft.rfft(centered, 2 * n)
+    corr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2)[:hi + 2]
+    lags = np.arange(max(lo, 1), hi + 1)
+    bpm = 60.0 / (lags * hop_seconds)
+    weight = np.exp(-0.5 * (np.log2(bpm / PRIOR_BPM) / PRIOR_OCTAVES) ** 2)
+    lag = int(lags[np.argmax(corr[lags] * weight)])
+    # 抛物线插值
+    a, b, c = corr[lag - 1], corr[lag], corr[lag + 1]
+    denom = a - 2 * b + c
+    return lag + (0.5 * (a - c) / denom if denom < 0 else 0.0)
+
+
+def track_beats(onset: np.ndarray, period: float, tightness: float = TIGHTNESS) -> np.ndarray:
+    """动态规划跟踪节拍，返回节拍所在的帧"""
+    n = len(onset)
+    local = onset / (onset.std() or 1.0)
+    lags = np.arange(max(1, int(round(period / 2))), int(round(2 * period)) + 1)
+    penalty = -tightness * np.log(lags / period) ** 2
+    score = local.astype(np.float64)
+    back = np.full(n, -1, dtype=np.int64)
+    step = int(lags[0])
+    for start in range(step, n, step):
+        t = np.arange(start, min(start + step, n))
+        prev = t[:, None] - lags[None, :]
+        candidates = np.where(prev >= 0, score[np.maximum(prev, 0)] + penalty, -np.inf)
+        best = np.argmax(candidates, axis=1)
+        value = candidates[np.arange(len(t)), best]
+        linked = value > 0
+        score[t[linked]] += value[linked]
+        back[t[linked]] = prev[np.arange(len(t)), best][linked]
+
+    # 从最后两个周期内得分最高的帧回溯
+    tail = max(0, n - int(lags[-1]))
+    beat = tail + int(np.argmax(score[tail:]))
+    beats = []
+    while beat >= 0:
+        beats.append(beat)
+        beat = back[beat]
+    return np.array(beats[::-1], dtype=np.int64)
+
+
+def analyze_blocks(blocks, sample_rate: int) -> Optional[BeatGrid]:
+    n_fft = frame_size(sample_rate)
+    hop_seconds = n_fft // 2 / sample_rate
+    offset = n_fft / 2 / sample_rate
+    onset = _normalize(compute_onset(blocks, sample_rate), hop_seconds)
+    period = estimate_period(onset, hop_seconds)
+    if period is None:
+        return None
+    frames = track_beats(onset, period)
+    beats = np.round(frames * hop_seconds + offset, 6)
+    return BeatGrid(round(float(60.0 / (period * hop_seconds)), 3), beats, hop_seconds, offset, onset)
+
+
+def detect_beats(path: str, cache_dir: str = BEAT_DIR) -> Optional[BeatGrid]:
+    """音频的节拍网格 (按内容指纹缓存)，无法解码或检测不到节拍时返回 None"""
+    cache_path = os.path.join(cache_dir, f"{content_fingerprint(path)}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            return BeatGrid(float(data["tempo"]), data["beats"], float(data["hop"]), float(data["offset"]),
+                            data["onset"])
+    sample_rate, blocks = audio_blocks(path, SAMPLE_RATE)
+    try:
+        grid = analyze_blocks(blocks, sample_rate)
+    except OSError:
+        return None
+    if grid is None:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, tempo=np.float64(grid.tempo), beats=grid.beats, hop=np.float64(grid.hop),
+             offset=np.float64(grid.offset), onset=grid.onset)
+    os.replace(tmp_path, cache_path)
+    return grid
+
+
+def snap_boundaries(boundaries: Sequence[float], beats: Sequence[float], min_gap: float = 0.0) -> List[float]:
+    """把内部边界吸附到最近的节拍 (首尾不动)
+
+    吸附后与前一个边界或终点的间隔小于 min_gap 的边界保持原位。
+    """
+    bounds = [float(b) for b in boundaries]
+    beats = np.asarray(beats, dtype=np.float64)
+    if len(bounds) < 3 or len(beats) == 0:
+        return bounds
+    inner = np.asarray(bounds[1:-1])
+    right = np.clip(np.searchsorted(beats, inner), 1, len(beats) - 1) if len(beats) > 1 else np.zeros(len(inner), int)
+    left = np.maximum(right - 1, 0)
+    nearest = np.where(np.abs(beats[left] - inner) <= np.abs(beats[right] - inner), beats[left], beats[right])
+
+    result, end = [bounds[0]], bounds[-1]
+    for original, snapped in zip(inner.tolist(), nearest.tolist()):
+        if snapped - result[-1] < min_gap or end - snapped < min_gap:
+            snapped = original
+        result.append(round(snapped, 6))
+    result.append(end)
+    return result
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python beat_grid.py <files...>")
+        sys.exit(1)
+    for file_path in sys.argv[1:]:
+        t0 = time.perf_counter()
+        grid = detect_beats(file_path)
+        if grid is None:
+            print(f"FAILED  {file_path}")
+            continue
+        print(f"{file_path}: {grid.tempo:.1f} BPM, {len(grid.beats)} beats, {time.perf_counter() - t0:.2f}s")
+        print("  " + ", ".join(f"{t:.2f}" for t in grid.beats[:16]) + (" ..." if len(grid.beats) > 16 else ""))
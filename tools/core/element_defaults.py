@@ -0,0 +1,140 @@
+"""
+Element Defaults - 快照元素的默认值省略编码
+
+SDK、守护进程和前端写入的每个元素都带着十几个默认字段 (trimStart: 0、opacity: 1、
+textDecoration: "none" ...)。编码时把等于模式默认值的字段省略，解码时补回；
+元素原本就缺少的默认字段记录在 "$absent" 中，保证解码结果与原快照完全一致。
+
+编码后的快照带有版本标记 "encoding": {"defaults": 1}，没有标记的快照原样返回。
+格式与前端 src/lib/element-defaults.ts 一致。
+
+用法:
+    from element_defaults import encode_snapshot, decode_snapshot
+
+    stored = encode_snapshot(snapshot)
+    assert decode_snapshot(stored) == snapshot
+
+    python element_defaults.py <snapshot.json>   # 对比省略前后的体积和解析耗时
+"""
+import json
+from typing import Dict, List, Optional
+
+ENCODING_VERSION = 1
+ABSENT_KEY = "$absent"
+
+# 按元素类型的默认值 (与前端 DEFAULT_TEXT_ELEMENT 以及 SDK import_media 的取值一致)
+ELEMENT_DEFAULTS = {
+    "text": {
+        "trimStart": 0, "trimEnd": 0, "rotation": 0, "opacity": 1,
+        "fontSize": 48, "fontFamily": "Arial", "color": "#ffffff", "backgroundColor": "transparent",
+        "textAlign": "center", "fontWeight": "normal", "fontStyle": "normal", "textDecoration": "none",
+    },
+    "media": {
+        "trimStart": 0, "trimEnd": 0, "rotation": 0, "opacity": 1,
+        "muted": False, "volume": 1, "x": 960, "y": 540, "scale": 1,
+    },
+}
+
+
+def _same(value, default) -> bool:
+    # bool 与 int 在 Python 中相等 (False == 0)，这里必须区分
+    return type(value) is type(default) and value == default
+
+
+def encode_element(element: Dict) -> Dict:
+    defaults = ELEMENT_DEFAULTS.get(element.get("type"))
+    if not defaults:
+        return element
+    encoded = {k: v for k, v in element.items() if not (k in defaults and _same(v, defaults[k]))}
+    absent = [k for k in defaults if k not in element]
+    if absent:
+        encoded[ABSENT_KEY] = absent
+    return encoded
+
+
+def decode_element(element: Dict) -> Dict:
+    defaults = ELEMENT_DEFAULTS.get(element.get("type"))
+    if not defaults:
+        return element
+    if ABSENT_KEY not in element:
+        return {**defaults, **element}
+    absent = element[ABSENT_KEY]
+    decoded = {k: v for k, v in defaults.items() if k not in absent}
+    decoded.update(element)
+    del decoded[ABSENT_KEY]
+    return decoded
+
+
+def encode_tracks(tracks: List[Dict]) -> List[Dict]:
+    return [{**t, "elements": [encode_element(e) for e in t.get("elements", [])]} if "elements" in t else t
+            for t in tracks]
+
+
+def decode_tracks(tracks: List[Dict]) -> List[Dict]:
+    return [{**t, "elements": [decode_element(e) for e in t.get("elements", [])]} if "elements" in t else t
+            for t in tracks]
+
+
+def encoding_version(snapshot: Dict) -> Optional[int]:
+    return (snapshot.get("encoding") or {}).get("defaults")
+
+
+def encode_snapshot(snapshot: Dict) -> Dict:
+    """省略默认值并打上版本标记"""
+    if encoding_version(snapshot):
+        return snapshot
+    encoded = dict(snapshot)
+    if "tracks" in encoded:
+        encoded["tracks"] = encode_tracks(encoded["tracks"])
+    encoded["encoding"] = {**(snapshot.get("encoding") or {}), "defaults": ENCODING_VERSION}
+    return encoded
+
+
+def decode_snapshot(snapshot: Dict) -> Dict:
+    """补回默认值并去掉版本标记；没有标记的快照原样返回"""
+    version = encoding_version(snapshot)
+    if not version:
+        return snapshot
+    if version > ENCODING_VERSION:
+        raise ValueError(f"snapshot uses element defaults v{version}, this tool supports v{ENCODING_VERSION}")
+    decoded = dict(snapshot)
+    if "tracks" in decoded:
+        decoded["tracks"] = decode_tracks(decoded["tracks"])
+    encoding = {k: v for k, v in snapshot["encoding"].items() if k != "defaults"}
+    if encoding:
+        decoded["encoding"] = encoding
+    else:
+        decoded.pop("encoding")
+    return decoded
+
+
+def compare(path: str, repeat: int = 5):
+    """打印快照省略默认值前后的体积与解析耗时"""
+    import time
+
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    snapshot = decode_snapshot(snapshot)
+    encoded = encode_snapshot(snapshot)
+    assert decode_snapshot(encoded) == snapshot
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    for label, value, load in (("plain", snapshot, json.loads),
+                               ("elided", encoded, lambda text: decode_snapshot(json.loads(text)))):
+        text = json.dumps(value, ensure_ascii=False, indent=2)
+        print(f"{label:>7}: {len(text.encode('utf-8')) / 1024:>9.1f} KB  load {best(lambda: load(text)):>7.1f}ms")
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 2:
+        compare(sys.argv[1])
+    else:
+        print("Usage: python element_defaults.py <snapshot.json>")
@@ -0,0 +1,253 @@
+"""
+Filmstrip - 单次顺序解码生成视频胶片条 (雪碧图 + 帧时间索引)
+
+每个视频只启动一次 ffmpeg，从头到尾顺序解码，不做逐帧 seek:
+    fps 模式        fps 滤镜按固定间隔取帧 (默认每秒一帧)
+    keyframes 模式  只解码关键帧 (-skip_frame nokey)，关键帧位置由 ffprobe 读包得到 (不解码)
+取到的帧经 scale 缩小后由 tile 滤镜直接拼成一张雪碧图 (JPEG 或 WebP)，showinfo 滤镜
+输出每帧的实际时间，写入 <雪碧图>.json 索引。结果按内容指纹缓存在 ai_workspace/cache/filmstrips/，
+多个素材在进程池中并行生成。
+
+索引格式:
+    {"version": 1, "fingerprint", "source", "sprite", "spriteUrl", "mode", "interval",
+     "duration", "tileWidth", "tileHeight", "columns", "rows", "times": [秒, ...]}
+    第 i 帧位于第 i % columns 列、第 i // columns 行。
+
+用法:
+    from filmstrip import build_filmstrip, tile_at
+
+    index = build_filmstrip("video.mp4")                 # 失败时返回 None
+    x, y, w, h = tile_at(index, 12.5)                   # 12.5 秒附近的帧在雪碧图中的位置
+
+    python filmstrip.py [--mode fps|keyframes] [--interval 1] <files...>
+"""
+import json
+import math
+import os
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from asset_id import content_fingerprint
+from media_duration import get_media_duration
+from thumbnail_service import CACHE_DIR, MAX_WORKERS, serve_url
+
+FILMSTRIP_DIR = os.path.join(CACHE_DIR, "filmstrips")
+INDEX_VERSION = 1
+MODES = ("fps", "keyframes")
+FORMATS = ("jpg", "webp")
+DEFAULT_INTERVAL = 1.0
+TILE_WIDTH = 160
+COLUMNS = 10
+# 单张雪碧图的帧数上限，超过时自动加大取帧间隔
+MAX_FRAMES = 600
+
+_PTS_TIME = re.compile(r"pts_time:\s*(-?[\d.]+)")
+_SIZE = re.compile(r"\bs:(\d+)x(\d+)")
+
+
+def _cache_paths(fingerprint: str, mode: str, interval: float, tile_width: int, columns: int, fmt: str,
+                 cache_dir: str) -> Tuple[str, str]:
+    """(雪碧图, 索引) 路径；所有影响输出的参数都在文件名中，不同格式的索引互不覆盖"""
+    stem = os.path.join(cache_dir, f"{fingerprint}_{mode}_{interval:g}s_{tile_width}w_{columns}c")
+    return f"{stem}.{fmt}", f"{stem}.{fmt}.json"
+
+
+def _keyframe_times(src: str) -> List[float]:
+    """读取视频流关键帧的时间 (只解析包，不解码)"""
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0",
+           "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", src]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    times = []
+    for line in result.stdout.decode("utf-8", errors="replace").splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                continue
+    return sorted(times)
+
+
+def _thin(times: List[float], interval: float) -> List[int]:
+    """相邻保留帧至少间隔 interval 秒，且不超过 MAX_FRAMES，返回保留的序号"""
+    keep, last = [], -math.inf
+    for i, t in enumerate(times):
+        if t - last >= interval - 1e-6:
+            keep.append(i)
+            last = t
+    if len(keep) > MAX_FRAMES:
+        keep = [keep[i] for i in np.linspace(0, len(keep) - 1, MAX_FRAMES).round().astype(int).tolist()]
+    return keep
+
+
+def _render(src: str, sprite: str, index_path: str, fingerprint: str, mode: str, interval: float,
+            tile_width: int, columns: int) -> Optional[Dict]:
+    """进程池任务: 一次 ffmpeg 解码生成雪碧图，并写出索引"""
+    duration = get_media_duration(src) or 0.0
+    input_args = []
+    if mode == "keyframes":
+        keyframes = _keyframe_times(src)
+        keep = _thin(keyframes, interval)
+        count = len(keep)
+        input_args = ["-skip_frame", "nokey"]
+        # 关闭 skip_frame 以外的帧后，滤镜中的 n 就是关键帧序号
+        if count < len(keyframes):
+            select = "+".join(f"eq(n\\,{i})" for i in keep)
+            sampler = f"select='{select}'"
+        else:
+            sampler = "null"
+    else:
+        if duration <= 0:
+            return None
+        interval = max(interval, duration / MAX_FRAMES)
+        count = max(1, math.ceil(duration / interval))
+        sampler = f"fps=1/{interval:.6f}:round=down"
+    if count == 0:
+        return None
+
+    rows = math.ceil(count / columns)
+    grid_columns = min(columns, count)
+    filters = f"{sampler},scale={tile_width}:-2,showinfo,tile={grid_columns}x{rows}"
+    tmp = f"{sprite}.{os.getpid()}.tmp{os.path.splitext(sprite)[1]}"
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-v", "info", *input_args, "-i", src,
+           "-an", "-vf", filters, "-frames:v", "1", "-q:v", "4", tmp]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+
+    log = result.stderr.decode("utf-8", errors="replace")
+    showinfo = [line for line in log.splitlines() if "showinfo" in line]
+    times = [round(float(m.group(1)), 3) for m in map(_PTS_TIME.search, showinfo) if m][:grid_columns * rows]
+    size = next((m for m in map(_SIZE.search, showinfo) if m), None)
+    if not times or size is None or not os.path.exists(tmp):
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return None
+
+    os.replace(tmp, sprite)
+    index = {
+        "version": INDEX_VERSION,
+        "fingerprint": fingerprint,
+        "source": src,
+        "sprite": sprite,
+        "spriteUrl": serve_url(sprite),
+        "mode": mode,
+        "interval": round(interval, 6),
+        "duration": round(duration, 6),
+        "tileWidth": int(size.group(1)),
+        "tileHeight": int(size.group(2)),
+        "columns": grid_columns,
+        "rows": rows,
+        "times": times,
+    }
+    tmp_index = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_index, index_path)
+    return index
+
+
+def _load_index(index_path: str, sprite: str) -> Optional[Dict]:
+    if not os.path.exists(sprite):
+        return None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION or index.get("sprite") != sprite:
+        return None
+    return index
+
+
+def _job(path: str, mode: str, interval: float, tile_width: int, fmt: str, columns: int,
+         cache_dir: str):
+    """检查缓存；未命中时返回 _render 的参数"""
+    if mode not in MODES:
+        raise ValueError(f"unknown filmstrip mode {mode!r}, expected one of {MODES}")
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown filmstrip format {fmt!r}, expected one of {FORMATS}")
+    fingerprint = content_fingerprint(path)
+    sprite, index_path = _cache_paths(fingerprint, mode, interval, tile_width, columns, fmt, cache_dir)
+    cached = _load_index(index_path, sprite)
+    if cached is not None:
+        return cached, None
+    return None, (os.path.abspath(path), sprite, index_path, fingerprint, mode, interval, tile_width, columns)
+
+
+def build_filmstrips(paths: List[str], mode: str = "fps", interval: float = DEFAULT_INTERVAL,
+                     tile_width: int = TILE_WIDTH, fmt: str = "jpg", columns: int = COLUMNS,
+                     cache_dir: str = FILMSTRIP_DIR, max_workers: int = MAX_WORKERS) -> List[Optional[Dict]]:
+    """为多个视频生成胶片条 (并行，相同内容只生成一次)，返回与输入顺序对应的索引 (失败为 None)"""
+    os.makedirs(cache_dir, exist_ok=True)
+    results: List[Optional[Dict]] = [None] * len(paths)
+    pending: Dict[str, Tuple[tuple, List[int]]] = {}
+    for i, path in enumerate(paths):
+        try:
+            cached, args = _job(path, mode, interval, tile_width, fmt, columns, cache_dir)
+        except OSError:
+            continue
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(args[2], (args, []))[1].append(i)
+
+    if len(pending) == 1:
+        args, slots = next(iter(pending.values()))
+        index = _render(*args)
+        for i in slots:
+            results[i] = index
+    elif pending:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+            futures = [(executor.submit(_render, *args), slots) for args, slots in pending.values()]
+            for future, slots in futures:
+                index = future.result()
+                for i in slots:
+                    results[i] = index
+    return results
+
+
+def build_filmstrip(path: str, **options) -> Optional[Dict]:
+    return build_filmstrips([path], **options)[0]
+
+
+def tile_at(index: Dict, time: float) -> Tuple[int, int, int, int]:
+    """不晚于 time 的最后一帧在雪碧图中的 (x, y, w, h)"""
+    times = index["times"]
+    i = max(0, int(np.searchsorted(times, time, side="right")) - 1)
+    i = min(i, len(times) - 1)
+    w, h = index["tileWidth"], index["tileHeight"]
+    return (i % index["columns"]) * w, (i // index["columns"]) * h, w, h
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    args = sys.argv[1:]
+    options = {}
+    while len(args) >= 2 and args[0] in ("--mode", "--interval", "--format"):
+        flag, value, args = args[0], args[1], args[2:]
+        if flag == "--mode":
+            options["mode"] = value
+        elif flag == "--interval":
+            options["interval"] = float(value)
+        else:
+            options["fmt"] = value
+    if not args:
+        print("Usage: python filmstrip.py [--mode fps|keyframes] [--interval 1] [--format jpg|webp] <files...>")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    for file_path, index in zip(args, build_filmstrips(args, **options)):
+        if index is None:
+            print(f"FAILED  {file_path}")
+        else:
+            print(f"{index['sprite']}  {len(index['times'])} frames  {file_path}")
+    print(f"done in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,186 @@
+"""
+Frame Extract - 批量抽取视频帧
+
+请求为 (视频, 时间) 对，时间可以是秒数或 "first" / "last"。请求按文件分组，同一文件的
+多个时间点由一次 ffmpeg 完成: 每个时间点作为一路带 -ss 的输入 (输入端 seek 先跳到前一个
+关键帧再解码到目标时间，对长 GOP 文件也准确)，"last" 用 -sseof 从结尾前几秒解码到最后一帧，
+不再逐帧回退重试。不同文件并行处理。
+
+结果可以是 numpy 数组 (H, W, 3, uint8, RGB，经 PPM 传递，无需 OpenCV/PIL)，
+也可以是编码后的 PNG/JPEG 字节，或直接写到指定路径。
+
+用法:
+    from frame_extract import FrameRequest, extract_frames
+
+    frames = extract_frames([
+        FrameRequest("a.mp4", "first"),
+        FrameRequest("a.mp4", 12.5),
+        FrameRequest("b.mp4", "last"),
+    ])                                              # [ndarray, ndarray, ndarray]，失败为 None
+    extract_frames(requests, output="png")          # [bytes, ...]
+
+    python frame_extract.py [--out DIR] [--format png|jpg] <video[@first|last|秒]>...
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+FrameRequest = namedtuple("FrameRequest", ["path", "at"])
+
+OUTPUTS = ("array", "png", "jpg")
+_CODECS = {"array": ("ppm", "ppm"), "png": ("png", "png"), "jpg": ("mjpeg", "jpg")}
+# "last" 从结尾前多少秒开始解码 (需覆盖至少一个关键帧后的全部帧)
+LAST_FRAME_WINDOW = 3.0
+# 单次 ffmpeg 的最大输入路数，超过时分批
+MAX_INPUTS = 32
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def parse_ppm(data: bytes) -> np.ndarray:
+    """解析 ffmpeg 输出的二进制 PPM (P6, maxval 255)"""
+    fields, pos = [], 0
+    while len(fields) < 4:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos) + 1
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(data[pos:end])
+        pos = end
+    magic, width, height, _maxval = fields[0], int(fields[1]), int(fields[2]), int(fields[3])
+    if magic != b"P6":
+        raise ValueError(f"unsupported PPM type {magic!r}")
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * 3, offset=pos + 1)
+    return pixels.reshape(height, width, 3)
+
+
+def _input_args(at) -> List[str]:
+    if at == "last":
+        return ["-sseof", f"-{LAST_FRAME_WINDOW:g}"]
+    if at in (None, "first", 0):
+        return []
+    return ["-ss", f"{float(at):.6f}"]
+
+
+def _extract_file(path: str, times: Sequence, output: str, width: Optional[int]) -> List:
+    """一个文件的全部时间点 (按 MAX_INPUTS 分批，每批一次 ffmpeg)"""
+    codec, ext = _CODECS[output]
+    workdir = tempfile.mkdtemp(prefix="aicut_frames_")
+    results = []
+    try:
+        for batch_start in range(0, len(times), MAX_INPUTS):
+            batch = times[batch_start:batch_start + MAX_INPUTS]
+            cmd = ["ffmpeg", "-y", "-v", "error"]
+            for at in batch:
+                cmd += [*_input_args(at), "-i", path]
+            outputs = []
+            for k, at in enumerate(batch):
+                out = os.path.join(workdir, f"{batch_start + k}.{ext}")
+                outputs.append(out)
+                cmd += ["-map", f"{k}:v:0", "-an"]
+                # "last" 保留解码到的最后一帧 (image2 的 -update 每帧覆盖同一文件)
+                cmd += ["-update", "1"] if at == "last" else ["-frames:v", "1"]
+                if width:
+                    cmd += ["-vf", f"scale={int(width)}:-2"]
+                cmd += ["-c:v", codec, "-q:v", "2", "-f", "image2", out]
+            subprocess.run(cmd, capture_output=True, check=False)
+            for out in outputs:
+                if not os.path.exists(out) or os.path.getsize(out) == 0:
+                    results.append(None)
+                    continue
+                with open(out, "rb") as f:
+                    data = f.read()
+                results.append(parse_ppm(data) if output == "array" else data)
+    except OSError:
+        results += [None] * (len(times) - len(results))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def extract_frames(requests: Sequence[Union[FrameRequest, tuple]], output: str = "array",
+                   width: int = None, max_workers: int = MAX_WORKERS) -> List:
+    """批量抽帧，返回与请求顺序对应的结果 (ndarray 或编码字节，失败为 None)
+
+    Args:
+        requests: [(path, at)]，at 为秒数或 "first" / "last"
+        output: "array" / "png" / "jpg"
+        width: 缩放到的宽度 (高度按比例)，默认原尺寸
+    """
+    if output not in OUTPUTS:
+        raise ValueError(f"unknown frame output {output!r}, expected one of {OUTPUTS}")
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, (path, _at) in enumerate(requests):
+        groups[os.path.abspath(path)].append(i)
+
+    results: List = [None] * len(requests)
+    # 每个任务都在等待 ffmpeg 子进程，线程池即可并行，结果数组也无需跨进程传递
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+        futures = {
+            executor.submit(_extract_file, path, [requests[i][1] for i in slots], output, width): slots
+            for path, slots in groups.items() if os.path.exists(path)
+        }
+        for future, slots in futures.items():
+            for i, frame in zip(slots, future.result()):
+                results[i] = frame
+    return results
+
+
+def save_frames(requests: Sequence[Union[FrameRequest, tuple]], paths: Sequence[str],
+                width: int = None, max_workers: int = MAX_WORKERS) -> List[Optional[str]]:
+    """批量抽帧并写入对应路径 (按扩展名选择 PNG/JPEG)，返回成功写入的路径 (失败为 None)"""
+    saved: List[Optional[str]] = [None] * len(paths)
+    for output in ("png", "jpg"):
+        picked = [i for i, p in enumerate(paths)
+                  if (os.path.splitext(p)[1].lower() in (".jpg", ".jpeg")) == (output == "jpg")]
+        if not picked:
+            continue
+        frames = extract_frames([requests[i] for i in picked], output, width, max_workers)
+        for i, data in zip(picked, frames):
+            if data is None:
+                continue
+            os.makedirs(os.path.dirname(os.path.abspath(paths[i])), exist_ok=True)
+            with open(paths[i], "wb") as f:
+                f.write(data)
+            saved[i] = paths[i]
+    return saved
+
+
+def parse_spec(spec: str) -> FrameRequest:
+    """命令行参数 "video.mp4@12.5" / "video.mp4@first" / "video.mp4" (默认 last)"""
+    path, sep, at = spec.rpartition("@")
+    if not sep:
+        return FrameRequest(spec, "last")
+    return FrameRequest(path, at if at in ("first", "last") else float(at))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Extract frames from videos in one batch.")
+    parser.add_argument("specs", nargs="+", help="video[@first|last|seconds], default last")
+    parser.add_argument("--out", default=".", help="output directory")
+    parser.add_argument("--format", default="png", choices=("png", "jpg"))
+    parser.add_argument("--width", type=int, default=None, help="scale to this width")
+    args = parser.parse_args()
+
+    requests = [parse_spec(s) for s in args.specs]
+    names = [
+        f"{os.path.splitext(os.path.basename(r.path))[0]}_{r.at if isinstance(r.at, str) else f'{r.at:g}s'}.{args.format}"
+        for r in requests
+    ]
+    t0 = time.perf_counter()
+    saved = save_frames(requests, [os.path.join(args.out, n) for n in names], args.width)
+    for spec, path in zip(args.specs, saved):
+        print(f"{path or 'FAILED'}  {spec}")
+    print(f"done in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,329 @@
+"""
+Media Duration - 直接解析文件头获取音视频时长
+
+支持 WAV/RIFF、MP3 (Xing/Info、VBRI、CBR 估算、逐帧扫描)、MP4/M4A/MOV (mvhd)
+和 FLAC (STREAMINFO)。其它格式或解析失败时回退到 ffprobe。
+
+用法:
+    from media_duration import get_media_duration
+    duration = get_media_duration("voice.mp3")  # 秒，失败返回 None
+
+    python media_duration.py <files...>          # 打印时长
+    python media_duration.py bench <files...>    # 对比文件头解析与 ffprobe 耗时
+"""
+import os
+import struct
+import subprocess
+from collections import namedtuple
+from typing import Iterator, Optional
+
+# --- MP3 帧头表 ---
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+_MP3_VERSIONS = {0: 2.5, 2: 2, 3: 1}  # 1 为保留值
+
+MP3Frame = namedtuple("MP3Frame", "version layer bitrate sample_rate samples length channels")
+
+# 探测帧同步时最多向后查找的字节数
+_SYNC_SEARCH_LIMIT = 64 * 1024
+# CBR 判定时检查的连续帧数
+_CBR_PROBE_FRAMES = 8
+
+
+def parse_mp3_header(header: bytes) -> Optional[MP3Frame]:
+    """解析 4 字节 MP3 帧头，非法帧头返回 None"""
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version = _MP3_VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_idx = header[2] >> 4
+    sr_idx = (header[2] >> 2) & 0x03
+    if version is None or layer == 4 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+
+    table_version = 1 if version == 1 else 2
+    bitrate = _MP3_BITRATES[(table_version, layer)][bitrate_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sr_idx]
+    padding = (header[2] >> 1) & 0x01
+    channels = 1 if (header[3] >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version == 1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+    return MP3Frame(version, layer, bitrate, sample_rate, samples, length, channels)
+
+
+def skip_id3v2(data: bytes) -> int:
+    """返回 ID3v2 标签之后的偏移量 (没有标签时为 0)"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def find_mp3_sync(data: bytes, offset: int = 0, limit: int = _SYNC_SEARCH_LIMIT):
+    """从 offset 起查找第一个合法且后继帧头也合法的帧，返回 (offset, MP3Frame)"""
+    end = min(len(data) - 4, offset + limit)
+    pos = data.find(b"\xff", offset, end)
+    while 0 <= pos < end:
+        frame = parse_mp3_header(data[pos:pos + 4])
+        if frame and frame.length > 0:
+            nxt = pos + frame.length
+            # 若后续还有数据，要求下一帧也能对上，避免误判
+            if nxt + 4 > len(data) or parse_mp3_header(data[nxt:nxt + 4]):
+                return pos, frame
+        pos = data.find(b"\xff", pos + 1, end)
+    return None, None
+
+
+def iter_mp3_frames(data: bytes, offset: int = 0) -> Iterator[tuple]:
+    """依次产出 (offset, MP3Frame)，遇到非法帧头时尝试重新同步"""
+    pos, frame = find_mp3_sync(data, offset)
+    while frame is not None:
+        yield pos, frame
+        pos += frame.length
+        frame = parse_mp3_header(data[pos:pos + 4])
+        if frame is None and pos + 4 < len(data):
+            if data[pos:pos + 3] == b"TAG":  # ID3v1 尾标签
+                return
+            pos, frame = find_mp3_sync(data, pos)
+
+
+def _xing_offset(pos: int, frame: MP3Frame) -> int:
+    if frame.version == 1:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+    return pos + 4 + side_info
+
+
+def vbr_header_tag(data: bytes, pos: int, frame: MP3Frame) -> Optional[bytes]:
+    """首帧若是 Xing/Info/VBRI 信息帧 (不含音频)，返回其标记"""
+    xing = _xing_offset(pos, frame)
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        return data[xing:xing + 4]
+    if data[pos + 36:pos + 40] == b"VBRI":
+        return b"VBRI"
+    return None
+
+
+def xing_frame_count(data: bytes, pos: int, frame: MP3Frame) -> Optional[int]:
+    """读取首帧中的 Xing/Info 或 VBRI 头记录的总帧数"""
+    tag = vbr_header_tag(data, pos, frame)
+    if tag in (b"Xing", b"Info"):
+        xing = _xing_offset(pos, frame)
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 0x01:
+            return struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    elif tag == b"VBRI":
+        return struct.unpack(">I", data[pos + 50:pos + 54])[0]
+    return None
+
+
+def _mp3_duration(f, file_size: int) -> Optional[float]:
+    head = f.read(_SYNC_SEARCH_LIMIT)
+    start = skip_id3v2(head)
+    if start + _SYNC_SEARCH_LIMIT // 2 > len(head) and start < file_size:
+        # ID3 标签很大 (常见于内嵌封面)，从标签之后重新读取
+        f.seek(start)
+        head = f.read(_SYNC_SEARCH_LIMIT)
+        base, start = start, 0
+    else:
+        base = 0
+
+    pos, frame = find_mp3_sync(head, start)
+    if frame is None:
+        return None
+
+    total_frames = xing_frame_count(head, pos, frame)
+    if total_frames:
+        return total_frames * frame.samples / frame.sample_rate
+
+    # 没有 VBR 头：若前几帧码率一致，按 CBR 用文件大小估算
+    probe = []
+    for probe_pos, probe_frame in iter_mp3_frames(head, pos):
+        probe.append(probe_frame.bitrate)
+        if len(probe) >= _CBR_PROBE_FRAMES:
+            break
+    audio_bytes = file_size - base - pos
+    f.seek(max(0, file_size - 128))
+    if f.read(3) == b"TAG":
+        audio_bytes -= 128
+    if len(set(probe)) == 1:
+        return audio_bytes * 8 / frame.bitrate
+
+    # VBR 且无头信息：逐帧扫描
+    f.seek(base)
+    data = f.read()
+    samples = sum(fr.samples for _, fr in iter_mp3_frames(data, pos))
+    return samples / frame.sample_rate
+
+
+def _wav_duration(f, file_size: int) -> Optional[float]:
+    header = f.read(12)
+    if header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+    byte_rate = None
+    while True:
+        chunk = f.read(8)
+        if len(chunk) < 8:
+            return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(chunk_size)
+            byte_rate = struct.unpack("<I", fmt[8:12])[0]
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if not byte_rate:
+                return None
+            if chunk_size == 0xFFFFFFFF or f.tell() + chunk_size > file_size:
+                # 流式写入或被截断的文件，以实际数据长度为准
+                chunk_size = file_size - f.tell()
+            return chunk_size / byte_rate
+        else:
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+
+def _find_box(f, box_type: bytes, end: int) -> Optional[tuple]:
+    """在 [当前位置, end) 内查找指定类型的 box，返回 (payload_offset, payload_size)"""
+    while f.tell() + 8 <= end:
+        box_start = f.tell()
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header_size = 16
+        elif size == 0:
+            size = end - box_start
+        if size < header_size:
+            return None
+        if kind == box_type:
+            return box_start + header_size, size - header_size
+        f.seek(box_start + size)
+    return None
+
+
+def _mp4_duration(f, file_size: int) -> Optional[float]:
+    moov = _find_box(f, b"moov", file_size)
+    if not moov:
+        return None
+    f.seek(moov[0])
+    mvhd = _find_box(f, b"mvhd", moov[0] + moov[1])
+    if not mvhd:
+        return None
+    f.seek(mvhd[0])
+    version = f.read(4)[0]
+    if version == 1:
+        f.seek(16, os.SEEK_CUR)
+        timescale, duration = struct.unpack(">IQ", f.read(12))
+    else:
+        f.seek(8, os.SEEK_CUR)
+        timescale, duration = struct.unpack(">II", f.read(8))
+    if not timescale or duration in (0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF):
+        return None
+    return duration / timescale
+
+
+def _flac_duration(f, file_size: int) -> Optional[float]:
+    if f.read(4) != b"fLaC":
+        return None
+    block_header = f.read(4)
+    if block_header[0] & 0x7F != 0:  # 第一个元数据块必须是 STREAMINFO
+        return None
+    info = f.read(34)
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def read_header_duration(file_path: str) -> Optional[float]:
+    """仅通过解析文件头获取时长，不支持或解析失败时返回 None"""
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, "rb") as f:
+            magic = f.read(12)
+            f.seek(0)
+            if magic[:4] == b"RIFF" and magic[8:12] == b"WAVE":
+                return _wav_duration(f, file_size)
+            if magic[4:8] == b"ftyp":
+                return _mp4_duration(f, file_size)
+            if magic[:4] == b"fLaC":
+                return _flac_duration(f, file_size)
+            if magic[:3] == b"ID3" or parse_mp3_header(magic[:4]):
+                return _mp3_duration(f, file_size)
+    except (OSError, struct.error, IndexError, ZeroDivisionError):
+        pass
+    return None
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """使用 ffprobe 获取媒体文件时长"""
+    try:
+        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', file_path]
+        result = subprocess.run(cmd, capture_output=True, check=False)
+        if result.returncode == 0:
+            return float(result.stdout.decode('utf-8', errors='replace').strip())
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_media_duration(file_path: str) -> Optional[float]:
+    """获取媒体时长（秒）：优先解析文件头，失败时回退到 ffprobe"""
+    duration = read_header_duration(file_path)
+    if duration is None:
+        duration = probe_duration(file_path)
+    return duration
+
+
+def benchmark(files, iterations: int = 200):
+    """对比文件头解析与 ffprobe 的单文件耗时"""
+    import time
+
+    print(f"{'file':<40} {'header':>12} {'ffprobe':>12} {'duration':>10}")
+    for path in files:
+        t0 = time.perf_counter()
+        for _ in range(iterations):
+            duration = read_header_duration(path)
+        header_us = (time.perf_counter() - t0) / iterations * 1e6
+
+        t0 = time.perf_counter()
+        probed = probe_duration(path)
+        probe_ms = (time.perf_counter() - t0) * 1000
+        probe_col = f"{probe_ms:.1f} ms" if probed is not None else "n/a"
+        dur_col = f"{duration:.3f}s" if duration is not None else "n/a"
+        print(f"{os.path.basename(path)[:40]:<40} {header_us:>9.1f} us {probe_col:>12} {dur_col:>10}")
+
+
+if __name__ == "__main__":
+    import sys
+    args = sys.argv[1:]
+    if args and args[0] == "bench":
+        benchmark(args[1:])
+    elif args:
+        for path in args:
+            print(f"{path}: {get_media_duration(path)}")
+    else:
+        print("Usage: python media_duration.py [bench] <files...>")
@@ -0,0 +1,199 @@
+"""
+Narration - 把逐句配音拼接为单个无缝旁白文件，并记录每段偏移
+
+MP3 按帧直接拼接 (去掉 ID3/Xing 头，不重新编码)，段间空白用静音帧填充；
+WAV 直接拼接 PCM 数据，偏移精确到采样。格式不一致时回退到 ffmpeg 重新编码。
+每段之前的空白按 目标起点 - 已输出的实际时长 计算，MP3 整帧取整的误差不会逐段累积
+(每段偏差不超过半帧)，实际偏移记录在返回的 segments 中。
+
+用法:
+    from narration import build_narration
+
+    meta = build_narration(["s01.mp3", "s02.mp3"], "narration.mp3", starts=[0.0, 2.4])
+    # meta["segments"] -> [{"id": "0", "offset": 0.0, "duration": 2.4}, ...]
+    # 同时写出 narration.mp3.json
+"""
+import json
+import os
+import struct
+import subprocess
+import tempfile
+from typing import Dict, Optional, Sequence
+
+from media_duration import get_media_duration, iter_mp3_frames, parse_mp3_header, skip_id3v2, vbr_header_tag
+
+
+def _mp3_frames(data: bytes):
+    """返回 (帧数据列表, 首帧信息)，跳过 ID3 标签和 Xing/Info/VBRI 头帧"""
+    frames = []
+    first = None
+    for pos, frame in iter_mp3_frames(data, skip_id3v2(data)):
+        if first is None:
+            first = frame
+            if vbr_header_tag(data, pos, frame):
+                continue
+        frames.append(data[pos:pos + frame.length])
+    return frames, first
+
+
+def silent_mp3_frame(template: bytes) -> bytes:
+    """以 template 帧头生成一个静音帧 (侧信息全零，解码为静音)"""
+    header = bytearray(template[:4])
+    header[1] |= 0x01   # 关闭 CRC
+    header[2] &= ~0x02  # 去掉 padding
+    frame = parse_mp3_header(bytes(header))
+    return bytes(header) + b"\x00" * (frame.length - 4)
+
+
+def _same_format(a, b) -> bool:
+    return (a.version, a.layer, a.sample_rate, a.channels) == (b.version, b.layer, b.sample_rate, b.channels)
+
+
+def concat_mp3(parts: Sequence[bytes], starts: Optional[Sequence[float]] = None):
+    """按帧拼接 MP3，starts[i] 为第 i 段期望的起始时间 (缺省时紧密拼接)
+
+    返回 (音频数据, [(offset, duration), ...])；格式不一致时返回 None。
+    """
+    out = bytearray()
+    offsets = []
+    clock = 0.0
+    reference = None
+    silence = None
+    for i, data in enumerate(parts):
+        frames, info = _mp3_frames(data)
+        if info is None:
+            return None
+        if reference is None:
+            reference, silence = info, silent_mp3_frame(frames[0] if frames else data)
+        elif not _same_format(reference, info):
+            return None
+        frame_time = reference.samples / reference.sample_rate
+
+        gap = starts[i] - clock if starts else 0.0
+        for _ in range(max(0, int(round(gap / frame_time)))):
+            out.extend(silence)
+            clock += frame_time
+
+        offsets.append((clock, len(frames) * frame_time))
+        for frame in frames:
+            out.extend(frame)
+        clock += len(frames) * frame_time
+    return bytes(out), offsets
+
+
+def _read_wav(path: str):
+    """返回 (fmt 块, PCM 数据)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        return None, None
+    pos, fmt, pcm = 12, None, None
+    while pos + 8 <= len(data):
+        chunk_id, size = data[pos:pos + 4], struct.unpack("<I", data[pos + 4:pos + 8])[0]
+        body = data[pos + 8:pos + 8 + size]
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            pcm = body
+        pos += 8 + size + (size % 2)
+    return fmt, pcm
+
+
+def concat_wav(paths: Sequence[str], starts: Optional[Sequence[float]] = None):
+    """拼接 PCM WAV，starts 含义同 concat_mp3，偏移精确到采样；格式不一致时返回 None"""
+    fmt = None
+    chunks = []
+    offsets = []
+    total_bytes = 0
+    for i, path in enumerate(paths):
+        part_fmt, pcm = _read_wav(path)
+        if part_fmt is None or pcm is None or (fmt is not None and part_fmt != fmt):
+            return None
+        fmt = part_fmt
+        block_align = struct.unpack("<H", fmt[12:14])[0]
+        byte_rate = struct.unpack("<I", fmt[8:12])[0]
+        gap = starts[i] - total_bytes / byte_rate if starts else 0.0
+        gap_bytes = max(0, int(round(gap * byte_rate / block_align))) * block_align
+        if gap_bytes:
+            chunks.append(b"\x00" * gap_bytes)
+            total_bytes += gap_bytes
+        offsets.append((total_bytes / byte_rate, len(pcm) / byte_rate))
+        chunks.append(pcm)
+        total_bytes += len(pcm)
+    header = b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + total_bytes) + b"WAVE"
+    header += b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", total_bytes)
+    return header + b"".join(chunks), offsets
+
+
+def _concat_ffmpeg(paths: Sequence[str], out_path: str, starts: Optional[Sequence[float]] = None):
+    """格式不一致时用 ffmpeg 重新编码拼接 (间隔用 adelay 实现)"""
+    cmd = ["ffmpeg", "-y"]
+    filters = []
+    offsets = []
+    clock = 0.0
+    for i, path in enumerate(paths):
+        cmd += ["-i", path]
+        if starts:
+            clock = max(clock, starts[i])
+        duration = get_media_duration(path) or 0.0
+        offsets.append((clock, duration))
+        delay_ms = int(round(clock * 1000))
+        filters.append(f"[{i}:a]aresample=48000,adelay={delay_ms}:all=1[a{i}]")
+        clock += duration
+    mix = "".join(f"[a{i}]" for i in range(len(paths)))
+    filters.append(f"{mix}amix=inputs={len(paths)}:normalize=0[out]")
+    cmd += ["-filter_complex", ";".join(filters), "-map", "[out]", out_path]
+    subprocess.run(cmd, capture_output=True, check=True)
+    return offsets
+
+
+def build_narration(segment_files: Sequence[str], out_path: str, starts: Optional[Sequence[float]] = None,
+                    segment_ids: Optional[Sequence[str]] = None) -> Dict:
+    """把分段音频合成一个旁白文件
+
+    Args:
+        segment_files: 按时间顺序排列的分段音频
+        out_path: 输出路径 (扩展名应与分段一致)
+        starts: 每段期望的起始时间 (相对旁白开头)，缺省时紧密拼接；实际偏移见返回的 segments
+        segment_ids: 写入元数据的段标识 (默认用下标)
+
+    Returns:
+        {"file", "duration", "reencoded", "segments": [{"id", "offset", "duration"}]}，
+        并写出同名 .json 元数据文件
+    """
+    result = None
+    ext = os.path.splitext(out_path)[1].lower()
+    if ext == ".mp3":
+        parts = []
+        for path in segment_files:
+            with open(path, "rb") as f:
+                parts.append(f.read())
+        result = concat_mp3(parts, starts)
+    elif ext == ".wav":
+        result = concat_wav(segment_files, starts)
+
+    reencoded = result is None
+    if result is not None:
+        data, offsets = result
+        tmp_fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)), suffix=ext)
+        with os.fdopen(tmp_fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, out_path)
+    else:
+        offsets = _concat_ffmpeg(segment_files, out_path, starts)
+
+    ids = segment_ids or [str(i) for i in range(len(segment_files))]
+    segments = [
+        {"id": seg_id, "offset": round(offset, 6), "duration": round(duration, 6)}
+        for seg_id, (offset, duration) in zip(ids, offsets)
+    ]
+    total = segments[-1]["offset"] + segments[-1]["duration"] if segments else 0.0
+    meta = {
+        "file": os.path.basename(out_path),
+        "duration": round(total, 6),
+        "reencoded": reencoded,
+        "segments": segments,
+    }
+    with open(out_path + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
@@ -0,0 +1,375 @@
+"""
+Perceptual Hash - 素材感知哈希索引，检测重复与近似重复的图片/视频
+
+每个素材计算 64 位 pHash (32x32 灰度图 DCT 低频 8x8 与中位数比较) 和 dHash (9x8 灰度图
+相邻像素比较)；视频在 10%/50%/90% 处各取一帧。解码由 frame_extract 批量完成 (ffmpeg 直接
+缩小到 64 像素宽)，哈希对整批图像向量化计算。结果按内容指纹缓存在
+ai_workspace/cache/perceptual_hashes.json，同一内容只计算一次。
+
+查询用多索引哈希 (64 位分 4 段，按抽屉原理只需在各段查找小半径内的值)，两个素材类型相同、且对应位置的每一帧
+pHash 与 dHash 距离都不超过阈值时视为近似重复；聚类用并查集合并所有近似重复对。
+取帧失败的位置保留为 None (不压缩列表，其余帧仍与对方同一时间点的帧比较)，比较时跳过该位置，
+至少要有一个位置双方都有帧。
+
+用法:
+    from perceptual_hash import PerceptualIndex, DuplicateFinder
+
+    index = PerceptualIndex()
+    signatures = index.update(paths)        # {path: Signature}，未缓存的才解码
+    index.save()
+    finder = DuplicateFinder(signatures)
+    finder.near(paths[0])                   # 与该素材近似重复的其它素材
+    finder.clusters()                       # [[path, ...], ...]，每组至少两个
+
+    python perceptual_hash.py [--radius 8] <files or dirs...>     # 打印重复分组
+"""
+import json
+import os
+from collections import namedtuple
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from asset_id import content_fingerprint
+from frame_extract import extract_frames
+from media_duration import get_media_duration
+from thumbnail_service import CACHE_DIR
+
+HASH_CACHE = os.path.join(CACHE_DIR, "perceptual_hashes.json")
+CACHE_VERSION = 2
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+VIDEO_EXTS = {".mp4", ".mov", ".webm", ".mkv", ".avi"}
+# 视频取帧位置 (时长的比例)
+VIDEO_SAMPLES = (0.1, 0.5, 0.9)
+# 解码宽度，足够缩小到 32x32
+DECODE_WIDTH = 64
+# 汉明距离阈值 (64 位中不同的位数)
+PHASH_RADIUS = 8
+DHASH_RADIUS = 10
+
+Signature = namedtuple("Signature", ["kind", "phash", "dhash"])
+
+
+def media_kind(path: str) -> Optional[str]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in IMAGE_EXTS:
+        return "image"
+    if ext in VIDEO_EXTS:
+        return "video"
+    return None
+
+
+def _resize(gray: np.ndarray, height: int, width: int) -> np.ndarray:
+    """区域平均缩小 (放大时取最近邻)"""
+    for axis, size in ((0, height), (1, width)):
+        n = gray.shape[axis]
+        if n >= size:
+            edges = np.linspace(0, n, size + 1).astype(np.int64)
+            sums = np.add.reduceat(gray, edges[:-1], axis=axis)
+            counts = np.diff(edges).reshape((-1, 1) if axis == 0 else (1, -1))
+            gray = sums / counts
+        else:
+            gray = np.take(gray, (np.arange(size) * n // size), axis=axis)
+    return gray
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT32 = _dct_matrix(32)
+_LUMA = np.array([0.299, 0.587, 0.114])
+
+
+def _pack(bits: np.ndarray) -> List[int]:
+    """(N, 64) bool -> N 个 64 位整数"""
+    return np.packbits(bits, axis=1).view(">u8").ravel().tolist()
+
+
+def hash_frames(frames: Sequence[Optional[np.ndarray]]) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+    """RGB 帧 (H, W, 3) -> (pHash 列表, dHash 列表)，帧为 None 的位置哈希也为 None"""
+    present = [i for i, frame in enumerate(frames) if frame is not None]
+    if len(present) < len(frames):
+        phash, dhash = hash_frames([frames[i] for i in present]) if present else ([], [])
+        full_p, full_d = [None] * len(frames), [None] * len(frames)
+        for i, p, d in zip(present, phash, dhash):
+            full_p[i], full_d[i] = p, d
+        return full_p, full_d
+    if not frames:
+        return [], []
+    grays = [frame.astype(np.float64) @ _LUMA for frame in frames]
+    large = np.stack([_resize(g, 32, 32) for g in grays])
+    small = np.stack([_resize(g, 8, 9) for g in grays])
+
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT32, large, _DCT32)[:, :8, :8].reshape(len(frames), 64)
+    median = np.median(coeffs[:, 1:], axis=1, keepdims=True)
+    phash = _pack(coeffs > median)
+    dhash = _pack((small[:, :, 1:] > small[:, :, :-1]).reshape(len(frames), 64))
+    return phash, dhash
+
+
+def _sample_times(path: str, kind: str) -> List:
+    if kind == "image":
+        return ["first"]
+    duration = get_media_duration(path)
+    if not duration:
+        return ["first"]
+    return [round(duration * ratio, 3) for ratio in VIDEO_SAMPLES]
+
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """uint64 数组逐元素的置位数"""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class PerceptualIndex:
+    """按内容指纹缓存的素材签名"""
+
+    def __init__(self, cache_path: str = HASH_CACHE):
+        self.cache_path = cache_path
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            if cache.get("version") == CACHE_VERSION:
+                self.entries = cache.get("hashes", {})
+        except (OSError, ValueError):
+            pass
+
+    def update(self, paths: Iterable[str]) -> Dict[str, Signature]:
+        """返回各图片/视频文件的签名，缓存中没有的批量解码计算"""
+        fingerprints, missing = {}, {}
+        for path in paths:
+            kind = media_kind(path)
+            if kind is None:
+                continue
+            try:
+                fingerprint = content_fingerprint(path)
+            except OSError:
+                continue
+            fingerprints[path] = (fingerprint, kind)
+            if fingerprint not in self.entries:
+                missing.setdefault(fingerprint, (path, kind))
+
+        requests, owners = [], []
+        for fingerprint, (path, kind) in missing.items():
+            for at in _sample_times(path, kind):
+                requests.append((path, at))
+                owners.append(fingerprint)
+        frames = extract_frames(requests, output="array", width=DECODE_WIDTH) if requests else []
+        # 取帧失败的位置保留 None，各帧与对方同一取样时间的帧对应
+        decoded: Dict[str, List[Optional[np.ndarray]]] = {}
+        for fingerprint, frame in zip(owners, frames):
+            decoded.setdefault(fingerprint, []).append(frame)
+        for fingerprint, sampled in decoded.items():
+            if all(frame is None for frame in sampled):
+                continue
+            phash, dhash = hash_frames(sampled)
+            self.entries[fingerprint] = {
+                "kind": missing[fingerprint][1],
+                "phash": [None if h is None else f"{h:016x}" for h in phash],
+                "dhash": [None if h is None else f"{h:016x}" for h in dhash],
+            }
+
+        signatures = {}
+        for path, (fingerprint, kind) in fingerprints.items():
+            entry = self.entries.get(fingerprint)
+            if entry:
+                signatures[path] = Signature(
+                    kind,
+                    tuple(None if h is None else int(h, 16) for h in entry["phash"]),
+                    tuple(None if h is None else int(h, 16) for h in entry["dhash"]),
+                )
+        return signatures
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "hashes": self.entries}, f)
+        os.replace(tmp_path, self.cache_path)
+
+
+class MultiIndexHash:
+    """64 位哈希的多索引哈希 (4 段 16 位)
+
+    两个哈希距离不超过 r 时，至少有一段的距离不超过 r // 4 (抽屉原理)。每段建一张
+    段值 -> 序号的桶表，查询时把该段与所有不超过 r // 4 位的翻转掩码异或后查表，
+    得到候选再核对完整距离。
+    自连接 (pairs) 对所有哈希一次性向量化完成。
+    """
+    CHUNKS = 4
+    CHUNK_BITS = 16
+    BLOCK = 4096
+
+    def __init__(self, hashes: Sequence[int], radius: int = PHASH_RADIUS):
+        self.hashes = np.array(hashes, dtype=np.uint64)
+        self.radius = radius
+        all_masks = np.arange(1 << self.CHUNK_BITS, dtype=np.uint64)
+        self.masks = all_masks[popcount64(all_masks) <= radius // self.CHUNKS].astype(np.int64)
+        # 每段: 按段值排序的序号 + 每个段值在其中的起点与个数 (16 位可以直接查表)
+        self.tables = []
+        for chunk in self._chunks(self.hashes):
+            order = np.argsort(chunk, kind="stable")
+            sizes = np.bincount(chunk, minlength=1 << self.CHUNK_BITS)
+            self.tables.append((order, np.cumsum(sizes) - sizes, sizes))
+
+    def _chunks(self, hashes: np.ndarray) -> List[np.ndarray]:
+        mask = np.uint64((1 << self.CHUNK_BITS) - 1)
+        return [((hashes >> np.uint64(self.CHUNK_BITS * j)) & mask).astype(np.int64)
+                for j in range(self.CHUNKS)]
+
+    def _candidates(self, hashes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(查询序号, 候选序号) 对，可能重复；查询按块处理以限制探测数组的大小"""
+        queries, candidates = [], []
+        for block in range(0, len(hashes), self.BLOCK):
+            for chunk, (order, offsets, sizes) in zip(self._chunks(hashes[block:block + self.BLOCK]), self.tables):
+                probes = (chunk[:, None] ^ self.masks[None, :]).ravel()
+                lo, counts = offsets[probes], sizes[probes]
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                queries.append(block + np.repeat(np.arange(probes.size) // len(self.masks), counts))
+                candidates.append(order[np.repeat(lo, counts) + within])
+        if not queries:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(queries), np.concatenate(candidates)
+
+    def query(self, value: int) -> List[Tuple[int, int]]:
+        """距离不超过 radius 的全部 (距离, 序号)，按距离排序"""
+        _, candidates = self._candidates(np.array([value], dtype=np.uint64))
+        candidates = np.unique(candidates)
+        distances = popcount64(self.hashes[candidates] ^ np.uint64(value))
+        keep = distances <= self.radius
+        return sorted(zip(distances[keep].tolist(), candidates[keep].tolist()))
+
+    def pairs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """所有距离不超过 radius 的序号对 (i < j)"""
+        left, right = self._candidates(self.hashes)
+        keep = left < right
+        packed = np.unique(left[keep] * len(self.hashes) + right[keep])
+        left, right = packed // len(self.hashes), packed % len(self.hashes)
+        close = popcount64(self.hashes[left] ^ self.hashes[right]) <= self.radius
+        return left[close], right[close]
+
+
+class DuplicateFinder:
+    """在一组签名中查找近似重复"""
+
+    def __init__(self, signatures: Dict[Hashable, Signature], radius: int = PHASH_RADIUS,
+                 dhash_radius: int = DHASH_RADIUS):
+        self.signatures = signatures
+        self.keys = list(signatures)
+        self.radius = radius
+        self.dhash_radius = dhash_radius
+        # 每个取样位置一个索引 (只含该位置有帧的素材): 近似重复要求双方都有帧的每个位置都匹配，
+        # 且至少有一个这样的位置，因此必然在某个位置的索引中互为候选
+        self.indexes = []
+        for position in range(max((len(sig.phash) for sig in signatures.values()), default=0)):
+            members = [i for i, key in enumerate(self.keys)
+                       if len(signatures[key].phash) > position and signatures[key].phash[position] is not None]
+            hashes = [signatures[self.keys[i]].phash[position] for i in members]
+            self.indexes.append((np.array(members, dtype=np.int64), MultiIndexHash(hashes, radius)))
+
+    def _matches(self, a: Signature, b: Signature) -> bool:
+        if a.kind != b.kind or len(a.phash) != len(b.phash):
+            return False
+        compared = False
+        for pa, pb, da, db in zip(a.phash, b.phash, a.dhash, b.dhash):
+            if pa is None or pb is None:
+                continue
+            if hamming(pa, pb) > self.radius or hamming(da, db) > self.dhash_radius:
+                return False
+            compared = True
+        return compared
+
+    def near(self, key: Hashable, signature: Signature = None) -> List[Hashable]:
+        """与 key (或给定签名) 近似重复的其它素材，按距离排序"""
+        signature = signature or self.signatures[key]
+        best: Dict[int, int] = {}
+        for (members, index), value in zip(self.indexes, signature.phash):
+            if value is None:
+                continue
+            for distance, j in index.query(value):
+                i = int(members[j])
+                best[i] = min(distance, best.get(i, distance))
+        return [self.keys[i] for _, i in sorted((d, i) for i, d in best.items())
+                if self.keys[i] != key and self._matches(signature, self.signatures[self.keys[i]])]
+
+    def clusters(self) -> List[List[Hashable]]:
+        """所有近似重复分组 (并查集)，组内与组间均按输入顺序"""
+        parent = list(range(len(self.keys)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        packed = []
+        for members, index in self.indexes:
+            left, right = index.pairs()
+            packed.append(members[left] * len(self.keys) + members[right])
+        pairs = np.unique(np.concatenate(packed)) if packed else np.zeros(0, dtype=np.int64)
+        for i, j in zip((pairs // len(self.keys)).tolist(), (pairs % len(self.keys)).tolist()):
+            if self._matches(self.signatures[self.keys[i]], self.signatures[self.keys[j]]):
+                a, b = find(i), find(j)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        groups: Dict[int, List[Hashable]] = {}
+        for i, key in enumerate(self.keys):
+            groups.setdefault(find(i), []).append(key)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+def collect_files(targets: Iterable[str]) -> List[str]:
+    """展开目录 (递归，跳过隐藏文件和 _thumbnails)，只保留图片/视频"""
+    files = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, names in os.walk(target):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d != "_thumbnails")
+                files.extend(os.path.join(root, n) for n in sorted(names)
+                             if not n.startswith(".") and media_kind(n))
+        elif media_kind(target):
+            files.append(target)
+    return files
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    args = sys.argv[1:]
+    radius = PHASH_RADIUS
+    if len(args) >= 2 and args[0] == "--radius":
+        radius, args = int(args[1]), args[2:]
+    if not args:
+        print("Usage: python perceptual_hash.py [--radius 8] <files or dirs...>")
+        sys.exit(1)
+
+    t0 = time.perf_counter()
+    index = PerceptualIndex()
+    signatures = index.update(collect_files(args))
+    index.save()
+    clusters = DuplicateFinder(signatures, radius).clusters()
+    for n, group in enumerate(clusters, 1):
+        print(f"[{n}] {len(group)} files")
+        for path in group:
+            print(f"    {path}")
+    print(f"{len(signatures)} files, {len(clusters)} duplicate groups in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,246 @@
+"""
+Proxy Media - 后台生成低分辨率代理视频用于编辑预览
+
+高分辨率或长 GOP 的素材 (录屏、4K/HD 下载) 在预览和拖动时需要解码全尺寸画面。这里把它们
+转码为 PROXY_HEIGHT 高度、全关键帧 (-g 1，任意位置都能直接解码) 的 H.264 代理，按内容指纹
+缓存在 ai_workspace/cache/proxies/。原文件保持不变，导出仍使用原文件。
+
+ProxyQueue 是有上限的后台队列: 任务按优先级 (数值越小越先执行) 和提交顺序出队，同一内容的
+重复提交合并为一个任务 (优先级取更高者)；排队中或正在转码的任务都可以取消 (终止 ffmpeg 进程)。
+
+用法:
+    from proxy_media import ProxyQueue, PRIORITY_HIGH
+
+    queue = ProxyQueue(on_done=lambda job: print(job.source, job.proxy_path))
+    job = queue.submit("screen_capture.mp4")
+    queue.submit("preview_now.mp4", priority=PRIORITY_HIGH)
+    queue.cancel("screen_capture.mp4")
+
+    python proxy_media.py <files...>            # 依次生成代理并打印路径
+"""
+import heapq
+import itertools
+import os
+import subprocess
+import threading
+from typing import Callable, Dict, List, Optional
+
+from asset_id import content_fingerprint
+from thumbnail_service import CACHE_DIR
+
+PROXY_DIR = os.path.join(CACHE_DIR, "proxies")
+PROXY_HEIGHT = 540
+# 源视频高度不超过该值时不需要代理
+MIN_SOURCE_HEIGHT = 720
+PROXY_CRF = 28
+# 关键帧间隔，1 表示全关键帧
+PROXY_GOP = 1
+MAX_WORKERS = 1
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, SKIPPED = "queued", "running", "done", "failed", "cancelled", "skipped"
+
+
+def proxy_path_for(path: str, cache_dir: str = PROXY_DIR) -> str:
+    return os.path.join(cache_dir, f"{content_fingerprint(path)}_{PROXY_HEIGHT}p.mp4")
+
+
+def probe_height(path: str) -> Optional[int]:
+    cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=height",
+           "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, check=True)
+        return int(result.stdout.decode("utf-8", errors="replace").split()[0])
+    except (OSError, subprocess.CalledProcessError, ValueError, IndexError):
+        return None
+
+
+def needs_proxy(path: str) -> bool:
+    height = probe_height(path)
+    return height is not None and height > MIN_SOURCE_HEIGHT
+
+
+def transcode_command(src: str, dst: str) -> List[str]:
+    return [
+        "ffmpeg", "-y", "-v", "error", "-i", src,
+        "-vf", f"scale=-2:'min({PROXY_HEIGHT},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "fastdecode", "-crf", str(PROXY_CRF),
+        "-g", str(PROXY_GOP), "-bf", "0", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-b:a", "96k", "-movflags", "+faststart", dst,
+    ]
+
+
+class ProxyJob:
+    """一个代理任务；status 依次为 queued -> running -> done/failed，或 cancelled/skipped"""
+
+    def __init__(self, key: str, source: str, proxy_path: str, priority: int):
+        self.key = key
+        self.source = source
+        self.proxy_path = proxy_path
+        self.priority = priority
+        self.status = QUEUED
+        self.process: Optional[subprocess.Popen] = None
+        self.done = threading.Event()
+
+    def as_dict(self) -> Dict:
+        return {"source": self.source, "proxyPath": self.proxy_path, "priority": self.priority,
+                "status": self.status}
+
+
+class ProxyQueue:
+    """有上限的后台代理转码队列 (优先级 + 合并 + 可取消)"""
+
+    def __init__(self, cache_dir: str = PROXY_DIR, max_workers: int = MAX_WORKERS,
+                 on_done: Callable[[ProxyJob], None] = None, check_source: bool = True):
+        self.cache_dir = cache_dir
+        self.on_done = on_done
+        self.check_source = check_source
+        self._heap = []
+        self._jobs: Dict[str, ProxyJob] = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, path: str, priority: int = PRIORITY_NORMAL) -> ProxyJob:
+        """提交任务；代理已存在时返回已完成的任务，同一内容正在排队或转码时返回该任务"""
+        source = os.path.abspath(path)
+        key = content_fingerprint(source)
+        proxy_path = proxy_path_for(source, self.cache_dir)
+        with self._cond:
+            job = self._jobs.get(key)
+            if job is not None and job.status in (QUEUED, RUNNING):
+                if job.status == QUEUED and priority < job.priority:
+                    # 旧的堆条目出队时会因优先级不一致被忽略
+                    job.priority = priority
+                    heapq.heappush(self._heap, (priority, next(self._counter), job))
+                    self._cond.notify()
+                return job
+            job = ProxyJob(key, source, proxy_path, priority)
+            self._jobs[key] = job
+            cached = os.path.exists(proxy_path)
+            if cached:
+                job.status = DONE
+            else:
+                heapq.heappush(self._heap, (priority, next(self._counter), job))
+                self._cond.notify()
+        if cached:
+            # 已缓存的代理同样通知 on_done (新导入的素材需要写入 proxyUrl)
+            self._finish(job)
+        return job
+
+    def _find(self, path: str) -> Optional[ProxyJob]:
+        try:
+            return self._jobs.get(content_fingerprint(path))
+        except OSError:
+            return next((j for j in self._jobs.values() if j.source == os.path.abspath(path)), None)
+
+    def cancel(self, path: str) -> bool:
+        """取消排队中或正在转码的任务，返回是否取消了任务"""
+        with self._cond:
+            job = self._find(path)
+            if job is None or job.status not in (QUEUED, RUNNING):
+                return False
+            running = job.status == RUNNING
+            job.status = CANCELLED
+            process = job.process
+        if running and process is not None:
+            process.terminate()
+        if not running:
+            self._finish(job)
+        return True
+
+    def status(self) -> List[Dict]:
+        with self._cond:
+            return [job.as_dict() for job in self._jobs.values()]
+
+    def shutdown(self, cancel_pending: bool = True):
+        with self._cond:
+            self._closed = True
+            pending = [job for job in self._jobs.values() if job.status in (QUEUED, RUNNING)]
+            self._cond.notify_all()
+        if cancel_pending:
+            for job in pending:
+                self.cancel(job.source)
+        for worker in self._workers:
+            worker.join()
+
+    def _next_job(self) -> Optional[ProxyJob]:
+        with self._cond:
+            while True:
+                while self._heap:
+                    priority, _, job = heapq.heappop(self._heap)
+                    if job.status == QUEUED and job.priority == priority:
+                        job.status = RUNNING
+                        return job
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: ProxyJob):
+        # 标记 RUNNING 之后、启动 ffmpeg 之前被取消的任务 cancel() 不会通知，由这里调用 _finish
+        if self.check_source and not needs_proxy(job.source):
+            with self._cond:
+                if job.status == RUNNING:
+                    job.status = SKIPPED
+            self._finish(job)
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = f"{job.proxy_path}.{os.getpid()}.tmp.mp4"
+        try:
+            with self._cond:
+                cancelled = job.status != RUNNING
+                if not cancelled:
+                    job.process = subprocess.Popen(transcode_command(job.source, tmp),
+                                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            if cancelled:
+                self._finish(job)
+                return
+            returncode = job.process.wait()
+        except OSError:
+            returncode = -1
+
+        with self._cond:
+            job.process = None
+            if job.status == RUNNING:
+                if returncode == 0 and os.path.exists(tmp):
+                    os.replace(tmp, job.proxy_path)
+                    job.status = DONE
+                else:
+                    job.status = FAILED
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        self._finish(job)
+
+    def _finish(self, job: ProxyJob):
+        job.done.set()
+        if self.on_done is not None:
+            try:
+                self.on_done(job)
+            except Exception:
+                pass
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) < 2:
+        print("Usage: python proxy_media.py <files...>")
+        sys.exit(1)
+    queue = ProxyQueue(check_source=False)
+    jobs = [queue.submit(path) for path in sys.argv[1:]]
+    for job in jobs:
+        job.done.wait()
+        print(f"{job.status:<9} {job.proxy_path}  {job.source}")
+    queue.shutdown()
@@ -0,0 +1,124 @@
+"""
+Silence Detect - 旁白/录音中的静音段检测
+
+音频按块流式读入 (见 waveform.audio_blocks)，每 WINDOW 秒计算一个 RMS 电平 (dBFS)，
+块尾不足一个窗口的采样留到下一块，内存占用与音频长度无关。电平包络按内容指纹缓存在
+ai_workspace/cache/envelopes/<指纹>.npz，调整阈值重新检测无需再次解码。
+
+低于 threshold_db 且持续不短于 min_silence 的区间视为静音；返回的区间两端各保留 padding 秒，
+避免剪掉字词的起音和尾音。
+
+用法:
+    from silence_detect import detect_silences
+
+    spans = detect_silences("narration.wav")          # [(3.21, 4.05), ...] 素材时间 (秒)
+
+    python silence_detect.py [--threshold -40] [--min-silence 0.5] <files...>
+"""
+import os
+from collections import namedtuple
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from asset_id import content_fingerprint
+from thumbnail_service import CACHE_DIR
+from waveform import audio_blocks
+
+ENVELOPE_DIR = os.path.join(CACHE_DIR, "envelopes")
+# ffmpeg 解码的采样率，静音检测不需要高采样率
+SAMPLE_RATE = 16000
+# RMS 窗口 (秒)
+WINDOW = 0.01
+# 避免 log10(0)
+FLOOR_DB = -120.0
+
+# 默认参数
+SILENCE_DB = -40.0
+MIN_SILENCE = 0.5
+PADDING = 0.1
+
+Envelope = namedtuple("Envelope", ["window", "db"])
+
+
+def compute_envelope(blocks, sample_rate: int, window: float = WINDOW) -> Envelope:
+    """流式计算 RMS 包络 (dBFS)；返回的 window 为实际窗口时长 (按整数采样数取整)"""
+    size = max(1, int(round(sample_rate * window)))
+    levels = []
+    carry = np.zeros(0, dtype=np.int16)
+    for block in blocks:
+        samples = np.concatenate([carry, block]) if len(carry) else block
+        whole = len(samples) // size * size
+        if whole:
+            frames = samples[:whole].reshape(-1, size).astype(np.float32)
+            levels.append(np.einsum("ij,ij->i", frames, frames) / size)
+        carry = samples[whole:]
+    if len(carry):
+        tail = carry.astype(np.float32)
+        levels.append(np.array([np.dot(tail, tail) / len(tail)], dtype=np.float32))
+    power = np.concatenate(levels) if levels else np.zeros(0, dtype=np.float32)
+    db = 10 * np.log10(np.maximum(power / (32768.0 ** 2), 10 ** (FLOOR_DB / 10)))
+    return Envelope(size / sample_rate, db.astype(np.float32))
+
+
+def analyze(path: str, cache_dir: str = ENVELOPE_DIR) -> Optional[Envelope]:
+    """RMS 包络 (按内容指纹缓存)，无法解码时返回 None"""
+    cache_path = os.path.join(cache_dir, f"{content_fingerprint(path)}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as data:
+            return Envelope(float(data["window"]), data["db"])
+    sample_rate, blocks = audio_blocks(path, SAMPLE_RATE)
+    try:
+        envelope = compute_envelope(blocks, sample_rate)
+    except OSError:
+        return None
+    if len(envelope.db) == 0:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, window=np.float64(envelope.window), db=envelope.db)
+    os.replace(tmp_path, cache_path)
+    return envelope
+
+
+def find_silences(envelope: Envelope, threshold_db: float = SILENCE_DB, min_silence: float = MIN_SILENCE,
+                  padding: float = PADDING) -> List[Tuple[float, float]]:
+    """包络中的静音区间 [(开始, 结束)]，两端已各收缩 padding 秒"""
+    quiet = np.concatenate([[0], (envelope.db < threshold_db).view(np.int8), [0]])
+    edges = np.diff(quiet)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    begin, finish = starts * envelope.window, ends * envelope.window
+    keep = (finish - begin >= min_silence) & (finish - begin > 2 * padding)
+    return [(round(a + padding, 6), round(b - padding, 6))
+            for a, b in zip(begin[keep].tolist(), finish[keep].tolist())]
+
+
+def detect_silences(path: str, **params) -> List[Tuple[float, float]]:
+    """音频中的静音区间 (素材时间，秒)；参数见 find_silences"""
+    envelope = analyze(path)
+    return find_silences(envelope, **params) if envelope is not None else []
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Find silent spans in audio files.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--threshold", type=float, default=SILENCE_DB, help="silence level (dBFS)")
+    parser.add_argument("--min-silence", type=float, default=MIN_SILENCE, help="shortest silence (s)")
+    parser.add_argument("--padding", type=float, default=PADDING, help="audio kept at each side (s)")
+    args = parser.parse_args()
+
+    for file_path in args.files:
+        t0 = time.perf_counter()
+        envelope = analyze(file_path)
+        if envelope is None:
+            print(f"FAILED  {file_path}")
+            continue
+        spans = find_silences(envelope, args.threshold, args.min_silence, args.padding)
+        total = sum(b - a for a, b in spans)
+        print(f"{file_path}: {len(spans)} silences, {total:.1f}s of {len(envelope.db) * envelope.window:.1f}s, "
+              f"{time.perf_counter() - t0:.2f}s")
+        for a, b in spans:
+            print(f"  {a:9.2f} - {b:9.2f}")
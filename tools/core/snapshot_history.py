@@ -1,92 +1,445 @@
 """
 Snapshot History Manager - 自动备份项目快照到 history 目录
 每次更新 snapshot 前调用 backup() 方法
+
+历史以 "关键帧 + 增量" 的方式存放在 history/store/ 下:
+每 KEYFRAME_INTERVAL 个版本保存一次完整快照，其余版本只保存相对上一版本的
+元素级 JSON 增量 (按轨道/元素/素材 id 记录增删改)，均经 zstd 压缩
+(未安装 zstandard 时退回 zlib)。恢复任意版本最多回放 KEYFRAME_INTERVAL - 1 个增量。
+
+用法:
+    python snapshot_history.py backup            # 备份当前快照
+    python snapshot_history.py backup -          # 从 stdin 读取快照内容备份
+    python snapshot_history.py list
+    python snapshot_history.py diff <v1> [<v2>]  # v2 缺省为当前快照
+    python snapshot_history.py restore <version|snapshot_xxx.json>
 """
 import os
+import sys
 import json
-import shutil
+import time
+import hashlib
+import zlib
 from datetime import datetime
 
+from element_defaults import decode_snapshot
+from snapshot_store import read_snapshot, write_snapshot
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 WORKSPACE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "ai_workspace")
-SNAPSHOT_FILE = os.path.join(WORKSPACE_DIR, "project-snapshot.json")
 HISTORY_DIR = os.path.join(WORKSPACE_DIR, "history")
-MAX_HISTORY = 20  # 最多保留20个历史版本
+STORE_DIR = os.path.join(HISTORY_DIR, "store")
+INDEX_FILE = os.path.join(STORE_DIR, "index.jsonl")
+HEAD_FILE = os.path.join(STORE_DIR, "head")
+LOCK_FILE = os.path.join(STORE_DIR, ".lock")
+MAX_HISTORY = 20  # 旧格式 (整份 JSON 拷贝) 最多保留的版本数
+MAX_VERSIONS = 5000  # 增量存储最多保留的版本数，超出时按关键帧组整体删除
+KEYFRAME_INTERVAL = 50  # 每隔多少个版本保存一次完整快照
+
+
+# --- 压缩 ---
+
+def _codec_ext():
+    return ".zst" if zstandard else ".zz"
+
+
+def _compress(data: bytes, level: int = 10) -> bytes:
+    if zstandard:
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(data: bytes, name: str) -> bytes:
+    if name.endswith(".zst"):
+        if not zstandard:
+            raise RuntimeError(f"{name} 需要 zstandard 才能解压 (pip install zstandard)")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _encode(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True).encode("utf-8")
+
+
+# --- 元素级增量 ---
+# 快照中的 tracks / tracks[].elements / assets 是以 id 标识的列表，按 id 记录变化；
+# 其余字段整体替换。
+
+_KEYED_LISTS = ("tracks", "assets")
+
+
+def _diff_fields(old, new, skip=()):
+    """普通字段差异: {"set": {k: v}, "del": [k]}，无变化返回 {}"""
+    changed = {k: v for k, v in new.items() if k not in skip and (k not in old or old[k] != v)}
+    removed = [k for k in old if k not in skip and k not in new]
+    out = {}
+    if changed:
+        out["set"] = changed
+    if removed:
+        out["del"] = removed
+    return out
+
+
+def _apply_fields(obj, diff):
+    obj = dict(obj)
+    obj.update(diff.get("set", {}))
+    for key in diff.get("del", []):
+        obj.pop(key, None)
+    return obj
+
+
+def _ids(items):
+    ids = [item.get("id") if isinstance(item, dict) else None for item in items]
+    if None in ids or len(set(ids)) != len(ids):
+        return None
+    return ids
+
+
+def _diff_keyed(old, new, nested=None):
+    """按 id 比较两个列表，nested 为需要继续按 id 比较的子列表字段"""
+    old_ids, new_ids = _ids(old), _ids(new)
+    if old_ids is None or new_ids is None:
+        return {"replace": new} if old != new else {}
+    old_map = dict(zip(old_ids, old))
+    out = {}
+    if old_ids != new_ids:
+        out["order"] = new_ids
+    put, patch = {}, {}
+    for item_id, item in zip(new_ids, new):
+        prev = old_map.get(item_id)
+        if prev is None:
+            put[item_id] = item
+        elif prev == item:
+            continue
+        elif nested and isinstance(prev.get(nested), list) and isinstance(item.get(nested), list):
+            sub = {"fields": _diff_fields(prev, item, skip=(nested,)),
+                   nested: _diff_keyed(prev[nested], item[nested])}
+            patch[item_id] = sub
+        else:
+            put[item_id] = item
+    if put:
+        out["put"] = put
+    if patch:
+        out["patch"] = patch
+    return out
+
+
+def _apply_keyed(old, diff, nested=None):
+    if not diff:
+        return old
+    if "replace" in diff:
+        return diff["replace"]
+    items = {item["id"]: item for item in old}
+    items.update(diff.get("put", {}))
+    for item_id, sub in diff.get("patch", {}).items():
+        item = _apply_fields(items[item_id], sub.get("fields", {}))
+        item[nested] = _apply_keyed(item.get(nested, []), sub.get(nested, {}))
+        items[item_id] = item
+    order = diff.get("order", [item["id"] for item in old])
+    return [items[item_id] for item_id in order]
+
+
+def diff_snapshot(old, new):
+    """计算两个快照之间的元素级增量"""
+    delta = {"fields": _diff_fields(old, new, skip=_KEYED_LISTS)}
+    for key in _KEYED_LISTS:
+        if key in old or key in new:
+            delta[key] = _diff_keyed(old.get(key, []), new.get(key, []),
+                                     nested="elements" if key == "tracks" else None)
+            if key not in new:
+                delta["fields"].setdefault("del", []).append(key)
+    return delta
+
+
+def apply_delta(old, delta):
+    """把 diff_snapshot() 的结果应用到旧快照上，返回新快照 (不修改 old)"""
+    snapshot = _apply_fields(old, delta.get("fields", {}))
+    for key in _KEYED_LISTS:
+        if key in delta and key not in delta.get("fields", {}).get("del", []):
+            snapshot[key] = _apply_keyed(old.get(key, []), delta[key],
+                                         nested="elements" if key == "tracks" else None)
+    return snapshot
+
+
+# --- 存储 ---
+
+class _StoreLock:
+    """基于 O_EXCL 锁文件的跨进程互斥 (超过 30 秒的锁视为残留)"""
+
+    def __enter__(self):
+        os.makedirs(STORE_DIR, exist_ok=True)
+        deadline = time.time() + 30
+        while True:
+            try:
+                self.fd = os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(LOCK_FILE) > 30:
+                        os.remove(LOCK_FILE)
+                        continue
+                except OSError:
+                    continue
+                if time.time() > deadline:
+                    raise TimeoutError("snapshot history store is locked")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        os.close(self.fd)
+        try:
+            os.remove(LOCK_FILE)
+        except OSError:
+            pass
+
+
+def _read_index():
+    if not os.path.exists(INDEX_FILE):
+        return []
+    entries = []
+    with open(INDEX_FILE, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    return entries
+
+
+def _write_index(entries):
+    tmp_path = INDEX_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, INDEX_FILE)
 
-def backup():
-    """备份当前快照到 history 目录"""
-    if not os.path.exists(SNAPSHOT_FILE):
+
+def _write_blob(name, payload: bytes):
+    tmp_path = os.path.join(STORE_DIR, name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_path, os.path.join(STORE_DIR, name))
+
+
+def _read_blob(name):
+    with open(os.path.join(STORE_DIR, name), "rb") as f:
+        return json.loads(_decompress(f.read(), name))
+
+
+def _read_head():
+    for ext in (".zst", ".zz"):
+        path = HEAD_FILE + ext
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return json.loads(_decompress(f.read(), path))
+    return None
+
+
+def _write_head(snapshot):
+    for ext in (".zst", ".zz"):
+        if ext != _codec_ext() and os.path.exists(HEAD_FILE + ext):
+            os.remove(HEAD_FILE + ext)
+    _write_blob("head" + _codec_ext(), _compress(_encode(snapshot), level=3))
+
+
+def _prune(entries):
+    """超过 MAX_VERSIONS 时从最旧的关键帧组开始整体删除"""
+    while len(entries) > MAX_VERSIONS:
+        next_key = next((i for i, e in enumerate(entries) if i > 0 and e["type"] == "key"), None)
+        if next_key is None:
+            break
+        for entry in entries[:next_key]:
+            try:
+                os.remove(os.path.join(STORE_DIR, entry["file"]))
+            except OSError:
+                pass
+        entries = entries[next_key:]
+    return entries
+
+
+def record(snapshot, timestamp=None):
+    """把一个快照对象追加到历史存储，返回版本号 (与上一版本相同则返回 None)"""
+    payload = _encode(snapshot)
+    digest = hashlib.sha1(payload).hexdigest()[:16]
+    with _StoreLock():
+        entries = _read_index()
+        if entries and entries[-1]["hash"] == digest:
+            return None
+        version = entries[-1]["version"] + 1 if entries else 1
+        head = _read_head() if entries else None
+        since_key = 0
+        for entry in reversed(entries):
+            if entry["type"] == "key":
+                break
+            since_key += 1
+
+        if head is None or since_key + 1 >= KEYFRAME_INTERVAL:
+            kind, blob = "key", _compress(payload, level=19 if zstandard else 9)
+        else:
+            kind, blob = "delta", _compress(_encode(diff_snapshot(head, snapshot)))
+        name = f"{version:08d}.{kind}{_codec_ext()}"
+        _write_blob(name, blob)
+        _write_head(snapshot)
+
+        entries.append({
+            "version": version,
+            "time": timestamp or datetime.now().isoformat(timespec="seconds"),
+            "type": kind,
+            "file": name,
+            "size": len(blob),
+            "hash": digest,
+        })
+        _write_index(_prune(entries))
+    return version
+
+
+def load_version(version):
+    """重建指定版本的快照: 从最近的关键帧开始回放增量"""
+    entries = _read_index()
+    pos = next((i for i, e in enumerate(entries) if e["version"] == version), None)
+    if pos is None:
+        raise KeyError(f"version {version} not found")
+    key_pos = pos
+    while entries[key_pos]["type"] != "key":
+        key_pos -= 1
+    snapshot = _read_blob(entries[key_pos]["file"])
+    for entry in entries[key_pos + 1:pos + 1]:
+        snapshot = apply_delta(snapshot, _read_blob(entry["file"]))
+    return snapshot
+
+
+def backup(content=None):
+    """备份当前快照 (或 content 指定的快照文本) 到历史存储"""
+    try:
+        snapshot = read_snapshot() if content is None else decode_snapshot(json.loads(content))
+    except ValueError:
+        print("[History] Snapshot is not valid JSON, skipped.")
+        return None
+    if snapshot is None:
         print("[History] No snapshot to backup.")
         return None
-    
-    os.makedirs(HISTORY_DIR, exist_ok=True)
-    
-    # 生成带时间戳的文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_name = f"snapshot_{timestamp}.json"
-    backup_path = os.path.join(HISTORY_DIR, backup_name)
-    
-    shutil.copy2(SNAPSHOT_FILE, backup_path)
-    print(f"[History] Backed up to: {backup_name}")
-    
-    # 清理旧版本
-    cleanup_old_versions()
-    
-    return backup_path
+
+    version = record(snapshot)
+    if version is None:
+        print("[History] Snapshot unchanged, skipped.")
+    else:
+        print(f"[History] Backed up as version {version}")
+    return version
+
 
 def cleanup_old_versions():
-    """保留最新的 MAX_HISTORY 个版本，删除更旧的"""
-    if not os.path.exists(HISTORY_DIR):
-        return
-    
-    files = sorted([
-        f for f in os.listdir(HISTORY_DIR) 
-        if f.startswith("snapshot_") and f.endswith(".json")
-    ], reverse=True)
-    
-    for old_file in files[MAX_HISTORY:]:
+    """保留最新的 MAX_HISTORY 个旧格式整份备份，删除更旧的"""
+    for old_file in _legacy_files()[MAX_HISTORY:]:
         os.remove(os.path.join(HISTORY_DIR, old_file))
         print(f"[History] Removed old version: {old_file}")
 
-def list_history():
-    """列出所有历史版本"""
+
+def _legacy_files():
     if not os.path.exists(HISTORY_DIR):
         return []
-    
-    files = sorted([
+    return sorted([
         f for f in os.listdir(HISTORY_DIR)
         if f.startswith("snapshot_") and f.endswith(".json")
     ], reverse=True)
-    
-    return files
-
-def restore(filename):
-    """从历史版本恢复快照"""
-    backup_path = os.path.join(HISTORY_DIR, filename)
-    if not os.path.exists(backup_path):
-        print(f"[History] Error: {filename} not found.")
+
+
+def list_history():
+    """列出所有历史版本 (新版本在前)，旧格式的整份备份排在最后"""
+    versions = [
+        f"{e['version']:>6}  {e['time']}  {e['type']:<5}  {e['size']:>8}B"
+        for e in reversed(_read_index())
+    ]
+    return versions + _legacy_files()
+
+
+def _load_ref(ref):
+    """版本号 / 旧格式文件名 / "current" -> 快照对象"""
+    if ref == "current":
+        return read_snapshot() or {}
+    if ref.endswith(".json"):
+        with open(os.path.join(HISTORY_DIR, ref), "r", encoding="utf-8") as f:
+            return json.load(f)
+    return load_version(int(ref))
+
+
+def diff(ref_a, ref_b="current"):
+    """返回两个版本之间的变化摘要 (每行一条)"""
+    old, new = _load_ref(ref_a), _load_ref(ref_b)
+    delta = diff_snapshot(old, new)
+    lines = []
+    for key in delta["fields"].get("set", {}):
+        lines.append(f"~ {key}")
+    for key in delta["fields"].get("del", []):
+        lines.append(f"- {key}")
+
+    old_tracks = {t.get("id"): t for t in old.get("tracks", [])}
+    tracks = delta.get("tracks", {})
+    if "replace" in tracks:
+        lines.append("~ tracks (replaced)")
+    for track_id in tracks.get("put", {}):
+        lines.append(f"{'~' if track_id in old_tracks else '+'} track {track_id}")
+    for track_id, sub in tracks.get("patch", {}).items():
+        for key in list(sub["fields"].get("set", {})) + sub["fields"].get("del", []):
+            lines.append(f"~ track {track_id}.{key}")
+        elements = sub.get("elements", {})
+        old_elements = {el.get("id") for el in old_tracks[track_id].get("elements", [])}
+        for el_id in elements.get("put", {}):
+            lines.append(f"{'~' if el_id in old_elements else '+'} track {track_id} element {el_id}")
+        if "order" in elements:
+            for el_id in old_elements - set(elements["order"]):
+                lines.append(f"- track {track_id} element {el_id}")
+    if "order" in tracks:
+        for track_id in set(old_tracks) - set(tracks["order"]):
+            lines.append(f"- track {track_id}")
+
+    old_assets = {a.get("id") for a in old.get("assets", [])}
+    assets = delta.get("assets", {})
+    for asset_id in assets.get("put", {}):
+        lines.append(f"{'~' if asset_id in old_assets else '+'} asset {asset_id}")
+    if "order" in assets:
+        for asset_id in old_assets - set(assets["order"]):
+            lines.append(f"- asset {asset_id}")
+    return lines
+
+
+def restore(ref):
+    """从历史版本 (版本号或旧格式文件名) 恢复快照"""
+    try:
+        snapshot = _load_ref(ref)
+    except (KeyError, ValueError, OSError) as e:
+        print(f"[History] Error: {ref} not found ({e}).")
         return False
-    
+
     # 先备份当前版本
     backup()
-    
-    # 恢复
-    shutil.copy2(backup_path, SNAPSHOT_FILE)
-    print(f"[History] Restored from: {filename}")
+
+    # 恢复 (沿用工作区当前的单文件/分片布局)
+    write_snapshot(snapshot)
+    print(f"[History] Restored from: {ref}")
     return True
 
+
 if __name__ == "__main__":
-    import sys
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(encoding="utf-8")
     if len(sys.argv) > 1:
         cmd = sys.argv[1]
         if cmd == "backup":
-            backup()
+            if len(sys.argv) > 2 and sys.argv[2] == "-":
+                backup(sys.stdin.buffer.read().decode("utf-8"))
+            else:
+                backup()
         elif cmd == "list":
             for f in list_history():
                 print(f)
+        elif cmd == "diff" and len(sys.argv) > 2:
+            for line in diff(*sys.argv[2:4]) or ["(no changes)"]:
+                print(line)
         elif cmd == "restore" and len(sys.argv) > 2:
             restore(sys.argv[2])
         else:
-            print("Usage: python snapshot_history.py [backup|list|restore <filename>]")
+            print("Usage: python snapshot_history.py [backup [-]|list|diff <v1> [<v2>]|restore <version|filename>]")
     else:
         # 默认执行备份
         backup()
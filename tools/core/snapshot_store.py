@@ -0,0 +1,187 @@
+"""
+Snapshot Store - 读写工作区项目快照，兼容单文件与按轨道分片两种布局
+
+单文件: ai_workspace/project-snapshot.json
+分片 (AICUT_SNAPSHOT_SHARDS=1): ai_workspace/snapshot/
+    manifest.json      分片列表与内容哈希 (最后写入)
+    meta.json          除 tracks/assets 外的顶层字段
+    assets.json        素材列表
+    tracks/<id>.json   每条轨道一个文件
+    tracks/<id>.aict   大型文本轨道的列式二进制文件 (AICUT_TEXT_COLUMNS=1 时启用，见 text_columns.py)
+
+读取时按磁盘上的布局自动识别；写入布局由环境变量决定，未设置时沿用磁盘上的布局 (与前端规则相同)，
+写入时只重写内容变化的分片，每个文件都先写临时文件再改名。
+AICUT_ELIDE_DEFAULTS=1 时元素中等于默认值的字段不落盘 (见 element_defaults.py)，读取结果总是完整的。
+格式与前端 src/lib/snapshot-store.ts 一致。
+
+用法:
+    from snapshot_store import read_snapshot, write_snapshot
+
+    snapshot = read_snapshot()
+    write_snapshot(snapshot)
+"""
+import os
+import re
+import json
+import time
+import hashlib
+from typing import Dict, List, Optional
+
+from element_defaults import decode_snapshot, decode_tracks, encode_snapshot
+from text_columns import MIN_ELEMENTS, decode_track, encode_track
+
+WORKSPACE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai_workspace")
+SNAPSHOT_FILE = os.path.join(WORKSPACE_DIR, "project-snapshot.json")
+SHARD_DIR = os.path.join(WORKSPACE_DIR, "snapshot")
+MANIFEST_FILE = os.path.join(SHARD_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+
+
+def _hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()[:16]
+
+
+def _track_file(track_id, ext: str = ".json") -> str:
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", str(track_id))[:48]
+    return f"tracks/{safe}-{_hash(str(track_id).encode('utf-8'))[:8]}{ext}"
+
+
+def _track_ext(track: Dict) -> str:
+    """长文本轨道在启用列式存储时写为 .aict"""
+    if (os.environ.get("AICUT_TEXT_COLUMNS") == "1" and track.get("type") == "text"
+            and len(track.get("elements", [])) >= MIN_ELEMENTS):
+        return ".aict"
+    return ".json"
+
+
+def _write_atomic(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 按进程区分临时文件名，前端也会写同样的文件
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def read_manifest() -> Optional[Dict]:
+    try:
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _read_shard(entry: Dict):
+    path = os.path.join(SHARD_DIR, entry["file"])
+    if path.endswith(".aict"):
+        with open(path, "rb") as f:
+            return decode_track(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_track_shard(manifest: Dict, entry: Dict) -> Dict:
+    """读取轨道分片并补回被省略的默认值"""
+    track = _read_shard(entry)
+    return decode_tracks([track])[0] if (manifest.get("encoding") or {}).get("defaults") else track
+
+
+def is_sharded() -> bool:
+    """写入布局: 环境变量优先，否则沿用磁盘上已有的布局"""
+    flag = os.environ.get("AICUT_SNAPSHOT_SHARDS")
+    if flag is not None:
+        return flag == "1"
+    return os.path.exists(MANIFEST_FILE)
+
+
+def snapshot_exists() -> bool:
+    return os.path.exists(MANIFEST_FILE) or os.path.exists(SNAPSHOT_FILE)
+
+
+def read_snapshot() -> Optional[Dict]:
+    """读取工作区快照 (两种布局均可)，不存在时返回 None"""
+    manifest = read_manifest()
+    if manifest:
+        snapshot = _read_shard(manifest["meta"])
+        snapshot["tracks"] = [_read_shard(entry) for entry in manifest["tracks"]]
+        snapshot["assets"] = _read_shard(manifest["assets"])
+        return decode_snapshot(snapshot)
+    if os.path.exists(SNAPSHOT_FILE):
+        with open(SNAPSHOT_FILE, "r", encoding="utf-8") as f:
+            content = f.read()
+        return decode_snapshot(json.loads(content)) if content.strip() else None
+    return None
+
+
+def _remove_shards():
+    if not os.path.exists(MANIFEST_FILE):
+        return
+    manifest = read_manifest() or {"tracks": []}
+    os.remove(MANIFEST_FILE)
+    for name in ["meta.json", "assets.json"] + [entry["file"] for entry in manifest["tracks"]]:
+        try:
+            os.remove(os.path.join(SHARD_DIR, name))
+        except OSError:
+            pass
+
+
+def write_snapshot(snapshot: Dict) -> List[str]:
+    """写入工作区快照，返回变化的分片名 ("meta"/"assets"/"order"/轨道 id)"""
+    snapshot = decode_snapshot(snapshot)
+    if os.environ.get("AICUT_ELIDE_DEFAULTS") == "1":
+        snapshot = encode_snapshot(snapshot)
+    if not is_sharded():
+        _write_atomic(SNAPSHOT_FILE, json.dumps(snapshot, ensure_ascii=False, indent=2).encode("utf-8"))
+        _remove_shards()
+        return ["*"]
+
+    previous = read_manifest()
+    changed = []
+    meta = {k: v for k, v in snapshot.items() if k not in ("tracks", "assets")}
+
+    def write_shard(name, file, value, prev):
+        if file.endswith(".aict"):
+            content = encode_track(value)
+        else:
+            content = json.dumps(value, ensure_ascii=False, indent=2).encode("utf-8")
+        digest = _hash(content)
+        if (not prev or prev.get("hash") != digest or prev.get("file") != file
+                or not os.path.exists(os.path.join(SHARD_DIR, file))):
+            _write_atomic(os.path.join(SHARD_DIR, file), content)
+            changed.append(name)
+        return {"file": file, "hash": digest}
+
+    prev_tracks = {entry["id"]: entry for entry in (previous or {}).get("tracks", [])}
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "updatedAt": int(time.time() * 1000),
+        "meta": write_shard("meta", "meta.json", meta, (previous or {}).get("meta")),
+        "assets": write_shard("assets", "assets.json", snapshot.get("assets", []), (previous or {}).get("assets")),
+        "tracks": [
+            {"id": track.get("id"), **write_shard(track.get("id"), _track_file(track.get("id"), _track_ext(track)),
+                                                  track, prev_tracks.get(track.get("id")))}
+            for track in snapshot.get("tracks", [])
+        ],
+    }
+    if (meta.get("encoding") or {}).get("defaults"):
+        manifest["encoding"] = {"defaults": meta["encoding"]["defaults"]}
+
+    live = {entry["file"] for entry in manifest["tracks"]}
+    for entry in prev_tracks.values():
+        if entry["file"] not in live:
+            try:
+                os.remove(os.path.join(SHARD_DIR, entry["file"]))
+            except OSError:
+                pass
+            changed.append(entry["id"])
+    if previous and [e["id"] for e in previous["tracks"]] != [e["id"] for e in manifest["tracks"]]:
+        changed.append("order")
+
+    if changed or not previous:
+        _write_atomic(MANIFEST_FILE, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    if os.path.exists(SNAPSHOT_FILE):
+        os.remove(SNAPSHOT_FILE)
+    return changed
@@ -0,0 +1,190 @@
+"""
+Subtitle Dedupe - 追加字幕时检测与已有文本元素重复的字幕
+
+对同一素材重复运行识别会把几乎相同的字幕叠在原有字幕上。这里把已有文本元素按起点排序
+建立区间索引 (nested containment list)，每条新字幕用两次二分定位与之相交的元素，
+再比较时间重叠比例和文本相似度，总体 O((n+m) log n + K)，K 为相交的元素对数
+(一个很长的元素或层层嵌套的元素不会让每次查询退化为线性扫描)。
+
+重复字幕按策略处理:
+    skip     丢弃新字幕，保留原有元素
+    replace  删除原有元素，添加新字幕
+    merge    原有元素的时间扩展为两者的并集，文本更新为新字幕，不再添加新字幕
+
+用法:
+    from subtitle_dedupe import plan_append
+
+    plan = plan_append(snapshot, subtitles, policy="replace")
+    plan.add          # 需要追加的字幕
+    plan.remove       # 需要删除的元素 id
+    plan.update       # {元素 id: 更新字段}
+"""
+import re
+from collections import namedtuple
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+import numpy as np
+
+POLICIES = ("skip", "replace", "merge")
+# 时间重叠占较短一方的比例达到该值才视为重复
+MIN_OVERLAP = 0.6
+# 去掉空白和标点后的文本相似度阈值
+MIN_SIMILARITY = 0.8
+
+AppendPlan = namedtuple("AppendPlan", ["add", "remove", "update", "duplicates"])
+
+_PUNCTUATION = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def _normalize(text: str) -> str:
+    return _PUNCTUATION.sub("", text or "").lower()
+
+
+def _similar(a: str, b: str, threshold: float) -> bool:
+    if a == b:
+        return True
+    if not a or not b:
+        return False
+    matcher = SequenceMatcher(None, a, b, autojunk=False)
+    return matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold \
+        and matcher.ratio() >= threshold
+
+
+class CueIndex:
+    """已有文本元素的区间索引 (nested containment list)
+
+    元素按起点升序 (同起点时终点降序) 排列，被前面某个元素完全包含的元素放入该元素的子列表。
+    同一列表内的元素互不包含，起点和终点都单调递增，两次二分即得到与查询区间相交的一段；
+    子列表只在其所属元素与查询区间相交时才需要查询 (子元素不会超出所属元素)。
+    """
+
+    def __init__(self, elements: List[Dict]):
+        starts = np.array([el.get("startTime", 0) for el in elements], dtype=np.float64)
+        ends = starts + np.array([el.get("duration", 0) - el.get("trimStart", 0) - el.get("trimEnd", 0)
+                                  for el in elements], dtype=np.float64)
+        ends = np.maximum(ends, starts)
+        order = np.lexsort((-ends, starts))
+        self.elements = [elements[i] for i in order.tolist()]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.texts = [None] * len(elements)
+
+        # 栈中为包含当前元素起点的候选父元素，终点早于当前元素终点的不可能再包含后续元素
+        children: Dict[int, List[int]] = {}
+        stack: List[int] = []
+        for i, end in enumerate(self.ends.tolist()):
+            while stack and self.ends[stack[-1]] < end:
+                stack.pop()
+            children.setdefault(stack[-1] if stack else -1, []).append(i)
+            stack.append(i)
+        self.lists = {
+            parent: (np.array(ids, dtype=np.int64), self.starts[ids], self.ends[ids])
+            for parent, ids in children.items()
+        }
+
+    def _search(self, parent: int, start: float, end: float) -> List[int]:
+        ids, starts, ends = self.lists[parent]
+        lo = np.searchsorted(ends, start, side="right")
+        hi = np.searchsorted(starts, end, side="left")
+        return ids[lo:hi].tolist()
+
+    def query(self, starts: np.ndarray, ends: np.ndarray) -> List[List[int]]:
+        """批量查询，返回与每个区间相交的元素下标 (按起点排序)"""
+        if -1 not in self.lists:
+            return [[] for _ in range(len(starts))]
+        # 顶层列表对所有查询一次向量化二分
+        top_ids, top_starts, top_ends = self.lists[-1]
+        lows = np.searchsorted(top_ends, starts, side="right")
+        highs = np.searchsorted(top_starts, ends, side="left")
+        nested = len(self.lists) > 1
+        results = []
+        for start, end, lo, hi in zip(starts.tolist(), ends.tolist(), lows.tolist(), highs.tolist()):
+            found = top_ids[lo:hi].tolist()
+            if nested:
+                pending = [i for i in found if i in self.lists]
+                while pending:
+                    inner = self._search(pending.pop(), start, end)
+                    found.extend(inner)
+                    pending.extend(i for i in inner if i in self.lists)
+                found.sort()
+            results.append(found)
+        return results
+
+    def text(self, i: int) -> str:
+        if self.texts[i] is None:
+            self.texts[i] = _normalize(self.elements[i].get("content", ""))
+        return self.texts[i]
+
+
+def plan_append(snapshot: Dict, subtitles: List[Dict], policy: str = "skip", track_id: str = None,
+                min_overlap: float = MIN_OVERLAP, min_similarity: float = MIN_SIMILARITY) -> AppendPlan:
+    """对比新字幕 ({"text", "startTime", "duration"}) 与快照中的文本元素，返回追加计划"""
+    if policy not in POLICIES:
+        raise ValueError(f"unknown dedupe policy {policy!r}, expected one of {POLICIES}")
+    existing = [
+        el for track in snapshot.get("tracks", [])
+        if track.get("type") == "text" and (track_id is None or track.get("id") == track_id)
+        for el in track.get("elements", []) if el.get("type") == "text"
+    ]
+    index = CueIndex(existing)
+    new_starts = np.array([sub.get("startTime", 0) for sub in subtitles], dtype=np.float64)
+    new_ends = new_starts + np.array([sub.get("duration", 0) for sub in subtitles], dtype=np.float64)
+    candidates = index.query(new_starts, new_ends)
+
+    add, remove, update, duplicates = [], [], {}, 0
+    removed, merged = set(), {}
+    for sub, start, end, overlapping in zip(subtitles, new_starts.tolist(), new_ends.tolist(), candidates):
+        text = _normalize(sub.get("text") or sub.get("content"))
+        match = None
+        for i in overlapping:
+            el_start, el_end = float(index.starts[i]), float(index.ends[i])
+            overlap = min(end, el_end) - max(start, el_start)
+            shorter = min(end - start, el_end - el_start)
+            if overlap <= 0 or shorter <= 0 or overlap / shorter < min_overlap:
+                continue
+            if _similar(text, index.text(i), min_similarity):
+                match = i
+                break
+        if match is None:
+            add.append(sub)
+            continue
+
+        duplicates += 1
+        element = index.elements[match]
+        if policy == "replace":
+            if element["id"] not in removed:
+                removed.add(element["id"])
+                remove.append(element["id"])
+            add.append(sub)
+        elif policy == "merge":
+            prev_start, prev_end = merged.get(match, (float(index.starts[match]), float(index.ends[match])))
+            merged_start, merged_end = min(start, prev_start), max(end, prev_end)
+            merged[match] = (merged_start, merged_end)
+            update[element["id"]] = {
+                "content": sub.get("text") or sub.get("content"),
+                "startTime": round(merged_start, 6),
+                "duration": round(merged_end - merged_start + element.get("trimStart", 0) + element.get("trimEnd", 0), 6),
+            }
+    return AppendPlan(add, remove, update, duplicates)
+
+
+def apply_plan(snapshot: Dict, plan: AppendPlan, keep_track: str = None) -> Dict:
+    """把 remove/update 应用到快照 (新字幕由调用方另行追加)，返回新快照
+
+    因删除而变空的文本轨道一并移除，keep_track (调用方将向其追加字幕的轨道 id) 除外。
+    """
+    removed = set(plan.remove)
+    tracks = []
+    for track in snapshot.get("tracks", []):
+        if track.get("type") != "text":
+            tracks.append(track)
+            continue
+        elements = [
+            {**el, **plan.update[el.get("id")]} if el.get("id") in plan.update else el
+            for el in track.get("elements", []) if el.get("id") not in removed
+        ]
+        if not elements and track.get("elements") and track.get("id") != keep_track:
+            continue
+        tracks.append({**track, "elements": elements})
+    return {**snapshot, "tracks": tracks}
@@ -0,0 +1,325 @@
+"""
+Subtitle I/O - SRT / WebVTT / ASS 字幕的流式读写
+
+解析器逐行读取并逐条产出 Cue，写入器逐条写出，处理十万级字幕时内存占用恒定。
+
+用法:
+    from subtitle_io import read_subtitles, write_subtitles
+
+    for cue in read_subtitles("input.srt"):
+        print(cue.start, cue.end, cue.text)
+
+    write_subtitles("output.vtt", cues)   # 格式由扩展名决定
+
+    # ASS -> ASS 时沿用原文件的样式与 Format 字段顺序
+    write_subtitles("output.ass", read_subtitles("input.ass"), layout=read_ass_layout("input.ass"))
+"""
+import os
+import re
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+Cue = namedtuple("Cue", "start end text style", defaults=(None,))
+# ASS 文件的样式段与事件段布局: 样式段标题、样式 Format 字段、各 Style 行的值、事件 Format 字段
+AssLayout = namedtuple("AssLayout", "styles_section style_format styles event_format")
+
+FORMATS = ("srt", "vtt", "ass")
+
+_TIMING_RE = re.compile(
+    r"^\s*((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})\s*-->\s*((?:\d+:)?\d{1,2}:\d{2}[,.]\d{1,3})"
+)
+_VTT_TAG_RE = re.compile(r"</?[^>]+>")
+_ASS_OVERRIDE_RE = re.compile(r"(?<!\\)\{[^}]*\}")
+# ASS 没有反斜杠转义，用户文本中反斜杠后紧跟 N/n/h/{/} 时在其后插入不可见的 WORD JOINER 以免被当成控制序列
+_ASS_GUARD = "\u2060"
+_ASS_ESCAPE_RE = re.compile(r"\\(?=[Nnh{}\u2060])")
+_ASS_SEQUENCE_RE = re.compile(r"\\([Nnh{}\u2060])")
+_ASS_SEQUENCES = {"N": "\n", "n": "\n", "h": " ", "{": "{", "}": "}", _ASS_GUARD: "\\"}
+
+
+# --- 时间格式 ---
+
+def _split_ms(seconds: float):
+    total_ms = max(0, int(round(seconds * 1000)))
+    h, rem = divmod(total_ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return h, m, s, ms
+
+
+def format_srt_time(seconds: float) -> str:
+    """将秒数转为 SRT 时间格式: HH:MM:SS,mmm"""
+    h, m, s, ms = _split_ms(seconds)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
+
+def format_vtt_time(seconds: float) -> str:
+    """将秒数转为 WebVTT 时间格式: HH:MM:SS.mmm"""
+    h, m, s, ms = _split_ms(seconds)
+    return f"{h:02}:{m:02}:{s:02}.{ms:03}"
+
+
+def format_ass_time(seconds: float) -> str:
+    """将秒数转为 ASS 时间格式: H:MM:SS.cc"""
+    total_cs = max(0, int(round(seconds * 100)))
+    h, rem = divmod(total_cs, 360000)
+    m, rem = divmod(rem, 6000)
+    s, cs = divmod(rem, 100)
+    return f"{h}:{m:02}:{s:02}.{cs:02}"
+
+
+def parse_timestamp(value: str) -> float:
+    """解析 SRT/VTT/ASS 任一时间戳为秒"""
+    value = value.strip().replace(",", ".")
+    parts = value.split(":")
+    seconds = float(parts[-1])
+    if len(parts) >= 2:
+        seconds += int(parts[-2]) * 60
+    if len(parts) >= 3:
+        seconds += int(parts[-3]) * 3600
+    return seconds
+
+
+# --- 解析器 ---
+
+def iter_srt(f: TextIO) -> Iterator[Cue]:
+    """流式解析 SRT"""
+    start = end = None
+    lines = []
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if start is None:
+            match = _TIMING_RE.match(line)
+            if match:
+                start, end = parse_timestamp(match.group(1)), parse_timestamp(match.group(2))
+            continue
+        if line.strip():
+            lines.append(line)
+            continue
+        yield Cue(start, end, "\n".join(lines))
+        start = end = None
+        lines = []
+    if start is not None:
+        yield Cue(start, end, "\n".join(lines))
+
+
+def iter_vtt(f: TextIO) -> Iterator[Cue]:
+    """流式解析 WebVTT (忽略 NOTE/STYLE/REGION 块，去除内联标签)"""
+    start = end = None
+    lines = []
+    skipping = False
+    for raw in f:
+        line = raw.rstrip("\r\n")
+        if not line.strip():
+            if start is not None:
+                yield Cue(start, end, _VTT_TAG_RE.sub("", "\n".join(lines)))
+            start = end = None
+            lines = []
+            skipping = False
+            continue
+        if skipping:
+            continue
+        if start is None:
+            match = _TIMING_RE.match(line)
+            if match:
+                start, end = parse_timestamp(match.group(1)), parse_timestamp(match.group(2))
+            elif line.startswith(("NOTE", "STYLE", "REGION")):
+                skipping = True
+            continue
+        lines.append(line)
+    if start is not None:
+        yield Cue(start, end, _VTT_TAG_RE.sub("", "\n".join(lines)))
+
+
+def iter_ass(f: TextIO) -> Iterator[Cue]:
+    """流式解析 ASS/SSA 的 [Events] 段，Cue.style 为样式名"""
+    in_events = False
+    fields = ["layer", "start", "end", "style", "name", "marginl", "marginr", "marginv", "effect", "text"]
+    for raw in f:
+        line = raw.strip()
+        if line.startswith("["):
+            in_events = line.lower() == "[events]"
+            continue
+        if not in_events:
+            continue
+        if line.lower().startswith("format:"):
+            fields = [x.strip().lower() for x in line.split(":", 1)[1].split(",")]
+            continue
+        if not line.lower().startswith("dialogue:"):
+            continue
+        values = line.split(":", 1)[1].split(",", len(fields) - 1)
+        if len(values) < len(fields):
+            continue
+        row = dict(zip(fields, values))
+        text = _ASS_OVERRIDE_RE.sub("", row.get("text", ""))
+        text = _ASS_SEQUENCE_RE.sub(lambda m: _ASS_SEQUENCES[m.group(1)], text)
+        yield Cue(parse_timestamp(row["start"]), parse_timestamp(row["end"]), text.strip(), row.get("style", "").strip() or None)
+
+
+def read_ass_layout(path: str) -> AssLayout:
+    """读取 ASS/SSA 文件头部的样式与 Format 字段顺序 (读到 [Events] 的 Format 行即停止)"""
+    section, styles_section, style_format, styles = "", None, None, []
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for raw in f:
+            line = raw.strip()
+            if line.startswith("["):
+                section = line.lower()
+                if "styles" in section:
+                    styles_section = line
+                continue
+            key, _, value = line.partition(":")
+            key = key.strip().lower()
+            if "styles" in section and key == "format":
+                style_format = [x.strip() for x in value.split(",")]
+            elif "styles" in section and key == "style" and style_format:
+                styles.append([x.strip() for x in value.split(",", len(style_format) - 1)])
+            elif section == "[events]" and key == "format":
+                return AssLayout(styles_section, style_format, styles, [x.strip() for x in value.split(",")])
+    return AssLayout(styles_section, style_format, styles, None)
+
+
+_PARSERS = {"srt": iter_srt, "vtt": iter_vtt, "ass": iter_ass, "ssa": iter_ass}
+
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "ssa":
+        return "ass"
+    if ext not in FORMATS:
+        raise ValueError(f"不支持的字幕格式: {path}")
+    return ext
+
+
+def read_subtitles(path: str, fmt: Optional[str] = None) -> Iterator[Cue]:
+    """按扩展名(或 fmt)流式读取字幕文件"""
+    parser = _PARSERS[fmt or detect_format(path)]
+    with open(path, "r", encoding="utf-8-sig") as f:
+        yield from parser(f)
+
+
+# --- 写入器 ---
+
+def write_srt(cues: Iterable[Cue], f: TextIO) -> int:
+    count = 0
+    for cue in cues:
+        count += 1
+        f.write(f"{count}\n{format_srt_time(cue.start)} --> {format_srt_time(cue.end)}\n{cue.text}\n\n")
+    return count
+
+
+def write_vtt(cues: Iterable[Cue], f: TextIO) -> int:
+    f.write("WEBVTT\n\n")
+    count = 0
+    for cue in cues:
+        count += 1
+        f.write(f"{format_vtt_time(cue.start)} --> {format_vtt_time(cue.end)}\n{cue.text}\n\n")
+    return count
+
+
+ASS_HEADER = """[Script Info]
+ScriptType: {script_type}
+PlayResX: {width}
+PlayResY: {height}
+"""
+
+ASS_STYLE_FORMAT = ["Name", "Fontname", "Fontsize", "PrimaryColour", "SecondaryColour", "OutlineColour", "BackColour",
+                    "Bold", "Italic", "Underline", "StrikeOut", "ScaleX", "ScaleY", "Spacing", "Angle", "BorderStyle",
+                    "Outline", "Shadow", "Alignment", "MarginL", "MarginR", "MarginV", "Encoding"]
+ASS_EVENT_FORMAT = ["Layer", "Start", "End", "Style", "Name", "MarginL", "MarginR", "MarginV", "Effect", "Text"]
+# 默认样式各字段的值 (键为小写字段名)，原文件 Format 中有而这里没有的字段写 0
+_ASS_DEFAULT_STYLE = {
+    "name": "Default", "primarycolour": "&H00FFFFFF", "secondarycolour": "&H000000FF",
+    "outlinecolour": "&H00000000", "tertiarycolour": "&H00000000", "backcolour": "&H80000000",
+    "scalex": "100", "scaley": "100", "borderstyle": "1", "outline": "2", "alignment": "2",
+    "marginl": "10", "marginr": "10", "marginv": "40", "encoding": "1",
+}
+
+
+def escape_ass_text(text: str) -> str:
+    """纯文本 -> ASS 对白文本: 花括号转义为 \\{ \\}，换行写为 \\N，原有的反斜杠序列不再生效"""
+    text = _ASS_ESCAPE_RE.sub("\\\\" + _ASS_GUARD, text)
+    return text.replace("{", "\\{").replace("}", "\\}").replace("\n", "\\N")
+
+
+def write_ass(cues: Iterable[Cue], f: TextIO, width: int = 1920, height: int = 1080,
+              font: str = "Arial", font_size: int = 48, layout: Optional[AssLayout] = None) -> int:
+    """layout 来自 read_ass_layout 时沿用原文件的样式行与 Format 字段顺序，缺少 Default 样式时补上"""
+    style_format = layout.style_format if layout and layout.style_format else ASS_STYLE_FORMAT
+    event_format = layout.event_format if layout and layout.event_format else ASS_EVENT_FORMAT
+    styles = [",".join(values) for values in (layout.styles if layout and layout.style_format else [])]
+    if not any(line.split(",", 1)[0] == "Default" for line in styles):
+        default = dict(_ASS_DEFAULT_STYLE, fontname=font, fontsize=str(font_size))
+        styles.insert(0, ",".join(default.get(field.lower(), "0") for field in style_format))
+
+    styles_section = (layout and layout.styles_section) or "[V4+ Styles]"
+    script_type = "v4.00" if styles_section.lower() == "[v4 styles]" else "v4.00+"
+    f.write(ASS_HEADER.format(script_type=script_type, width=width, height=height))
+    f.write(f"\n{styles_section}\nFormat: {', '.join(style_format)}\n")
+    f.writelines(f"Style: {line}\n" for line in styles)
+    f.write(f"\n[Events]\nFormat: {', '.join(event_format)}\n")
+
+    fields = [field.lower() for field in event_format]
+    count = 0
+    for cue in cues:
+        count += 1
+        row = {"layer": "0", "marked": "Marked=0", "marginl": "0", "marginr": "0", "marginv": "0", "start": format_ass_time(cue.start),
+               "end": format_ass_time(cue.end), "style": cue.style or "Default", "text": escape_ass_text(cue.text)}
+        f.write(f"Dialogue: {','.join(row.get(field, '') for field in fields)}\n")
+    return count
+
+
+_WRITERS = {"srt": write_srt, "vtt": write_vtt, "ass": write_ass}
+
+
+def write_subtitles(path: str, cues: Iterable[Cue], fmt: Optional[str] = None, **options) -> int:
+    """按扩展名(或 fmt)流式写出字幕文件，返回写入条数"""
+    writer = _WRITERS[fmt or detect_format(path)]
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        return writer(cues, f, **options)
+
+
+# --- 与快照文本元素互转 ---
+
+def cue_to_subtitle(cue: Cue, style: Optional[Dict] = None) -> Dict:
+    """Cue -> addMultipleSubtitles 所需的字幕字典"""
+    subtitle = {
+        "text": cue.text,
+        "startTime": cue.start,
+        "duration": max(0.0, cue.end - cue.start),
+    }
+    if style:
+        subtitle.update(style)
+    return subtitle
+
+
+def element_to_cue(element: Dict) -> Cue:
+    """快照中的文本元素 -> Cue (可见时长需扣除裁剪)"""
+    start = element.get("startTime", 0)
+    visible = element.get("duration", 0) - element.get("trimStart", 0) - element.get("trimEnd", 0)
+    return Cue(start, start + visible, element.get("content", ""))
+
+
+def iter_snapshot_cues(snapshot: Dict, track_id: Optional[str] = None) -> Iterator[Cue]:
+    """按开始时间顺序产出快照中文本轨道的字幕"""
+    elements = []
+    for track in snapshot.get("tracks", []):
+        if track.get("type") != "text":
+            continue
+        if track_id and track.get("id") != track_id:
+            continue
+        elements.extend(el for el in track.get("elements", []) if el.get("type") == "text")
+    elements.sort(key=lambda el: el.get("startTime", 0))
+    for element in elements:
+        yield element_to_cue(element)
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) == 3:
+        options = {}
+        if detect_format(sys.argv[1]) == detect_format(sys.argv[2]) == "ass":
+            options["layout"] = read_ass_layout(sys.argv[1])
+        n = write_subtitles(sys.argv[2], read_subtitles(sys.argv[1]), **options)
+        print(f"Converted {n} cues: {sys.argv[1]} -> {sys.argv[2]}")
+    else:
+        print("Usage: python subtitle_io.py <input.srt|vtt|ass> <output.srt|vtt|ass>")
@@ -1,9 +1,14 @@
 import os
 import json
 import asyncio
+import hashlib
 import edge_tts
-from pymediainfo import MediaInfo
 from pathlib import Path
+from media_duration import get_media_duration
+from subtitle_io import Cue, write_subtitles
+from tts_batch import synthesize_batch
+from narration import build_narration
+from timebase import FrameClock
 
 # 配置路径
 PROJECT_ROOT = Path(__file__).parent.parent
@@ -11,11 +16,19 @@ PROJECT_JSON = PROJECT_ROOT / "remotion-studio/src/projects/demo.json"
 ASSETS_DIR = PROJECT_ROOT / "remotion-studio/public/assets/projects/demo"
 AUDIO_DIR = ASSETS_DIR / "audio/segments"
 SRT_PATH = PROJECT_ROOT / "remotion-studio/src/projects/demo_subtitles.srt"
+# 增量清单: 记录每段文本的哈希、音频文件和实测时长，以及上次同步后的时间轴
+MANIFEST_PATH = AUDIO_DIR / "manifest.json"
+MANIFEST_VERSION = 1
 
 # TTS 配置
 VOICE = "zh-CN-YunyangNeural"
 RATE = "+0%"
 VOLUME = "+0%"
+MAX_CONCURRENT_TTS = 4  # 并行合成的最大连接数
+BATCH_TTS = True  # 合并连续片段为一次请求，再按词边界拆分
+# 合并模式: 所有片段拼接为一个旁白文件，配音轨只保留一个片段 (段偏移写入 segments)
+CONSOLIDATE_NARRATION = False
+NARRATION_FILENAME = "narration.mp3"
 
 async def generate_voice(text, output_file):
     """调用 Edge-TTS 生成语音"""
@@ -24,23 +37,97 @@ async def generate_voice(text, output_file):
 
 def get_audio_duration(file_path):
     """获取音频文件的实际时长（秒）"""
-    media_info = MediaInfo.parse(file_path)
-    for track in media_info.tracks:
-        if track.track_type == "Audio":
-            return float(track.duration) / 1000.0
-    return 0.0
-
-def format_srt_time(seconds):
-    """将秒数转为 SRT 时间格式: HH:MM:SS,mmm"""
-    ms = int((seconds % 1) * 1000)
-    s = int(seconds % 60)
-    m = int((seconds // 60) % 60)
-    h = int(seconds // 3600)
-    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+    return get_media_duration(file_path) or 0.0
+
+def segment_hash(text):
+    """文本 + 音色参数的哈希，任一变化都需要重新合成"""
+    key = f"{VOICE}|{RATE}|{VOLUME}|{text}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+def load_manifest():
+    """读取增量清单，不存在或版本不符时返回空清单"""
+    if MANIFEST_PATH.exists():
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+    return {"version": MANIFEST_VERSION, "segments": {}, "timeline": []}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+async def synthesize_segments(jobs):
+    """并行合成所有需要更新的片段，返回 {hash: duration}"""
+    if BATCH_TTS:
+        pieces = await synthesize_batch(
+            [(text, VOICE) for _, text, _ in jobs],
+            rate=RATE, volume=VOLUME, concurrency=MAX_CONCURRENT_TTS
+        )
+        durations = {}
+        for (seg_hash, _, audio_path), piece in zip(jobs, pieces):
+            # 合成失败的空音频不写入 (否则会被当作缓存一直沿用)
+            if not piece or not piece.audio or piece.duration <= 0:
+                continue
+            with open(audio_path, "wb") as f:
+                f.write(piece.audio)
+            durations[seg_hash] = piece.duration
+        return durations
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_TTS)
+
+    async def run(seg_hash, text, audio_path):
+        async with semaphore:
+            await generate_voice(text, str(audio_path))
+        return seg_hash, get_audio_duration(str(audio_path))
+
+    results = await asyncio.gather(*(run(*job) for job in jobs))
+    return {seg_hash: duration for seg_hash, duration in results if duration > 0}
+
+def common_prefix_len(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+def make_ripple_remap(old_timeline, new_timeline, first_change, old_suffix, new_suffix):
+    """构造旧时间 -> 新时间的分段线性映射
+
+    首个变化点之前的时间保持不变；最后一个变化点之后整体平移；
+    两者之间的区间按新旧长度线性伸缩。
+    """
+    def start_of(timeline, index):
+        if index < len(timeline):
+            return timeline[index]["start"]
+        if timeline:
+            return timeline[-1]["start"] + timeline[-1]["duration"]
+        return 0.0
+
+    anchor = start_of(old_timeline, first_change)
+    old_end = start_of(old_timeline, old_suffix)
+    new_end = start_of(new_timeline, new_suffix)
+    shift = new_end - old_end
+    scale = (new_end - anchor) / (old_end - anchor) if old_end > anchor else 1.0
+
+    def remap(t):
+        if t <= anchor:
+            return t
+        if t >= old_end:
+            return t + shift
+        return anchor + (t - anchor) * scale
+
+    return remap
 
 async def sync_all():
     print("🎬 [SyncEngine] 启动同步引擎...")
-    
+
     if not os.path.exists(PROJECT_JSON):
         print(f"❌ 找不到项目文件: {PROJECT_JSON}")
         return
@@ -55,31 +142,64 @@ async def sync_all():
         return
 
     os.makedirs(AUDIO_DIR, exist_ok=True)
-    
-    new_sub_clips = []
-    new_voice_clips = []
-    current_time = 0.0
-    srt_content = []
-
-    print(f"🎙️ 正在根据文本重新生成音频 (共 {len(subtitles_track['clips'])} 段)...")
+    manifest = load_manifest()
+    cache = manifest["segments"]
+    old_timeline = manifest["timeline"]
 
-    for i, clip in enumerate(subtitles_track["clips"]):
+    # 2. 计算每段哈希，只为新增/修改的文本安排合成
+    segments = []
+    jobs = {}
+    for clip in subtitles_track["clips"]:
         text = clip.get("text", "").strip()
         if not text: continue
 
-        audio_filename = f"s{i+1:02}.mp3"
-        audio_path = AUDIO_DIR / audio_filename
-        
-        # A. 生成音频
-        await generate_voice(text, str(audio_path))
-        
-        # B. 获取真实时长
-        duration = get_audio_duration(str(audio_path))
-        
-        # C. 构造新的时间轴片段 (并保留原有属性如 position, style)
-        start_time = round(current_time, 3)
-        duration = round(duration, 3)
-        
+        seg_hash = segment_hash(text)
+        audio_filename = f"seg_{seg_hash}.mp3"
+        entry = cache.get(seg_hash)
+        audio_file = AUDIO_DIR / entry["file"] if entry else None
+        if not entry or entry.get("duration", 0) <= 0 or not audio_file.exists() or audio_file.stat().st_size == 0:
+            jobs[seg_hash] = (seg_hash, text, AUDIO_DIR / audio_filename)
+        segments.append((clip, text, seg_hash))
+
+    print(f"🎙️ 共 {len(segments)} 段，需要重新生成 {len(jobs)} 段音频...")
+    if jobs:
+        durations = await synthesize_segments(list(jobs.values()))
+        for seg_hash, duration in durations.items():
+            cache[seg_hash] = {
+                "file": jobs[seg_hash][2].name,
+                "duration": round(duration, 3),
+            }
+        failed = [seg_hash for seg_hash in jobs if seg_hash not in durations]
+        for seg_hash in failed:
+            cache.pop(seg_hash, None)
+            print(f"⚠️ 片段合成失败，已跳过: {jobs[seg_hash][1][:20]}")
+        segments = [seg for seg in segments if seg[2] in cache]
+
+    old_order = [seg["hash"] for seg in old_timeline]
+    new_order = [seg_hash for _, _, seg_hash in segments]
+    first_change = common_prefix_len(old_order, new_order)
+    if not jobs and old_order == new_order:
+        print("✅ 文本未变化，无需同步。")
+        return
+
+    # 3. 涟漪重排：变化点之前沿用上次的时间，之后依次顺延
+    # 以整数帧累加，下一段从上一段音频结束后的第一个帧边界开始，避免逐段舍入漂移
+    clock = FrameClock(project.get("fps"))
+    new_timeline = []
+    new_sub_clips = []
+    new_voice_clips = []
+    srt_cues = []
+    current_frame = 0
+
+    for i, (clip, text, seg_hash) in enumerate(segments):
+        duration = cache[seg_hash]["duration"]
+        if i < first_change:
+            start_time = old_timeline[i]["start"]
+        else:
+            start_time = clock.to_seconds(current_frame)
+        current_frame = clock.to_frames(start_time + duration, "ceil")
+        new_timeline.append({"hash": seg_hash, "start": start_time, "duration": duration})
+
         # 克隆原始对象副本以保留样式
         new_clip = clip.copy()
         new_clip.update({
@@ -92,50 +212,94 @@ async def sync_all():
         new_voice_clips.append({
             "id": f"voice_{i+1}",
             "type": "audio",
-            "path": f"/assets/projects/demo/audio/segments/{audio_filename}",
+            "path": f"/assets/projects/demo/audio/segments/{cache[seg_hash]['file']}",
             "start": start_time,
             "duration": duration,
             "volume": 1.0
         })
 
         # 构建 SRT 内容
-        srt_content.append(f"{i+1}")
-        srt_content.append(f"{format_srt_time(start_time)} --> {format_srt_time(start_time + duration)}")
-        srt_content.append(f"{text}\n")
+        srt_cues.append(Cue(start_time, start_time + duration, text))
 
-        current_time += duration
+    # 合并旁白时各段的实际位置以拼接结果为准 (MP3 空白按整帧填充)，字幕与时间轴随之对齐
+    voice_track = next((t for t in project["tracks"] if t["id"] == "track_voiceover"), None)
+    meta = None
+    if voice_track and CONSOLIDATE_NARRATION and new_voice_clips:
+        meta = build_narration(
+            [str(AUDIO_DIR / cache[seg["hash"]]["file"]) for seg in new_timeline],
+            str(AUDIO_DIR / NARRATION_FILENAME),
+            starts=[seg["start"] for seg in new_timeline],
+            segment_ids=[clip["id"] for clip in new_voice_clips]
+        )
+        for i, segment in enumerate(meta["segments"]):
+            start_time = segment["offset"]
+            new_timeline[i]["start"] = start_time
+            new_sub_clips[i]["start"] = start_time
+            srt_cues[i] = srt_cues[i]._replace(start=start_time, end=start_time + new_timeline[i]["duration"])
 
-    # 2. 漣漪更新：同步视频背景轨道
-    total_duration = current_time
+    # 4. 涟漪更新：同步视频背景轨道
+    total_duration = clock.to_seconds(current_frame)
     video_track = next((t for t in project["tracks"] if t.get("type") == "video"), None)
     if video_track and len(video_track["clips"]) > 0:
-        # 简单逻辑：平分总时长给现有图片
-        avg_dur = total_duration / len(video_track["clips"])
-        v_time = 0.0
-        for v_clip in video_track["clips"]:
-            v_clip["start"] = round(v_time, 3)
-            v_clip["duration"] = round(avg_dur, 3)
-            v_time += avg_dur
-
-    # 3. 更新项目总时长
-    project["duration"] = round(total_duration, 3)
-    
+        if old_timeline:
+            # 按变化区间映射已有片段的起止时间，保留用户手动调整的节奏
+            suffix = common_prefix_len(old_order[::-1], new_order[::-1])
+            suffix = min(suffix, len(old_order) - first_change, len(new_order) - first_change)
+            remap = make_ripple_remap(
+                old_timeline, new_timeline, first_change,
+                len(old_order) - suffix, len(new_order) - suffix
+            )
+            for v_clip in video_track["clips"]:
+                v_start = v_clip.get("start", 0.0)
+                v_end = v_start + v_clip.get("duration", 0.0)
+                start_frame = clock.to_frames(remap(v_start))
+                v_clip["start"] = clock.to_seconds(start_frame)
+                v_clip["duration"] = clock.to_seconds(clock.to_frames(remap(v_end)) - start_frame)
+        else:
+            # 首次同步没有旧时间轴可参照：平分总时长给现有图片
+            count = len(video_track["clips"])
+            for i, v_clip in enumerate(video_track["clips"]):
+                start_frame = current_frame * i // count
+                v_clip["start"] = clock.to_seconds(start_frame)
+                v_clip["duration"] = clock.to_seconds(current_frame * (i + 1) // count - start_frame)
+
+    # 5. 更新项目总时长
+    project["duration"] = total_duration
+
     # 查找并更新音频轨道
-    voice_track = next((t for t in project["tracks"] if t["id"] == "track_voiceover"), None)
-    if voice_track:
+    if meta is not None:
+        voice_track["clips"] = [{
+            "id": "voice_narration",
+            "type": "audio",
+            "path": f"/assets/projects/demo/audio/segments/{NARRATION_FILENAME}",
+            "start": 0.0,
+            "duration": round(meta["duration"], 3),
+            "volume": 1.0,
+            "segments": meta["segments"]
+        }]
+    elif voice_track:
         voice_track["clips"] = new_voice_clips
-    
+
     # 回写字幕轨道（此时已带有时长信息）
     subtitles_track["clips"] = new_sub_clips
 
-    # 4. 保存文件
+    # 6. 保存文件
     with open(PROJECT_JSON, "w", encoding="utf-8") as f:
         json.dump(project, f, ensure_ascii=False, indent=4)
-    
-    with open(SRT_PATH, "w", encoding="utf-8") as f:
-        f.write("\n".join(srt_content))
 
-    print(f"✅ 同步完成！")
+    write_subtitles(str(SRT_PATH), srt_cues)
+
+    # 清理不再被引用的旧音频，并记录本次时间轴供下次增量对比
+    live = set(new_order)
+    for seg_hash in list(cache):
+        if seg_hash not in live:
+            stale = AUDIO_DIR / cache.pop(seg_hash)["file"]
+            if stale.exists():
+                stale.unlink()
+    manifest["timeline"] = new_timeline
+    save_manifest(manifest)
+
+    print(f"✅ 同步完成！(首个变化位于第 {first_change + 1} 段)")
     print(f"⏱️ 总时长: {project['duration']}s")
     print(f"📄 更新了 {PROJECT_JSON.name}")
     print(f"📄 更新了 {SRT_PATH.name}")
@@ -0,0 +1,290 @@
+"""
+Text Columns - 文本轨道的列式二进制存储 (.aict)
+
+长转写生成的字幕轨道有成千上万个文本元素，且样式字典几乎完全相同。这里把数值字段
+(startTime、duration、x、y、fontSize 等) 存为紧凑的 float64 列，内容和 id 存为字符串表，
+其余字段 (样式) 去重后存为样式表，每个元素只记录样式下标。numpy 一次读入即可按列访问。
+
+文件布局 (小端):
+    "AICT" | u32 版本 | u32 头部长度 | 头部 JSON | 8 字节对齐的数据区
+头部记录元素数、轨道字段、样式表以及各列在数据区中的偏移 (常量列只在头部记录一个值)。
+全为整数的数值列记入 intColumns；整数与小数混合的列另存一列 u1 掩码 (<字段>.int) 标记哪些值原为整数。
+每个样式同时记录元素的字段顺序 (orders)，轨道字段顺序记在 trackKeys，解码结果与原字典完全一致
+(包括字段顺序)，重新编码得到相同的字节。
+格式与前端 src/lib/text-columns.ts 一致。
+
+用法:
+    from text_columns import write_track, read_track, load_columns
+
+    write_track("subs.aict", track)          # track 为快照中的文本轨道
+    track = read_track("subs.aict")          # 还原为普通字典
+    cols = load_columns("subs.aict")         # {"startTime": ndarray, ..., "content": [...]}
+
+    python text_columns.py bench             # 与 JSON 对比 1 万 / 10 万条字幕的体积和加载耗时
+"""
+import json
+import math
+import struct
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+MAGIC = b"AICT"
+VERSION = 1
+# 以数值列存储的字段
+NUMERIC_FIELDS = ("startTime", "duration", "trimStart", "trimEnd", "x", "y", "fontSize", "rotation", "opacity")
+# 以字符串表存储的字段 (只有当所有元素都有该字符串字段时才单独成列，否则留在样式中)
+STRING_FIELDS = ("id", "content", "name")
+# 达到该元素数的文本轨道才值得使用列式存储
+MIN_ELEMENTS = 1000
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _string_table(values: Sequence[str]):
+    """返回 (u32 偏移数组, UTF-8 字节)"""
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded)
+
+
+def encode_track(track: Dict) -> bytes:
+    """把文本轨道编码为 .aict 字节"""
+    elements = track.get("elements", [])
+    count = len(elements)
+    numeric = {name: np.full(count, np.nan) for name in NUMERIC_FIELDS}
+    ints = {name: np.zeros(count, dtype=np.uint8) for name in NUMERIC_FIELDS}
+    style_ids = np.zeros(count, dtype="<u4")
+    styles: List[Dict] = []
+    orders: List[List[str]] = []
+    style_index: Dict[str, int] = {}
+    string_fields = [
+        name for name in STRING_FIELDS
+        if all(isinstance(el.get(name), str) for el in elements)
+    ]
+    strings = {name: [] for name in string_fields}
+
+    for i, element in enumerate(elements):
+        style = {}
+        for key, value in element.items():
+            if key in strings:
+                strings[key].append(value)
+                continue
+            if key in numeric and _is_number(value) and math.isfinite(value):
+                numeric[key][i] = value
+                ints[key][i] = isinstance(value, int)
+            else:
+                style[key] = value
+        # 字段顺序不同的元素使用不同的样式条目，解码时按原顺序还原
+        key = json.dumps([list(element), style], ensure_ascii=False, sort_keys=True)
+        if key not in style_index:
+            style_index[key] = len(styles)
+            styles.append(style)
+            orders.append(list(element))
+        style_ids[i] = style_index[key]
+
+    columns, blobs = {}, []
+    int_columns, int_masks = [], []
+    for name in NUMERIC_FIELDS:
+        values = numeric[name]
+        present = ~np.isnan(values)
+        if not present.any():
+            continue
+        if ints[name][present].all():
+            int_columns.append(name)
+        elif ints[name].any():
+            int_masks.append(name)
+            blobs.append((f"{name}.int", "u1", ints[name].tobytes()))
+        if count and not np.isnan(values).any() and (values == values[0]).all():
+            # 常量列 (如统一的 fontSize / y) 只在头部记录一个值
+            # 整数值写成 JSON 整数，与前端 JSON.stringify 的输出一致
+            const = float(values[0])
+            columns[name] = {"dtype": "f8", "const": int(const) if const.is_integer() else const}
+        else:
+            blobs.append((name, "f8", values.astype("<f8").tobytes()))
+    blobs.append(("style", "u4", style_ids.tobytes()))
+    for name, values in strings.items():
+        offsets, data = _string_table(values)
+        blobs.append((f"{name}.offsets", "u4", offsets.tobytes()))
+        blobs.append((f"{name}.bytes", "u1", data))
+
+    data_parts, pos = [], 0
+    for name, dtype, blob in blobs:
+        columns[name] = {"dtype": dtype, "offset": pos, "size": len(blob)}
+        padded = _align(len(blob))
+        data_parts.append(blob + b"\x00" * (padded - len(blob)))
+        pos += padded
+
+    header = json.dumps({
+        "count": count,
+        "track": {k: v for k, v in track.items() if k != "elements"},
+        "trackKeys": list(track),
+        "styles": styles,
+        "orders": orders,
+        "intColumns": int_columns,
+        "intMasks": int_masks,
+        "stringColumns": string_fields,
+        "columns": columns,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    header += b" " * (_align(12 + len(header)) - 12 - len(header))
+    return MAGIC + struct.pack("<II", VERSION, len(header)) + header + b"".join(data_parts)
+
+
+def _parse(data: bytes):
+    if data[:4] != MAGIC:
+        raise ValueError("not an .aict file")
+    version, header_len = struct.unpack_from("<II", data, 4)
+    if version != VERSION:
+        raise ValueError(f"unsupported .aict version {version}")
+    header = json.loads(data[12:12 + header_len])
+    base = 12 + header_len
+    buf = memoryview(data)
+
+    def column(name):
+        spec = header["columns"][name]
+        if "const" in spec:
+            return np.full(header["count"], spec["const"], dtype="<" + spec["dtype"])
+        start = base + spec["offset"]
+        return np.frombuffer(buf[start:start + spec["size"]], dtype="<" + spec["dtype"])
+
+    return header, column
+
+
+def _strings(column, name: str, count: int) -> List[str]:
+    offsets = column(f"{name}.offsets")
+    raw = column(f"{name}.bytes").tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(count)]
+
+
+def load_columns(path: str) -> Dict:
+    """一次读入，返回列式数据: 数值列为 ndarray (缺失为 NaN)，字符串列为 list，另含 style/styles/track"""
+    with open(path, "rb") as f:
+        data = f.read()
+    header, column = _parse(data)
+    count = header["count"]
+    cols = {name: column(name) for name in NUMERIC_FIELDS if name in header["columns"]}
+    cols["style"] = column("style")
+    for name in header["stringColumns"]:
+        cols[name] = _strings(column, name, count)
+    cols["styles"] = header["styles"]
+    cols["track"] = header["track"]
+    cols["intColumns"] = header["intColumns"]
+    cols["intMasks"] = {name: column(f"{name}.int").astype(bool) for name in header.get("intMasks", [])}
+    return cols
+
+
+def decode_track(data: bytes) -> Dict:
+    """把 .aict 字节还原为普通轨道字典"""
+    header, column = _parse(data)
+    count = header["count"]
+    strings = [(name, _strings(column, name, count)) for name in header["stringColumns"]]
+    style_ids = column("style").tolist()
+    int_columns = set(header["intColumns"])
+    int_masks = set(header.get("intMasks", []))
+    # as_int: True 为整列整数，列表为逐个值的整数掩码，None 为小数
+    numeric = [
+        (name, column(name).tolist(),
+         True if name in int_columns else column(f"{name}.int").tolist() if name in int_masks else None)
+        for name in NUMERIC_FIELDS if name in header["columns"]
+    ]
+    styles = header["styles"]
+    if "orders" in header:
+        # 按原字段顺序预先排好键的模板，后面赋值不改变键的位置
+        styles = [{key: style.get(key) for key in order} for style, order in zip(styles, header["orders"])]
+
+    elements = []
+    for i in range(count):
+        element = dict(styles[style_ids[i]])
+        for name, values in strings:
+            element[name] = values[i]
+        for name, values, as_int in numeric:
+            value = values[i]
+            if value == value:  # 跳过 NaN (该元素没有此字段)
+                element[name] = int(value) if as_int is True or (as_int is not None and as_int[i]) else value
+        elements.append(element)
+    track = dict(header["track"])
+    track["elements"] = elements
+    if "trackKeys" in header:
+        track = {key: track[key] for key in header["trackKeys"]}
+    return track
+
+
+def write_track(path: str, track: Dict) -> int:
+    data = encode_track(track)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+def read_track(path: str) -> Dict:
+    with open(path, "rb") as f:
+        return decode_track(f.read())
+
+
+def _synthetic_track(n: int) -> Dict:
+    style = {
+        "type": "text", "fontFamily": "Arial", "color": "#ffffff", "backgroundColor": "transparent",
+        "textAlign": "center", "fontWeight": "normal", "fontStyle": "normal", "textDecoration": "none",
+    }
+    return {
+        "id": "subtitle-track", "name": "Subtitles", "type": "text", "muted": False,
+        "elements": [
+            {"id": f"sub_{i:06d}", **style, "content": f"第 {i} 句字幕，示例转写文本。",
+             "startTime": round(i * 2.5, 3), "duration": 2.5, "trimStart": 0, "trimEnd": 0,
+             "x": 0, "y": 400, "fontSize": 48, "rotation": 0, "opacity": 1}
+            for i in range(n)
+        ],
+    }
+
+
+def benchmark(sizes=(10_000, 100_000), repeat: int = 3):
+    """打印 JSON 与 .aict 的体积和加载耗时"""
+    import os
+    import tempfile
+    import time
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'cues':>8} {'json KB':>9} {'aict KB':>9} {'json load':>10} {'columns':>9} {'elements':>9}")
+        for n in sizes:
+            track = _synthetic_track(n)
+            json_path = os.path.join(tmp, f"{n}.json")
+            aict_path = os.path.join(tmp, f"{n}.aict")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(track, f, ensure_ascii=False, indent=2)
+            write_track(aict_path, track)
+            assert read_track(aict_path) == track
+
+            def load_json():
+                with open(json_path, "r", encoding="utf-8") as f:
+                    json.load(f)
+
+            print(f"{n:>8} {os.path.getsize(json_path) / 1024:>9.0f} {os.path.getsize(aict_path) / 1024:>9.0f} "
+                  f"{best(load_json):>8.1f}ms {best(lambda: load_columns(aict_path)):>7.1f}ms "
+                  f"{best(lambda: read_track(aict_path)):>7.1f}ms")
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        benchmark()
+    elif len(sys.argv) == 3:
+        with open(sys.argv[1], "r", encoding="utf-8") as f:
+            size = write_track(sys.argv[2], json.load(f))
+        print(f"Wrote {sys.argv[2]} ({size} bytes)")
+    else:
+        print("Usage: python text_columns.py bench | <track.json> <out.aict>")
@@ -0,0 +1,163 @@
+"""
+Thumbnail Service - 按内容指纹缓存的缩略图服务
+
+缩略图以 "<内容指纹>_<尺寸预设>.jpg" 命名存放在 ai_workspace/cache/thumbnails/，
+同一文件重复导入 (或在不同项目、不同路径下导入) 都直接命中缓存，不再启动 ffmpeg。
+未命中时在有上限的进程池中生成；同一文件同一预设的并发请求合并为一个任务。
+生成结果先写临时文件再原子替换，多个进程同时生成也不会读到半个文件。
+前端 /api/media/generate-thumbnail 使用同一目录和命名 (medium 预设)。
+
+用法:
+    from thumbnail_service import thumbnail_url
+
+    thumbnail_url("video.mp4")                    # "/api/media/serve?path=..." (失败时为 None)
+    thumbnail_url("video.mp4", preset="small")
+
+    python thumbnail_service.py [--preset medium] <files...>
+"""
+import os
+import subprocess
+import threading
+import urllib.parse
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from asset_id import content_fingerprint
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "ai_workspace", "cache")
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+# 预设 -> 最大宽度 (像素，高度按比例，原图更小时不放大)
+PRESETS = {"small": 160, "medium": 320, "large": 640}
+DEFAULT_PRESET = "medium"
+# 依次尝试的截帧时间 (秒)，不足 1 秒的视频回退到第一帧
+SEEK_TIMES = (1.0, 0.0)
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def serve_url(path: str) -> str:
+    return f"/api/media/serve?path={urllib.parse.quote(os.path.abspath(path))}"
+
+
+def _render(src: str, dst: str, width: int) -> Optional[str]:
+    """进程池任务: 用 ffmpeg 截取一帧并缩放，成功时返回输出路径"""
+    tmp = f"{dst}.{os.getpid()}.tmp.jpg"
+    for seek in SEEK_TIMES:
+        cmd = [
+            "ffmpeg", "-y", "-v", "error", "-ss", str(seek), "-i", src,
+            "-frames:v", "1", "-vf", f"scale='min({width},iw)':-2", "-q:v", "3", tmp,
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        if os.path.exists(tmp) and os.path.getsize(tmp) > 0:
+            os.replace(tmp, dst)
+            return dst
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    return None
+
+
+class ThumbnailService:
+    """缩略图缓存 + 有上限的生成进程池 + 同键请求合并"""
+
+    def __init__(self, cache_dir: str = THUMBNAIL_DIR, max_workers: int = MAX_WORKERS):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, fingerprint: str, preset: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}_{preset}.jpg")
+
+    def request(self, path: str, preset: str = DEFAULT_PRESET) -> Future:
+        """返回结果为缩略图路径 (失败时为 None) 的 Future；已缓存时直接返回已完成的 Future
+
+        文件不存在时抛出 OSError。
+        """
+        if preset not in PRESETS:
+            raise ValueError(f"unknown thumbnail preset {preset!r}, expected one of {tuple(PRESETS)}")
+        key = (content_fingerprint(path), preset)
+        dst = self.path_for(*key)
+        if os.path.exists(dst):
+            return _done(dst)
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            if os.path.exists(dst):
+                return _done(dst)
+            if self._executor is None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            future = self._executor.submit(_render, os.path.abspath(path), dst, PRESETS[preset])
+            self._inflight[key] = future
+        future.add_done_callback(lambda _f: self._release(key))
+        return future
+
+    def _release(self, key: Tuple[str, str]):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def get(self, path: str, preset: str = DEFAULT_PRESET, timeout: float = None) -> Optional[str]:
+        """缩略图路径 (阻塞直到生成完成)，失败时返回 None"""
+        try:
+            return self.request(path, preset).result(timeout)
+        except Exception:
+            return None
+
+    def url(self, path: str, preset: str = DEFAULT_PRESET, timeout: float = None) -> Optional[str]:
+        thumb = self.get(path, preset, timeout)
+        return serve_url(thumb) if thumb else None
+
+    def prefetch(self, paths: List[str], preset: str = DEFAULT_PRESET) -> List[Future]:
+        """批量提交 (不等待)，返回与输入顺序对应的 Future"""
+        return [self.request(p, preset) for p in paths]
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _done(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+_service: Optional[ThumbnailService] = None
+_service_lock = threading.Lock()
+
+
+def get_service() -> ThumbnailService:
+    """进程内共享的服务实例 (共享进程池和合并表)"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ThumbnailService()
+        return _service
+
+
+def thumbnail_url(path: str, preset: str = DEFAULT_PRESET, timeout: float = None) -> Optional[str]:
+    return get_service().url(path, preset, timeout)
+
+
+if __name__ == "__main__":
+    import sys
+    args = sys.argv[1:]
+    preset = DEFAULT_PRESET
+    if len(args) >= 2 and args[0] == "--preset":
+        preset, args = args[1], args[2:]
+    if not args:
+        print("Usage: python thumbnail_service.py [--preset small|medium|large] <files...>")
+        sys.exit(1)
+    service = get_service()
+    futures = service.prefetch(args, preset)
+    for file_path, future in zip(args, futures):
+        result = future.result()
+        print(f"{result or 'FAILED'}  {file_path}")
+    service.shutdown()
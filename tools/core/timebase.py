@@ -0,0 +1,170 @@
+"""
+Timebase - 帧精确的有理时间模型
+
+快照中的时间以浮点秒存储 (如 Whisper 给出的 0.47333333333333333)，逐段 round(..., 3)
+累加后会产生漂移，重叠判断也只能模糊比较。这里把时间换算为 project.fps 下的整数帧:
+帧率用有理数表示 (29.97 -> 30000/1001)，整份快照的换算和吸附用 numpy 一次完成，
+重叠检测直接比较整数帧，写回时再换算为秒以兼容现有结构。
+
+吸附时对起点和终点分别取整，时长 = 终点 - 起点，首尾相接的片段吸附后依然首尾相接。
+
+用法:
+    from timebase import FrameClock, snap_snapshot, find_overlaps
+
+    clock = FrameClock.for_snapshot(snapshot)
+    clock.to_frames(0.4733)                  # 14
+    clock.to_seconds(14)                     # 0.4666666666666667
+    snapped, moved = snap_snapshot(snapshot)
+    find_overlaps(snapshot["tracks"][0], clock)
+"""
+from fractions import Fraction
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+DEFAULT_FPS = 30
+# 按帧吸附的元素时间字段
+TIME_FIELDS = ("startTime", "duration", "trimStart", "trimEnd")
+# 浮点乘法误差容忍 (帧)，避免 0.1 * 30 = 3.0000000000000004 被向上取整为 4
+_EPSILON = 1e-6
+
+
+class FrameClock:
+    """秒与整数帧之间的换算，帧率为有理数"""
+
+    def __init__(self, fps=DEFAULT_FPS):
+        fps = float(fps or DEFAULT_FPS)
+        nominal = round(fps)
+        if nominal and abs(fps - nominal * 1000 / 1001) < 0.005:
+            # NTSC 帧率 (23.976/29.97/59.94) 精确表示为 N*1000/1001
+            self.rate = Fraction(nominal * 1000, 1001)
+        else:
+            self.rate = Fraction(fps).limit_denominator(1001)
+
+    @classmethod
+    def for_snapshot(cls, snapshot: Dict) -> "FrameClock":
+        return cls((snapshot.get("project") or {}).get("fps") or DEFAULT_FPS)
+
+    @property
+    def fps(self) -> float:
+        return float(self.rate)
+
+    def to_frames(self, seconds, mode: str = "round"):
+        """秒 -> 整数帧 (标量或数组)；mode 为 round/floor/ceil"""
+        frames = np.asarray(seconds, dtype=np.float64) * self.rate.numerator / self.rate.denominator
+        if mode == "floor":
+            frames = np.floor(frames + _EPSILON)
+        elif mode == "ceil":
+            frames = np.ceil(frames - _EPSILON)
+        else:
+            frames = np.rint(frames)
+        frames = frames.astype(np.int64)
+        return int(frames) if frames.ndim == 0 else frames
+
+    def to_seconds(self, frames):
+        """整数帧 -> 秒 (标量或数组)，同一帧总是得到同一个浮点数"""
+        seconds = np.asarray(frames, dtype=np.float64) * self.rate.denominator / self.rate.numerator
+        return float(seconds) if seconds.ndim == 0 else seconds
+
+    def snap(self, seconds, mode: str = "round"):
+        return self.to_seconds(self.to_frames(seconds, mode))
+
+
+def element_columns(snapshot: Dict):
+    """把所有元素的时间字段收集为列 (缺失为 NaN)，返回 (元素列表, {字段: ndarray})"""
+    elements = [el for track in snapshot.get("tracks", []) for el in track.get("elements", [])]
+    columns = {}
+    for name in TIME_FIELDS:
+        values = [el.get(name) for el in elements]
+        try:
+            # 缺失 (None) 直接转为 NaN
+            columns[name] = np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            columns[name] = np.array(
+                [v if isinstance(v, (int, float)) and not isinstance(v, bool) else np.nan for v in values],
+                dtype=np.float64,
+            )
+    return elements, columns
+
+
+def visible_duration(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """时间轴上的可见时长 = duration - trimStart - trimEnd (与前端一致)"""
+    return (np.nan_to_num(columns["duration"]) - np.nan_to_num(columns["trimStart"])
+            - np.nan_to_num(columns["trimEnd"]))
+
+
+def snapshot_frames(snapshot: Dict, clock: FrameClock = None) -> Dict[str, np.ndarray]:
+    """整份快照的帧区间: {"track": 轨道下标, "start": 起始帧, "end": 结束帧}"""
+    clock = clock or FrameClock.for_snapshot(snapshot)
+    track_index = np.array(
+        [i for i, track in enumerate(snapshot.get("tracks", [])) for _ in track.get("elements", [])],
+        dtype=np.int64,
+    )
+    _, columns = element_columns(snapshot)
+    start = np.nan_to_num(columns["startTime"])
+    end = start + visible_duration(columns)
+    return {"track": track_index, "start": clock.to_frames(start), "end": clock.to_frames(end)}
+
+
+def snap_snapshot(snapshot: Dict, fps=None) -> Tuple[Dict, int]:
+    """把所有元素的时间吸附到帧边界，返回 (新快照, 被移动的元素数)"""
+    clock = FrameClock(fps) if fps else FrameClock.for_snapshot(snapshot)
+    tracks = [{**track, "elements": [dict(el) for el in track.get("elements", [])]}
+              for track in snapshot.get("tracks", [])]
+    snapped = {**snapshot, "tracks": tracks}
+    elements, columns = element_columns(snapped)
+    if not elements:
+        return snapped, 0
+
+    start, duration = columns["startTime"], columns["duration"]
+    start_frames = clock.to_frames(np.nan_to_num(start))
+    end_frames = clock.to_frames(np.nan_to_num(start) + np.nan_to_num(duration))
+    new_values = {
+        "startTime": clock.to_seconds(start_frames),
+        "duration": clock.to_seconds(end_frames - start_frames),
+        "trimStart": clock.snap(np.nan_to_num(columns["trimStart"])),
+        "trimEnd": clock.snap(np.nan_to_num(columns["trimEnd"])),
+    }
+
+    moved = np.zeros(len(elements), dtype=bool)
+    updates = {}
+    for name in TIME_FIELDS:
+        present = ~np.isnan(columns[name])
+        diff = present & (new_values[name] != columns[name])
+        moved |= diff
+        updates[name] = (np.flatnonzero(diff), new_values[name])
+    for name, (indices, values) in updates.items():
+        for i in indices.tolist():
+            value = float(values[i])
+            elements[i][name] = int(value) if value.is_integer() else value
+    return snapped, int(moved.sum())
+
+
+def find_overlaps(track: Dict, clock: FrameClock) -> List[Dict]:
+    """轨道内按整数帧精确检测重叠，返回 [{"a", "b", "start", "frames"}]
+
+    按起点排序后维护前缀最大终点，每个与前面元素重叠的元素报告一次，
+    对方为前面结束得最晚的那个元素。
+    """
+    elements = track.get("elements", [])
+    if len(elements) < 2:
+        return []
+    frames = snapshot_frames({"tracks": [track]}, clock)
+    order = np.lexsort((frames["end"], frames["start"]))
+    starts, ends = frames["start"][order], frames["end"][order]
+    reach = np.maximum.accumulate(ends)
+    holder = np.maximum.accumulate(np.where(ends == reach, np.arange(len(ends)), 0))
+
+    hits = np.flatnonzero(starts[1:] < reach[:-1]) + 1
+    overlaps = []
+    for i in hits.tolist():
+        j = int(holder[i - 1])
+        overlap = int(min(reach[i - 1], ends[i]) - starts[i])
+        if overlap > 0:
+            overlaps.append({
+                "a": elements[order[j]].get("id"),
+                "b": elements[order[i]].get("id"),
+                "start": clock.to_seconds(int(starts[i])),
+                "frames": overlap,
+            })
+    return overlaps
@@ -0,0 +1,219 @@
+"""
+Timeline Ops - 跨轨道的涟漪插入 / 涟漪删除 / 区间平移
+
+把所有元素的 startTime/duration/trimStart/trimEnd 收集为 numpy 列 (见 timebase.element_columns)，
+用布尔掩码一次算出受影响的元素和新值，只把变化的字段写回元素字典。
+操作返回新快照，原快照不变；SDK 中以一次 updateSnapshot 提交，作为单个原子编辑。
+
+元素的可见区间为 [startTime, startTime + duration - trimStart - trimEnd] (与前端一致)。
+
+用法:
+    from timeline_ops import ripple_insert, ripple_delete, shift
+
+    snapshot, count = ripple_insert(snapshot, at=10, duration=3)          # 10s 之后的元素后移 3s
+    snapshot, count = ripple_delete(snapshot, start=20, end=25)           # 删除 20-25s 并前移后续元素
+    snapshot, count = ripple_delete_ranges(snapshot, [(3, 4), (9, 12)])   # 一次删除多个区间
+    snapshot, count = shift(snapshot, start=30, end=40, delta=-1.5)       # 起点在 30-40s 的元素前移
+    snapshot, pieces = split_element(snapshot, "el-1", [12.4, 30.0])     # 在素材时间 12.4s/30s 处切开
+"""
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from timebase import element_columns, visible_duration
+
+# 时间比较的容差 (秒)
+EPSILON = 1e-6
+# 写回时的小数位数，去掉浮点加减带来的尾差
+DECIMALS = 6
+
+
+class _Timeline:
+    """快照的可写副本及其时间列"""
+
+    def __init__(self, snapshot: Dict, track_ids: Optional[Iterable[str]] = None):
+        # 元素列表是浅拷贝，写回时只复制发生变化的元素
+        self.tracks = [{**track, "elements": list(track.get("elements", []))} for track in snapshot.get("tracks", [])]
+        self.snapshot = {**snapshot, "tracks": self.tracks}
+        self.elements, columns = element_columns(self.snapshot)
+        self.start = np.nan_to_num(columns["startTime"])
+        self.trim_start = np.nan_to_num(columns["trimStart"])
+        self.trim_end = np.nan_to_num(columns["trimEnd"])
+        self.end = self.start + visible_duration(columns)
+        self.original = {"startTime": self.start.copy(), "trimStart": self.trim_start.copy(),
+                         "trimEnd": self.trim_end.copy()}
+
+        track_of = np.array([i for i, track in enumerate(self.tracks) for _ in track["elements"]], dtype=np.int64)
+        if track_ids is None:
+            self.selected = np.ones(len(self.elements), dtype=bool)
+        else:
+            wanted = set(track_ids)
+            chosen = np.array([track.get("id") in wanted for track in self.tracks], dtype=bool)
+            self.selected = chosen[track_of] if len(track_of) else np.zeros(0, dtype=bool)
+
+    def commit(self, removed: Optional[np.ndarray] = None) -> Tuple[Dict, int]:
+        """写回变化的字段、删除被移除的元素，返回 (新快照, 受影响的元素数)"""
+        fields = (("startTime", self.start), ("trimStart", self.trim_start), ("trimEnd", self.trim_end))
+        diffs = [(name, np.abs(values - self.original[name]) > EPSILON, np.round(values, DECIMALS))
+                 for name, values in fields]
+        changed = np.logical_or.reduce([diff for _, diff, _ in diffs])
+        updated = {}
+        for name, diff, rounded in diffs:
+            for i, value in zip(np.flatnonzero(diff).tolist(), rounded[diff].tolist()):
+                element = updated.get(i)
+                if element is None:
+                    element = updated[i] = dict(self.elements[i])
+                element[name] = int(value) if value.is_integer() else value
+        if removed is not None and removed.any():
+            changed |= removed
+        else:
+            removed = np.zeros(len(self.elements), dtype=bool)
+
+        offsets = np.concatenate([[0], np.cumsum([len(t["elements"]) for t in self.tracks])]).astype(int)
+        for t, track in enumerate(self.tracks):
+            lo, hi = offsets[t], offsets[t + 1]
+            if not changed[lo:hi].any():
+                continue
+            track["elements"] = [updated.get(i, el) for i, el in zip(range(lo, hi), track["elements"])
+                                 if not removed[i]]
+        return self.snapshot, int(changed.sum())
+
+
+def ripple_insert(snapshot: Dict, at: float, duration: float,
+                  track_ids: Optional[Iterable[str]] = None) -> Tuple[Dict, int]:
+    """在 at 处插入 duration 秒空白: 起点不早于 at 的元素整体后移
+
+    跨越 at 的元素保持不动 (需要拆分时请先在 at 处切开)。
+    """
+    if duration <= 0:
+        raise ValueError("duration must be positive")
+    tl = _Timeline(snapshot, track_ids)
+    tl.start[tl.selected & (tl.start >= at - EPSILON)] += duration
+    return tl.commit()
+
+
+def ripple_delete(snapshot: Dict, start: float, end: float,
+                  track_ids: Optional[Iterable[str]] = None) -> Tuple[Dict, int]:
+    """删除 [start, end) 并把后续元素前移 end - start
+
+    完全落在区间内的元素被移除；头部落在区间内的元素裁掉头部 (trimStart 增加)；
+    尾部落在区间内或横跨整个区间的元素裁掉相应长度 (trimEnd 增加)。
+    """
+    if end <= start:
+        raise ValueError("end must be greater than start")
+    gap = end - start
+    tl = _Timeline(snapshot, track_ids)
+    s, e, sel = tl.start, tl.end, tl.selected
+
+    inside = sel & (s >= start - EPSILON) & (e <= end + EPSILON)
+    head = sel & (s >= start - EPSILON) & (s < end - EPSILON) & (e > end + EPSILON)
+    tail = sel & (s < start - EPSILON) & (e > start + EPSILON) & (e <= end + EPSILON)
+    span = sel & (s < start - EPSILON) & (e > end + EPSILON)
+    after = sel & (s >= end - EPSILON) & ~inside
+
+    tl.trim_start[head] += end - s[head]
+    tl.trim_end[tail] += e[tail] - start
+    tl.trim_end[span] += gap
+    # 裁掉头部的元素从 start 开始；其余后续元素整体前移
+    s[head] = start
+    s[after] -= gap
+    return tl.commit(removed=inside)
+
+
+def ripple_delete_ranges(snapshot: Dict, ranges: Iterable[Tuple[float, float]],
+                         track_ids: Optional[Iterable[str]] = None) -> Tuple[Dict, int]:
+    """一次删除多个互不重叠的区间并前移后续元素，结果与依次 (从后往前) 调用 ripple_delete 相同
+
+    时间 t 映射为 t - removed(t)，removed(t) 为 t 之前被删除的总时长 (前缀和 + searchsorted)。
+    起点落在区间内的元素裁掉头部，其余被删除的部分从尾部裁掉；可见部分全部被删除的元素被移除。
+    """
+    merged = []
+    for a, b in sorted((float(a), float(b)) for a, b in ranges if b - a > EPSILON):
+        if merged and a <= merged[-1][1] + EPSILON:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    tl = _Timeline(snapshot, track_ids)
+    if not merged:
+        return tl.commit()
+    gap_start, gap_end = np.array(merged).T
+    gap_len = gap_end - gap_start
+    before = np.concatenate([[0.0], np.cumsum(gap_len)])
+
+    def removed(t):
+        k = np.searchsorted(gap_start, t + EPSILON, side="right")
+        prev = np.maximum(k - 1, 0)
+        partial = np.where(k > 0, np.clip(t - gap_start[prev], 0, gap_len[prev]), 0.0)
+        return before[k - (k > 0)] + partial, k - 1
+
+    s, e, sel = tl.start, tl.end, tl.selected
+    removed_s, k = removed(s)
+    removed_e, _ = removed(e)
+    cut = removed_e - removed_s
+    # 起点所在区间覆盖的头部
+    in_gap = (k >= 0) & (s < gap_end[np.maximum(k, 0)] - EPSILON)
+    head = np.where(in_gap, np.minimum(gap_end[np.maximum(k, 0)], e) - s, 0.0)
+
+    gone = sel & (cut > EPSILON) & (e - s - cut <= EPSILON)
+    moved = sel & ~gone
+    tl.trim_start[moved] += head[moved]
+    tl.trim_end[moved] += (cut - head)[moved]
+    s[moved] -= removed_s[moved]
+    return tl.commit(removed=gone)
+
+
+def shift(snapshot: Dict, start: float, end: float, delta: float,
+          track_ids: Optional[Iterable[str]] = None) -> Tuple[Dict, int]:
+    """把起点落在 [start, end) 内的元素平移 delta 秒 (不做涟漪，可能与相邻元素重叠)"""
+    tl = _Timeline(snapshot, track_ids)
+    mask = tl.selected & (tl.start >= start - EPSILON) & (tl.start < end - EPSILON)
+    moved = tl.start[mask] + delta
+    if (moved < -EPSILON).any():
+        raise ValueError("shift would move elements before 0s")
+    tl.start[mask] = np.maximum(moved, 0)
+    return tl.commit()
+
+
+def split_element(snapshot: Dict, element_id: str, cuts: Iterable[float]) -> Tuple[Dict, List[Dict]]:
+    """在素材时间 cuts (秒，与 trimStart 同一时间轴) 处把元素切成相邻的多段
+
+    只使用落在可见部分 (trimStart, duration - trimEnd) 内的切点。第一段沿用原元素 id，
+    其余各段使用新 id，各段按顺序替换原元素。返回 (新快照, 各段元素)；没有有效切点时返回原快照。
+    """
+    tracks = snapshot.get("tracks", [])
+    for t, track in enumerate(tracks):
+        elements = track.get("elements", [])
+        index = next((i for i, el in enumerate(elements) if el.get("id") == element_id), None)
+        if index is not None:
+            break
+    else:
+        raise ValueError(f"element not found: {element_id}")
+
+    element = elements[index]
+    duration = float(element.get("duration") or 0)
+    trim_start = float(element.get("trimStart") or 0)
+    source_end = duration - float(element.get("trimEnd") or 0)
+    points = sorted({round(float(c), DECIMALS) for c in cuts
+                     if trim_start + EPSILON < c < source_end - EPSILON})
+    if not points:
+        return snapshot, [element]
+
+    def number(value):
+        value = round(value, DECIMALS)
+        return int(value) if value.is_integer() else value
+
+    start = float(element.get("startTime") or 0)
+    bounds = [trim_start] + points + [source_end]
+    pieces = []
+    for n, (a, b) in enumerate(zip(bounds[:-1], bounds[1:])):
+        pieces.append({
+            **element,
+            "id": element_id if n == 0 else str(uuid.uuid4()),
+            "startTime": number(start + a - trim_start),
+            "trimStart": number(a),
+            "trimEnd": number(duration - b),
+        })
+    new_tracks = list(tracks)
+    new_tracks[t] = {**track, "elements": elements[:index] + pieces + elements[index + 1:]}
+    return {**snapshot, "tracks": new_tracks}, pieces
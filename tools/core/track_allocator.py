@@ -0,0 +1,144 @@
+"""
+Track Allocator - 按区间划分为新元素分配轨道
+
+每条候选轨道维护一个区间索引 (已占用时段合并后的有序不相交区间，时间为整数帧)，
+空闲检查和插入都是二分查找。新元素按起点排序后贪心放入列表中最靠前、且该时段空闲的
+同类型轨道，都放不下时才新建轨道。批量放置时用两个堆扫描 (经典的区间划分):
+空闲轨道按列表顺序出堆，被本批元素占用的轨道按结束时间释放，总体 O(n log n)。
+
+SDK 的 import_media 和守护进程的 generate_tts 都通过它放置元素，不再每批新建一条轨道。
+
+用法:
+    from track_allocator import TrackAllocator
+
+    allocator = TrackAllocator(snapshot["tracks"], FrameClock.for_snapshot(snapshot))
+    track = allocator.place(start=12.0, duration=3.5, track_type="audio", name="AI 语音")
+    track["elements"].append(element)       # 新建的轨道已追加到 tracks 中
+"""
+import heapq
+import uuid
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from timebase import FrameClock
+
+DEFAULT_TRACK_NAMES = {"audio": "Audio Track", "media": "Media Track", "text": "Text Track"}
+
+
+class IntervalIndex:
+    """合并后的已占用区间 [start, end)，按起点有序"""
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+
+    def is_free(self, start: int, end: int) -> bool:
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return False
+        return i + 1 >= len(self.starts) or self.starts[i + 1] >= end
+
+    def add(self, start: int, end: int):
+        if end <= start:
+            return
+        lo = bisect_right(self.starts, start)
+        if lo > 0 and self.ends[lo - 1] >= start:
+            lo -= 1
+        hi = lo
+        while hi < len(self.starts) and self.starts[hi] <= end:
+            hi += 1
+        if hi > lo:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+
+class TrackAllocator:
+    """为新元素挑选空闲轨道，必要时新建轨道"""
+
+    def __init__(self, tracks: List[Dict], clock: FrameClock = None, include_main: bool = False):
+        self.tracks = tracks
+        self.clock = clock or FrameClock()
+        self.include_main = include_main
+        self._indices: Dict[str, IntervalIndex] = {}
+
+    def _spans(self, starts, durations) -> List[Tuple[int, int]]:
+        """秒 -> 帧区间 (一次向量化换算)，零长度区间至少占一帧"""
+        starts = np.asarray(starts, dtype=np.float64)
+        begin = self.clock.to_frames(starts)
+        end = np.maximum(self.clock.to_frames(starts + np.asarray(durations, dtype=np.float64)), begin + 1)
+        return list(zip(begin.tolist(), end.tolist()))
+
+    def _index(self, track: Dict) -> IntervalIndex:
+        index = self._indices.get(track["id"])
+        if index is None:
+            index = self._indices[track["id"]] = IntervalIndex()
+            elements = track.get("elements", [])
+            spans = self._spans(
+                [el.get("startTime", 0) for el in elements],
+                [el.get("duration", 0) - el.get("trimStart", 0) - el.get("trimEnd", 0) for el in elements],
+            )
+            for start, end in sorted(spans):
+                index.add(start, end)
+        return index
+
+    def _candidates(self, track_type: str) -> List[Dict]:
+        return [t for t in self.tracks
+                if t.get("type") == track_type and (self.include_main or not t.get("isMain"))]
+
+    def place(self, start: float, duration: float, track_type: str = "media", name: str = None) -> Dict:
+        """返回能容纳 [start, start + duration) 的最靠前轨道，并登记该时段"""
+        span = self._spans([start], [duration])[0]
+        for track in self._candidates(track_type):
+            index = self._index(track)
+            if index.is_free(*span):
+                index.add(*span)
+                return track
+        track = self._new_track(track_type, name)
+        self._index(track).add(*span)
+        return track
+
+    def _new_track(self, track_type: str, name: Optional[str]) -> Dict:
+        track = {
+            "id": str(uuid.uuid4()),
+            "name": name or DEFAULT_TRACK_NAMES.get(track_type, "Track"),
+            "type": track_type,
+            "elements": [],
+            "muted": False,
+        }
+        self.tracks.append(track)
+        return track
+
+    def place_all(self, spans: Sequence[Tuple[float, float]], track_type: str = "media",
+                  name: Optional[str] = None) -> List[Dict]:
+        """批量放置 [(start, duration)]，按起点顺序贪心分配，返回与输入顺序对应的轨道"""
+        candidates = self._candidates(track_type)
+        free = list(range(len(candidates)))        # 按列表顺序的空闲轨道
+        busy: List[Tuple[int, int]] = []           # (本批元素的结束帧, 轨道序号)
+        assigned: List[Optional[Dict]] = [None] * len(spans)
+        frames = self._spans([s for s, _ in spans], [d for _, d in spans]) if spans else []
+
+        for i in sorted(range(len(spans)), key=lambda k: frames[k]):
+            start, end = frames[i]
+            while busy and busy[0][0] <= start:
+                heapq.heappush(free, heapq.heappop(busy)[1])
+            skipped, chosen = [], None
+            while free:
+                pos = heapq.heappop(free)
+                # 已有元素可能占用该时段，这种轨道暂时跳过
+                if self._index(candidates[pos]).is_free(start, end):
+                    chosen = pos
+                    break
+                skipped.append(pos)
+            for pos in skipped:
+                heapq.heappush(free, pos)
+            if chosen is None:
+                candidates.append(self._new_track(track_type, name))
+                chosen = len(candidates) - 1
+            self._index(candidates[chosen]).add(start, end)
+            heapq.heappush(busy, (end, chosen))
+            assigned[i] = candidates[chosen]
+        return assigned
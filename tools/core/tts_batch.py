@@ -0,0 +1,236 @@
+"""
+TTS Batch - 合并同音色的连续片段为一次 Edge-TTS 请求，再按 WordBoundary 拆回各段
+
+每个 edge-tts 请求都要付出建立连接和预热的延迟。长脚本逐句合成时，这部分开销会占到
+总耗时的大头。这里把连续且音色相同的片段拼成一个请求，片段之间以句末标点和换行作为
+边界标记，再用返回的 WordBoundary 时间把音频流在两段之间的停顿处切开
+(按 MP3 帧边界切分，不重新编码；各段开头保留 bit reservoir 所需的前几帧)。
+
+对齐失败（例如某段全是标点）或拆分出空段时自动回退为逐段合成，结果与逐段调用一致。
+
+用法:
+    from tts_batch import synthesize_batch
+
+    results = await synthesize_batch([("第一句", "zh-CN-YunyangNeural"), ("第二句", "zh-CN-YunyangNeural")])
+    for seg in results:
+        open(path, "wb").write(seg.audio)   # seg.duration 为秒
+"""
+import asyncio
+import bisect
+from collections import namedtuple
+from typing import List, Optional, Sequence, Tuple
+
+import edge_tts
+
+from media_duration import iter_mp3_frames
+
+# 单个请求的最大字符数，过长的请求更容易被服务端拆分或超时
+MAX_BATCH_CHARS = 1000
+# 同时进行的请求数
+MAX_CONCURRENT_REQUESTS = 4
+# edge-tts 的时间单位为 100 纳秒
+_TICKS_PER_SECOND = 10_000_000
+_SENTENCE_END = "。！？；.!?;…"
+
+# lead: 段首为保留 bit reservoir 而多带的帧的时长 (秒)，见 split_mp3
+SegmentAudio = namedtuple("SegmentAudio", "audio offset duration lead", defaults=(0.0,))
+Boundary = namedtuple("Boundary", "start end text")
+
+
+def _normalize(text: str) -> str:
+    return "".join(ch.lower() for ch in text if ch.isalnum())
+
+
+def _terminate(text: str) -> str:
+    """确保片段以句末标点结束，让合成结果在片段之间留出停顿"""
+    text = text.strip()
+    if text and text[-1] not in _SENTENCE_END:
+        text += "。" if any("一" <= ch <= "鿿" for ch in text) else "."
+    return text
+
+
+def _communicate(text: str, voice: str, rate: str, volume: str):
+    try:
+        return edge_tts.Communicate(text, voice, rate=rate, volume=volume, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 没有 boundary 参数，默认即输出 WordBoundary
+        return edge_tts.Communicate(text, voice, rate=rate, volume=volume)
+
+
+async def stream_speech(text: str, voice: str, rate: str = "+0%", volume: str = "+0%") -> Tuple[bytes, List[Boundary]]:
+    """合成一段文本，返回 (MP3 数据, 词边界列表)"""
+    audio = bytearray()
+    boundaries = []
+    async for chunk in _communicate(text, voice, rate, volume).stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+        elif chunk["type"] == "WordBoundary":
+            start = chunk["offset"] / _TICKS_PER_SECOND
+            boundaries.append(Boundary(start, start + chunk["duration"] / _TICKS_PER_SECOND, chunk["text"]))
+    return bytes(audio), boundaries
+
+
+def align_boundaries(texts: Sequence[str], boundaries: Sequence[Boundary]) -> Optional[List[Tuple[float, float]]]:
+    """把词边界归属到各片段，返回每段 (首词开始, 末词结束)；无法可靠对齐时返回 None"""
+    normalized = [_normalize(t) for t in texts]
+    if not all(normalized):
+        return None
+    joined = "".join(normalized)
+    ends = []
+    total = 0
+    for n in normalized:
+        total += len(n)
+        ends.append(total)
+
+    spans = [None] * len(texts)
+    pos = 0
+    for boundary in boundaries:
+        word = _normalize(boundary.text)
+        if not word:
+            continue
+        idx = joined.find(word, pos)
+        # 词必须紧接上一个词出现 (允许跳过少量未朗读的字符)
+        if idx < 0 or idx - pos > 8:
+            return None
+        seg = bisect.bisect_right(ends, idx)
+        if spans[seg] is None:
+            spans[seg] = [boundary.start, boundary.end]
+        else:
+            spans[seg][1] = boundary.end
+        pos = idx + len(word)
+
+    if any(span is None for span in spans) or len(joined) - pos > 8:
+        return None
+    return [tuple(span) for span in spans]
+
+
+def main_data_begin(audio: bytes, pos: int, frame) -> int:
+    """Layer III 帧的 main_data_begin: 该帧主数据从前面帧中回溯的字节数 (其他层为 0)"""
+    side = pos + 4 + (0 if audio[pos + 1] & 0x01 else 2)
+    if frame.layer != 3 or side + 2 > len(audio):
+        return 0
+    if frame.version == 1:
+        return (audio[side] << 1) | (audio[side + 1] >> 7)
+    return audio[side]
+
+
+def _main_data_size(audio: bytes, pos: int, frame) -> int:
+    """帧中可容纳主数据的字节数 (帧长减去帧头、CRC 和侧信息)"""
+    side_info = (17 if frame.channels == 1 else 32) if frame.version == 1 else (9 if frame.channels == 1 else 17)
+    return frame.length - 4 - (0 if audio[pos + 1] & 0x01 else 2) - side_info
+
+
+def _carrier_frames(audio: bytes, frames, first: int) -> int:
+    """first 帧的主数据回溯到的前面帧数"""
+    pos, frame = frames[first]
+    need = main_data_begin(audio, pos, frame)
+    count = 0
+    while need > 0 and first - count > 0:
+        count += 1
+        need -= _main_data_size(audio, *frames[first - count])
+    return count
+
+
+def split_mp3(audio: bytes, cut_times: Sequence[float]) -> List[SegmentAudio]:
+    """在最接近 cut_times 的帧边界切开 MP3 流，返回 len(cut_times)+1 段
+
+    Layer III 帧的主数据可以存放在前面帧的空余空间中 (bit reservoir)。第一段之外的各段开头
+    额外带上首帧 main_data_begin 回溯到的帧 (edge-tts 的 24kHz 单声道流通常为 1~2 帧，
+    每帧 24ms)，首帧因此能完整解码；这些载体帧自身的主数据不完整，解码器按静音输出，
+    且位于两段之间的停顿中。SegmentAudio.lead 为载体帧的时长，offset/duration 均包含 lead。
+    """
+    frames = list(iter_mp3_frames(audio))
+    if not frames:
+        return []
+    times = [0.0]
+    for _, frame in frames:
+        times.append(times[-1] + frame.samples / frame.sample_rate)
+
+    # 每段首帧的下标，每帧最多切一次
+    firsts = [0]
+    k = 0
+    for j in range(len(frames)):
+        if k < len(cut_times) and times[j] >= cut_times[k]:
+            firsts.append(j)
+            k += 1
+
+    pieces = []
+    bounds = firsts + [len(frames)]
+    for n, first in enumerate(firsts):
+        end = bounds[n + 1]
+        begin = first - _carrier_frames(audio, frames, first) if n else first
+        start_pos = frames[begin][0]
+        end_pos = frames[end][0] if end < len(frames) else len(audio)
+        pieces.append(SegmentAudio(audio[start_pos:end_pos], times[begin], times[end] - times[begin],
+                                   times[first] - times[begin]))
+    while len(pieces) < len(cut_times) + 1:
+        pieces.append(SegmentAudio(b"", times[-1], 0.0))
+    return pieces
+
+
+def group_segments(requests: Sequence[Tuple[str, str]], max_chars: int = MAX_BATCH_CHARS) -> List[List[int]]:
+    """把连续且音色相同的片段分组，返回每组的下标列表"""
+    groups = []
+    current, voice, chars = [], None, 0
+    for i, (text, seg_voice) in enumerate(requests):
+        if current and (seg_voice != voice or chars + len(text) > max_chars):
+            groups.append(current)
+            current, chars = [], 0
+        current.append(i)
+        voice = seg_voice
+        chars += len(text)
+    if current:
+        groups.append(current)
+    return groups
+
+
+async def _synthesize_single(text, voice, rate, volume) -> SegmentAudio:
+    audio, _ = await stream_speech(text, voice, rate, volume)
+    pieces = split_mp3(audio, [])
+    return pieces[0] if pieces else SegmentAudio(audio, 0.0, 0.0)
+
+
+async def _synthesize_group(texts, voice, rate, volume) -> List[SegmentAudio]:
+    if len(texts) == 1 or not all(_normalize(t) for t in texts):
+        # 单段或含无法对齐的片段 (如纯标点)，直接逐段合成
+        return [await _synthesize_single(t, voice, rate, volume) for t in texts]
+
+    request_text = "\n".join(_terminate(t) for t in texts)
+    audio, boundaries = await stream_speech(request_text, voice, rate, volume)
+    spans = align_boundaries(texts, boundaries)
+    if spans is None:
+        # 对齐失败，退回逐段合成
+        return [await _synthesize_single(t, voice, rate, volume) for t in texts]
+
+    # 切点取相邻两段之间停顿的中点
+    cut_times = [(spans[i][1] + spans[i + 1][0]) / 2 for i in range(len(spans) - 1)]
+    pieces = split_mp3(audio, cut_times)
+    # 音频没有可解析的帧或切出空段时，缺失的段逐段合成
+    results = []
+    for i, text in enumerate(texts):
+        piece = pieces[i] if i < len(pieces) else None
+        if piece is None or not piece.audio or piece.duration <= 0:
+            piece = await _synthesize_single(text, voice, rate, volume)
+        results.append(piece)
+    return results
+
+
+async def synthesize_batch(requests: Sequence[Tuple[str, str]], rate: str = "+0%", volume: str = "+0%",
+                           max_chars: int = MAX_BATCH_CHARS,
+                           concurrency: int = MAX_CONCURRENT_REQUESTS) -> List[SegmentAudio]:
+    """批量合成 [(text, voice), ...]，返回与输入一一对应的 SegmentAudio
+
+    SegmentAudio.offset 为该段在所属批次音频流中的起点（秒）。
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Optional[SegmentAudio]] = [None] * len(requests)
+
+    async def run(indices):
+        texts = [requests[i][0] for i in indices]
+        async with semaphore:
+            pieces = await _synthesize_group(texts, requests[indices[0]][1], rate, volume)
+        for i, piece in zip(indices, pieces):
+            results[i] = piece
+
+    await asyncio.gather(*(run(g) for g in group_segments(requests, max_chars)))
+    return results
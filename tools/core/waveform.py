@@ -0,0 +1,249 @@
+"""
+Waveform - 音频波形峰值金字塔
+
+音频按块流式读入 numpy (PCM WAV 直接读取，其它格式由 ffmpeg 解码为单声道 s16le 管道输出)，
+每 BASE_SAMPLES 个采样取一对 min/max 作为最底层，之后每层把 FACTOR 个相邻峰值合并为一个，
+共 LEVELS 层。峰值量化为 int8 (或 int16)，整座金字塔写成一个 .peaks 文件，按内容指纹缓存在
+ai_workspace/cache/waveforms/。读取时用 memmap 只取可见区间，选择不比目标精度更粗的最粗一层，
+代价与可见像素数成正比，与音频长度无关。
+
+文件格式 (小端):
+    头部     magic "AIPK", version u8, bits u8, sample_rate u32, base_samples u32,
+             factor u16, levels u16, total_samples u64
+    层表     每层 (offset u64, count u64)
+    数据     每层 count 对 [min, max]
+
+用法:
+    from waveform import build_peaks, PeakPyramid
+
+    peaks_path = build_peaks("voice.mp3")              # 已缓存时直接返回
+    mins, maxs = PeakPyramid(peaks_path).read(0, 30, 1200)   # 0~30 秒画在 1200 像素内，值域 [-1, 1]
+
+    python waveform.py <files...>
+"""
+import os
+import struct
+import subprocess
+import wave
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from asset_id import content_fingerprint
+from thumbnail_service import CACHE_DIR
+
+WAVEFORM_DIR = os.path.join(CACHE_DIR, "waveforms")
+MAGIC = b"AIPK"
+VERSION = 1
+# ffmpeg 解码的采样率 (PCM WAV 保留原采样率)
+SAMPLE_RATE = 48000
+# 最底层每个峰值覆盖的采样数，以及相邻两层的倍数
+BASE_SAMPLES = 256
+FACTOR = 4
+LEVELS = 6
+# 每次读取的采样数 (BASE_SAMPLES 的整数倍)
+BLOCK_SAMPLES = BASE_SAMPLES * 4096
+
+_HEADER = struct.Struct("<4sBBIIHHQ")
+_LEVEL = struct.Struct("<QQ")
+
+
+def _wav_blocks(path: str) -> Optional[Tuple[int, Iterator[np.ndarray]]]:
+    """16 位 PCM WAV 直接读取，返回 (采样率, 单声道 int16 块)；其它格式返回 None"""
+    try:
+        reader = wave.open(path, "rb")
+    except (wave.Error, EOFError, OSError):
+        return None
+    if reader.getsampwidth() != 2:
+        reader.close()
+        return None
+    channels = reader.getnchannels()
+
+    def blocks():
+        with reader:
+            while True:
+                data = reader.readframes(BLOCK_SAMPLES)
+                if not data:
+                    return
+                samples = np.frombuffer(data, dtype="<i2")
+                if channels > 1:
+                    # 按声道列累加 (int32)，比 mean(axis=1) 的 float64 归约快得多
+                    frames = samples.reshape(-1, channels)
+                    mixed = frames[:, 0].astype(np.int32)
+                    for c in range(1, channels):
+                        mixed += frames[:, c]
+                    samples = (mixed // channels).astype(np.int16)
+                yield samples
+
+    return reader.getframerate(), blocks()
+
+
+def _ffmpeg_blocks(path: str, sample_rate: int) -> Iterator[np.ndarray]:
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(sample_rate),
+           "-f", "s16le", "-acodec", "pcm_s16le", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            data = proc.stdout.read(BLOCK_SAMPLES * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def audio_blocks(path: str, sample_rate: int = SAMPLE_RATE) -> Tuple[int, Iterator[np.ndarray]]:
+    """流式读取单声道 int16 采样块，返回 (采样率, 块迭代器)
+
+    16 位 PCM WAV 保留原采样率直接读取，其它格式由 ffmpeg 解码为 sample_rate。
+    """
+    wav = _wav_blocks(path)
+    return wav if wav else (sample_rate, _ffmpeg_blocks(path, sample_rate))
+
+
+def _reduce(mins: np.ndarray, maxs: np.ndarray, factor: int) -> Tuple[np.ndarray, np.ndarray]:
+    """把每 factor 个相邻峰值合并为一个 (末尾不足的部分单独成一个)"""
+    n = len(mins)
+    if n == 0:
+        return mins, maxs
+    starts = np.arange(0, n, factor)
+    return np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+
+
+def compute_pyramid(blocks, base_samples: int = BASE_SAMPLES, factor: int = FACTOR,
+                    levels: int = LEVELS) -> Tuple[List[Tuple[np.ndarray, np.ndarray]], int]:
+    """流式计算峰值金字塔，返回 ([(mins, maxs) 每层 int16], 总采样数)"""
+    base_min, base_max = [], []
+    carry = np.zeros(0, dtype=np.int16)
+    total = 0
+    for block in blocks:
+        total += len(block)
+        samples = np.concatenate([carry, block]) if len(carry) else block
+        whole = len(samples) // base_samples * base_samples
+        if whole:
+            frames = samples[:whole].reshape(-1, base_samples)
+            base_min.append(frames.min(axis=1))
+            base_max.append(frames.max(axis=1))
+        carry = samples[whole:]
+    if len(carry):
+        base_min.append(carry.min(keepdims=True))
+        base_max.append(carry.max(keepdims=True))
+
+    mins = np.concatenate(base_min) if base_min else np.zeros(0, dtype=np.int16)
+    maxs = np.concatenate(base_max) if base_max else np.zeros(0, dtype=np.int16)
+    pyramid = [(mins, maxs)]
+    for _ in range(1, levels):
+        mins, maxs = _reduce(mins, maxs, factor)
+        pyramid.append((mins, maxs))
+    return pyramid, total
+
+
+def write_peaks(out_path: str, pyramid, total: int, sample_rate: int, bits: int = 8,
+                base_samples: int = BASE_SAMPLES, factor: int = FACTOR):
+    dtype = np.dtype("<i1") if bits == 8 else np.dtype("<i2")
+    shift = 16 - bits
+    header_size = _HEADER.size + _LEVEL.size * len(pyramid)
+    table, chunks, offset = [], [], header_size
+    for mins, maxs in pyramid:
+        pairs = np.empty((len(mins), 2), dtype=dtype)
+        pairs[:, 0] = mins >> shift
+        pairs[:, 1] = maxs >> shift
+        table.append(_LEVEL.pack(offset, len(mins)))
+        chunks.append(pairs.tobytes())
+        offset += pairs.nbytes
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, bits, sample_rate, base_samples, factor, len(pyramid), total))
+        f.write(b"".join(table))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp_path, out_path)
+
+
+def peaks_path_for(path: str, cache_dir: str = WAVEFORM_DIR) -> str:
+    return os.path.join(cache_dir, f"{content_fingerprint(path)}.peaks")
+
+
+def build_peaks(path: str, cache_dir: str = WAVEFORM_DIR, bits: int = 8) -> Optional[str]:
+    """生成 (或直接返回已缓存的) 峰值文件路径，解码失败时返回 None"""
+    out_path = peaks_path_for(path, cache_dir)
+    if os.path.exists(out_path):
+        return out_path
+    sample_rate, blocks = audio_blocks(path)
+    try:
+        pyramid, total = compute_pyramid(blocks)
+    except OSError:
+        return None
+    if total == 0:
+        return None
+    os.makedirs(cache_dir, exist_ok=True)
+    write_peaks(out_path, pyramid, total, sample_rate, bits)
+    return out_path
+
+
+class PeakPyramid:
+    """只读打开 .peaks 文件，各层以 memmap 访问"""
+
+    def __init__(self, peaks_path: str):
+        with open(peaks_path, "rb") as f:
+            head = f.read(_HEADER.size)
+            magic, version, bits, self.sample_rate, self.base_samples, self.factor, levels, self.total_samples = \
+                _HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a waveform peaks file: {peaks_path}")
+            table = [_LEVEL.unpack(f.read(_LEVEL.size)) for _ in range(levels)]
+        dtype = np.dtype("<i1") if bits == 8 else np.dtype("<i2")
+        self.scale = float((1 << (bits - 1)) - 1)
+        self.levels = [
+            np.memmap(peaks_path, dtype=dtype, mode="r", offset=offset, shape=(count, 2)) if count else
+            np.zeros((0, 2), dtype=dtype)
+            for offset, count in table
+        ]
+        self.level_samples = [self.base_samples * self.factor ** i for i in range(levels)]
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    def read(self, start: float, end: float, pixels: int) -> Tuple[np.ndarray, np.ndarray]:
+        """[start, end) 秒内每个像素的 (min, max)，值域 [-1, 1]"""
+        pixels = max(1, int(pixels))
+        first, last = start * self.sample_rate, min(end, self.duration) * self.sample_rate
+        if last <= first:
+            return np.zeros(pixels), np.zeros(pixels)
+        wanted = (last - first) / pixels
+        # 不比一个像素更粗的最粗一层
+        level = max((i for i, n in enumerate(self.level_samples) if n <= wanted), default=0)
+        step = self.level_samples[level]
+        lo, hi = int(first // step), int(-(-last // step))
+        peaks = np.asarray(self.levels[level][lo:hi], dtype=np.float64)
+        n = len(peaks)
+        if n == 0:
+            return np.zeros(pixels), np.zeros(pixels)
+        if n >= pixels:
+            edges = np.linspace(0, n, pixels + 1).astype(np.int64)[:-1]
+            mins, maxs = np.minimum.reduceat(peaks[:, 0], edges), np.maximum.reduceat(peaks[:, 1], edges)
+        else:
+            index = np.arange(pixels) * n // pixels
+            mins, maxs = peaks[index, 0], peaks[index, 1]
+        return mins / self.scale, maxs / self.scale
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python waveform.py <files...>")
+        sys.exit(1)
+    for file_path in sys.argv[1:]:
+        t0 = time.perf_counter()
+        result = build_peaks(file_path)
+        if result is None:
+            print(f"FAILED  {file_path}")
+            continue
+        pyramid = PeakPyramid(result)
+        print(f"{result}  {pyramid.duration:.2f}s  {os.path.getsize(result)} bytes  "
+              f"{time.perf_counter() - t0:.2f}s  {file_path}")
@@ -2,9 +2,11 @@ import asyncio
 import edge_tts
 import os
 import json
-from pydub import AudioSegment
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from media_duration import get_media_duration
+
 # 默认设置
 VOICE = "zh-CN-YunyangNeural"
 
@@ -13,11 +15,7 @@ async def generate_voice(text, output_file, voice_name):
     await communicate.save(output_file)
 
 def get_audio_duration(file_path):
-    try:
-        audio = AudioSegment.from_file(file_path)
-        return len(audio) / 1000.0
-    except:
-        return 0
+    return get_media_duration(file_path) or 0
 
 async def main():
     # 参数解析: python gen_promo_voice.py <project_id> <comma_separated_texts> <voice>
@@ -5,7 +5,10 @@ import asyncio
 import edge_tts
 import os
 import json
-from pydub import AudioSegment
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from media_duration import get_media_duration
 
 OUTPUT_DIR = "remotion-studio/public/assets/projects/future_city/audio/segments"
 VOICE = "zh-CN-YunyangNeural"
@@ -26,11 +29,7 @@ async def generate_voice(text, output_file):
     await communicate.save(output_file)
 
 def get_audio_duration(file_path):
-    try:
-        audio = AudioSegment.from_file(file_path)
-        return len(audio) / 1000.0
-    except:
-        return 0
+    return get_media_duration(file_path) or 0
 
 def generate_srt_time(seconds):
     millis = int((seconds * 1000) % 1000)
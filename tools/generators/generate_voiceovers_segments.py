@@ -1,8 +1,11 @@
 import asyncio
-import edge_tts
 import os
+import sys
 import json
-from pydub import AudioSegment
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from subtitle_io import Cue, write_subtitles
+from tts_batch import synthesize_batch
 
 # Configuration
 OUTPUT_DIR = "remotion-studio/public/assets/projects/demo/audio/segments"
@@ -17,45 +20,28 @@ TEXT_SEGMENTS = [
     "只需给我一个想法，剩下的交给我。"
 ]
 
-async def generate_voice(text, output_file, voice, rate, volume):
-    communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume)
-    await communicate.save(output_file)
-
-def get_audio_duration(file_path):
-    try:
-        audio = AudioSegment.from_file(file_path)
-        return len(audio) / 1000.0
-    except Exception as e:
-        print(f"Error reading audio duration for {file_path}: {e}")
-        return 0
-
-def generate_srt_time(seconds):
-    millis = int((seconds * 1000) % 1000)
-    seconds = int(seconds)
-    minutes = int(seconds / 60)
-    hours = int(minutes / 60)
-    seconds = seconds % 60
-    minutes = minutes % 60
-    return f"{hours:02}:{minutes:02}:{seconds:02},{millis:03}"
-
 async def main():
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     segments_info = []
     current_time = 0.5  # Add 0.5s delay to fix browser autoplay mute issue
     Gap = 0.0  # Tight pacing
 
-    srt_content = ""
+    srt_cues = []
     print(f"Generating {len(TEXT_SEGMENTS)} segments info (Skip audio generation)...")
 
-    for i, text in enumerate(TEXT_SEGMENTS):
+    # 同一音色的所有片段合并为一次请求，按词边界拆回各段
+    pieces = await synthesize_batch([(text, VOICE) for text in TEXT_SEGMENTS], rate=RATE, volume=VOLUME)
+
+    for i, (text, piece) in enumerate(zip(TEXT_SEGMENTS, pieces)):
         seg_id = f"s{i+1:02d}"
         filename = f"{seg_id}.mp3"
         filepath = os.path.join(OUTPUT_DIR, filename)
         
         # Only regenerate if text changed? No, user wants regen.
-        await generate_voice(text, filepath, VOICE, RATE, VOLUME)
+        with open(filepath, "wb") as f:
+            f.write(piece.audio)
         
-        duration = get_audio_duration(filepath)
+        duration = piece.duration
         start_time = current_time
         end_time = start_time + duration
         
@@ -71,7 +57,7 @@ async def main():
         })
 
         clean_text = text.strip("，。？：！")
-        srt_content += f"{i+1}\n{generate_srt_time(start_time)} --> {generate_srt_time(end_time)}\n{clean_text}\n\n"
+        srt_cues.append(Cue(start_time, end_time, clean_text))
         
         current_time = end_time + Gap
 
@@ -79,8 +65,7 @@ async def main():
     with open(os.path.join(OUTPUT_DIR, "segments_info.json"), "w", encoding="utf-8") as f:
         json.dump(segments_info, f, ensure_ascii=False, indent=4)
         
-    with open("remotion-studio/src/projects/demo_subtitles.srt", "w", encoding="utf-8") as f:
-        f.write(srt_content)
+    write_subtitles("remotion-studio/src/projects/demo_subtitles.srt", srt_cues)
 
     print(f"\nTotal Duration: {current_time:.2f}s")
 
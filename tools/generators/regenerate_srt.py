@@ -2,35 +2,22 @@
 仅重新生成 SRT 字幕文件(去除标点)
 """
 
+import os
+import sys
 import json
 from pathlib import Path
 
-def format_srt_time(seconds: float) -> str:
-    """格式化时间为 SRT 格式 (HH:MM:SS,mmm)"""
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
-    millis = int((seconds % 1) * 1000)
-    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from subtitle_io import Cue, write_subtitles
 
 def generate_srt(segments_info: list, output_path: Path):
     """生成 SRT 字幕文件"""
-    srt_content = []
-    
-    for i, info in enumerate(segments_info, 1):
-        start_time = format_srt_time(info['start'])
-        end_time = format_srt_time(info['end'])
-        
-        # 去除文本末尾的标点符号
-        text = info['text'].rstrip('，。！？、；：')
-        
-        srt_content.append(f"{i}")
-        srt_content.append(f"{start_time} --> {end_time}")
-        srt_content.append(text)
-        srt_content.append("")  # 空行
-    
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(srt_content))
+    # 去除文本末尾的标点符号
+    cues = (
+        Cue(info['start'], info['end'], info['text'].rstrip('，。！？、；：'))
+        for info in segments_info
+    )
+    write_subtitles(str(output_path), cues, fmt="srt")
     
     print(f"✅ SRT 字幕已生成: {output_path}")
 
@@ -1,42 +1,48 @@
+"""
+Reconcile public/materials with snapshot["assets"].
+
+Each file's hash, duration, dimensions and thumbnail are cached in a manifest keyed by
+(path, size, mtime). Unchanged files are skipped; new or changed files are processed in
+a process pool. Results are merged into the existing asset list (assets outside the
+materials folder are left alone, assets whose file disappeared are dropped).
+
+With --skip-duplicates, new files that are perceptual near-duplicates of an asset already
+in the snapshot (or of another new file) are not added; see core/perceptual_hash.py.
+
+Usage:
+    python reconcile_with_thumbnails.py [--skip-duplicates]
+"""
 import json
 import os
-import uuid
+import sys
+import time
 import cv2
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 import numpy as np
-import hashlib
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from asset_id import asset_id_for
+from media_duration import get_media_duration
+from perceptual_hash import DuplicateFinder, PerceptualIndex
+from snapshot_store import read_snapshot, write_snapshot
 
 # Paths
-SNAPSHOT_PATH = r"f:\桌面\开发\AIcut\ai_workspace\project-snapshot.json"
-BASE_MATERIALS_DIR = r"f:\桌面\开发\AIcut\AIcut-Studio\apps\web\public\materials"
+PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+BASE_MATERIALS_DIR = os.path.join(PROJECT_ROOT, "AIcut-Studio", "apps", "web", "public", "materials")
 THUMBNAILS_DIR = os.path.join(BASE_MATERIALS_DIR, "_thumbnails")
+# Cache of per-file results, keyed by path relative to the materials dir
+MANIFEST_PATH = os.path.join(THUMBNAILS_DIR, "manifest.json")
+MANIFEST_VERSION = 1
+MAX_WORKERS = min(8, os.cpu_count() or 1)
 
 # Ensure thumbnails directory exists
 if not os.path.exists(THUMBNAILS_DIR):
     os.makedirs(THUMBNAILS_DIR)
 
 def calculate_file_hash(file_path):
-    """Generates a stable ID based on file metadata and content head."""
-    try:
-        stat = os.stat(file_path)
-        # Use size + mtime + first 1MB of content
-        hasher = hashlib.sha256()
-        hasher.update(str(stat.st_size).encode())
-        
-        # Read first 1MB and last 1KB inside the same context
-        with open(file_path, "rb") as f:
-            chunk = f.read(1024 * 1024)
-            hasher.update(chunk)
-            
-            # Optional: Read last 1KB (end of file)
-            if stat.st_size > 1024 * 1024:
-                f.seek(-1024, 2)
-                hasher.update(f.read())
-            
-        return "h_" + hasher.hexdigest()[:12]
-    except Exception as e:
-        print(f"Hashing error for {file_path}: {e}")
-        return "asset_" + str(uuid.uuid4())[:8]
+    """Stable asset id from the sampled content fingerprint shared by every importer."""
+    return asset_id_for(file_path)
 
 def get_asset_type(filename):
     ext = os.path.splitext(filename)[1].lower()
@@ -108,13 +114,87 @@ def generate_image_thumbnail(image_path, asset_id):
     
     return None
 
-def reconcile():
-    if not os.path.exists(SNAPSHOT_PATH):
-        print(f"Snapshot not found at {SNAPSHOT_PATH}")
-        return
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "files": {}}
+
+def save_manifest(manifest):
+    tmp_path = MANIFEST_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, MANIFEST_PATH)
+
+def scan_materials(base_dir):
+    """Yield (relative path, size, mtime_ns) for every material file; DirEntry stats are cached."""
+    stack = [base_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.name.startswith('.'): continue
+            if entry.is_dir(follow_symlinks=True):
+                if entry.name != "_thumbnails":
+                    stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=True):
+                st = entry.stat()
+                yield os.path.relpath(entry.path, base_dir).replace("\\", "/"), st.st_size, st.st_mtime_ns
+
+def probe_file(full_path, asset_type, asset_id):
+    """Worker: hash (if no fixed id), duration, dimensions and thumbnail for one file."""
+    info = {"id": asset_id or calculate_file_hash(full_path)}
+    if asset_type == 'video':
+        thumb_url = generate_video_thumbnail(full_path, info["id"])
+        if thumb_url: info['thumbnailUrl'] = thumb_url
+        try:
+            cap = cv2.VideoCapture(full_path)
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if fps > 0:
+                info['duration'] = frame_count / fps
+            info['width'] = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
+            info['height'] = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
+            cap.release()
+        except: pass
+    elif asset_type == 'image':
+        thumb_url = generate_image_thumbnail(full_path, info["id"])
+        if thumb_url: info['thumbnailUrl'] = thumb_url
+        try:
+            with Image.open(full_path) as img:
+                info['width'], info['height'] = img.size
+        except Exception: pass
+    elif asset_type == 'audio':
+        duration = get_media_duration(full_path)
+        if duration: info['duration'] = duration
+    return {k: v for k, v in info.items() if v is not None}
 
-    with open(SNAPSHOT_PATH, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+def find_new_duplicates(scanned, assets):
+    """File paths of new assets that duplicate an existing asset or an earlier new one."""
+    known = {a.get("id") for a in assets} | {a.get("filePath") for a in assets}
+    is_new = lambda path: path not in known and scanned[path]["id"] not in known
+    index = PerceptualIndex()
+    signatures = index.update(scanned)
+    index.save()
+    duplicates = set()
+    for group in DuplicateFinder(signatures).clusters():
+        # Prefer keeping a member that is already in the snapshot
+        keeper = next((p for p in group if not is_new(p)), group[0])
+        duplicates.update(p for p in group if p != keeper and is_new(p))
+    return duplicates
+
+def reconcile(skip_duplicates=False):
+    data = read_snapshot()
+    if data is None:
+        print("Workspace snapshot not found")
+        return
 
     # Key config for mapping
     mapping = {
@@ -130,64 +210,87 @@ def reconcile():
         "AI还原纪录片.MP3": {"name": "还原纪录片音频", "id": "asset_documentary_aud"},
     }
 
-    new_assets = []
-    
-    print("Scanning materials and generating thumbnails...")
-    for root, dirs, files in os.walk(BASE_MATERIALS_DIR):
-        # Skip the thumbnails dir itself
-        if "_thumbnails" in root: continue
-        
-        for filename in files:
-            if filename.startswith('.'): continue
-            
-            full_path = os.path.join(root, filename)
-            url_path = "/materials" + full_path.split("public\\materials")[1].replace("\\", "/")
-            asset_type = get_asset_type(filename)
-            
-            # Determine ID based on Content Hash
-            if filename in mapping:
-                asset_id = mapping[filename]['id']
-                asset_name = mapping[filename]['name']
-            else:
-                asset_id = calculate_file_hash(full_path)
-                asset_name = filename
-            
-            asset = {
-                "id": asset_id,
-                "name": asset_name,
-                "type": asset_type,
-                "url": url_path,
-                "filePath": full_path,
-                "isLinked": True
-            }
-
-            # Generate Thumbnails
-            if asset_type == 'video':
-                thumb_url = generate_video_thumbnail(full_path, asset_id)
-                if thumb_url: asset['thumbnailUrl'] = thumb_url
-                
-                # Get video duration (optional but helpful)
+    started = time.perf_counter()
+    manifest = load_manifest()
+    cached = manifest["files"]
+    files = {}
+    pending = []
+    for rel_path, size, mtime in scan_materials(BASE_MATERIALS_DIR):
+        entry = cached.get(rel_path)
+        if entry and entry["size"] == size and entry["mtime"] == mtime:
+            files[rel_path] = entry
+        else:
+            files[rel_path] = {"size": size, "mtime": mtime}
+            pending.append(rel_path)
+
+    print(f"Scanned {len(files)} files, {len(pending)} new or changed")
+    if pending:
+        with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {}
+            for rel_path in pending:
+                filename = os.path.basename(rel_path)
+                full_path = os.path.join(BASE_MATERIALS_DIR, rel_path)
+                fixed_id = mapping.get(filename, {}).get("id")
+                futures[rel_path] = pool.submit(probe_file, full_path, get_asset_type(filename), fixed_id)
+            for rel_path, future in futures.items():
                 try:
-                    cap = cv2.VideoCapture(full_path)
-                    fps = cap.get(cv2.CAP_PROP_FPS)
-                    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                    if fps > 0:
-                        asset['duration'] = frame_count / fps
-                    cap.release()
-                except: pass
-
-            elif asset_type == 'image':
-                thumb_url = generate_image_thumbnail(full_path, asset_id)
-                if thumb_url: asset['thumbnailUrl'] = thumb_url
-                
-            new_assets.append(asset)
-
-    data['assets'] = new_assets
-
-    with open(SNAPSHOT_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-    
-    print(f"Reconciliation successful. Total assets: {len(new_assets)}")
+                    files[rel_path]["info"] = future.result()
+                except Exception as e:
+                    print(f"Failed to process {rel_path}: {e}")
+                    # Stable content id so the asset keeps its identity; retried on the next run
+                    fixed_id = mapping.get(os.path.basename(rel_path), {}).get("id")
+                    full_path = os.path.join(BASE_MATERIALS_DIR, rel_path)
+                    files[rel_path]["info"] = {"id": fixed_id or asset_id_for(full_path)}
+                    files[rel_path]["failed"] = True
+
+    # Failed entries are not cached, so they are probed again even if size and mtime are unchanged
+    manifest["files"] = {rel_path: entry for rel_path, entry in files.items() if not entry.get("failed")}
+    save_manifest(manifest)
+
+    # Merge into the existing asset list: update by filePath or id, append new ones,
+    # drop assets whose material file is gone and keep everything else untouched.
+    scanned = {}
+    for rel_path, entry in files.items():
+        filename = os.path.basename(rel_path)
+        full_path = os.path.join(BASE_MATERIALS_DIR, rel_path)
+        asset = {
+            "id": entry["info"]["id"],
+            "name": mapping.get(filename, {}).get("name", filename),
+            "type": get_asset_type(filename),
+            "url": "/materials/" + rel_path,
+            "filePath": full_path,
+            "isLinked": True,
+            **{k: v for k, v in entry["info"].items() if k != "id"},
+        }
+        scanned[full_path] = asset
+
+    duplicates = find_new_duplicates(scanned, data.get("assets", [])) if skip_duplicates else set()
+    for full_path in duplicates:
+        del scanned[full_path]
+
+    materials_prefix = os.path.join(BASE_MATERIALS_DIR, "")
+    by_id = {asset["id"]: asset for asset in scanned.values()}
+    merged, seen = [], set()
+    for asset in data.get("assets", []):
+        match = scanned.get(asset.get("filePath")) or by_id.get(asset.get("id"))
+        if match:
+            if match["id"] not in seen:
+                # Keep the id already in the snapshot so timeline elements stay linked
+                merged.append({**asset, **match, "id": asset.get("id", match["id"])})
+                seen.add(match["id"])
+        elif not str(asset.get("filePath", "")).startswith(materials_prefix):
+            merged.append(asset)
+    merged.extend(asset for asset in scanned.values() if asset["id"] not in seen)
+
+    existing_ids = {asset.get("id") for asset in data.get("assets", [])}
+    added = sum(1 for asset in scanned.values() if asset["id"] not in existing_ids)
+    data['assets'] = merged
+    write_snapshot(data)
+
+    print(f"Reconciliation successful. Total assets: {len(merged)} ({added} new) "
+          f"in {time.perf_counter() - started:.2f}s")
+    if duplicates:
+        print(f"Skipped {len(duplicates)} near-duplicate files")
 
 if __name__ == "__main__":
-    reconcile()
+    reconcile(skip_duplicates="--skip-duplicates" in sys.argv[1:])
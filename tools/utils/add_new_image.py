@@ -1,8 +1,12 @@
 import json
 import requests
 import os
+import sys
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from asset_id import asset_id_for
+
 # 配置
 API_URL = "http://localhost:3000/api/ai-edit"
 SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "../ai_workspace/project-snapshot.json")
@@ -27,14 +31,14 @@ def add_image_to_timeline():
     tracks = snapshot.get("tracks", [])
     
     # 1. 注册新素材 (Assets Registration)
-    # 检查是否已存在
-    existing_asset = next((a for a in assets if a["name"] == NEW_IMAGE_NAME), None)
+    # 检查是否已存在 (按内容指纹 id，与 SDK / reconcile 使用同一方案)
+    new_asset_id = asset_id_for(NEW_IMAGE_PATH)
+    existing_asset = next((a for a in assets if a["id"] == new_asset_id or a.get("filePath") == NEW_IMAGE_PATH), None)
     
     if existing_asset:
         new_asset_id = existing_asset["id"]
         print(f"Asset already exists: {new_asset_id}")
     else:
-        new_asset_id = f"asset_gen_{int(time.time())}"
         new_asset = {
             "id": new_asset_id,
             "name": NEW_IMAGE_NAME,
@@ -0,0 +1,140 @@
+"""
+按感知哈希查找素材目录中的重复/近似重复图片与视频，并可合并或删除
+
+默认只打印分组。--merge 把快照中引用重复素材的元素改为引用每组保留的素材并删除其余素材记录，
+--delete 删除每组中未保留、且当前工作区和 projects/ 下任何项目快照都不再引用的文件。
+每组保留已在快照中被时间轴引用的文件，否则保留最早的文件。
+
+用法:
+    python dedupe_materials.py [--radius 8] [--merge] [--delete] [dirs...]
+"""
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "core"))
+from asset_id import asset_id_for
+from perceptual_hash import PHASH_RADIUS, DuplicateFinder, PerceptualIndex, collect_files
+from snapshot_store import read_snapshot, write_snapshot
+from thumbnail_service import serve_url, thumbnail_url
+
+PROJECT_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+PROJECTS_DIR = os.path.join(PROJECT_ROOT, "projects")
+DEFAULT_DIRS = [
+    os.path.join(PROJECT_ROOT, "AIcut-Studio", "apps", "web", "public", "materials"),
+    PROJECTS_DIR,
+]
+
+
+def project_snapshots():
+    """projects/<名称>/snapshot.json 中归档的各项目快照"""
+    if not os.path.isdir(PROJECTS_DIR):
+        return
+    for name in sorted(os.listdir(PROJECTS_DIR)):
+        path = os.path.join(PROJECTS_DIR, name, "snapshot.json")
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read {path}: {e}")
+
+
+def referenced_paths(snapshots):
+    """所有快照中素材引用的文件路径"""
+    return {os.path.abspath(a["filePath"]) for snapshot in snapshots
+            for a in snapshot.get("assets", []) if a.get("filePath")}
+
+
+def pick_keeper(group, used_paths):
+    """优先保留时间轴正在使用的文件，其次保留修改时间最早的文件"""
+    used = [p for p in group if p in used_paths]
+    return used[0] if used else min(group, key=lambda p: (os.path.getmtime(p), p))
+
+
+def merge_into_snapshot(snapshot, replacements):
+    """replacements: {重复文件路径: 保留文件路径}；返回 (改写的元素数, 删除的素材数)"""
+    assets = snapshot.get("assets", [])
+    by_path = {a.get("filePath"): a for a in assets if a.get("filePath")}
+    id_map, dropped = {}, set()
+    for dup_path, keep_path in replacements.items():
+        dup, keep = by_path.get(dup_path), by_path.get(keep_path)
+        if dup and keep and dup["id"] != keep["id"]:
+            id_map[dup["id"]] = keep["id"]
+            dropped.add(dup["id"])
+        elif dup and not keep:
+            # 保留的文件不在快照中: 该素材改指向保留的文件，id 和缩略图按新文件重新生成
+            new_id = asset_id_for(keep_path)
+            id_map[dup["id"]] = new_id
+            dup.update({
+                "id": new_id,
+                "filePath": keep_path,
+                "url": serve_url(keep_path),
+                "thumbnailUrl": (thumbnail_url(keep_path) if dup.get("type") == "video" else None)
+                or serve_url(keep_path),
+            })
+            by_path[keep_path] = dup
+
+    relinked = 0
+    for track in snapshot.get("tracks", []):
+        for el in track.get("elements", []):
+            if el.get("mediaId") in id_map:
+                el["mediaId"] = id_map[el["mediaId"]]
+                relinked += 1
+    snapshot["assets"] = [a for a in assets if a.get("id") not in dropped]
+    return relinked, len(assets) - len(snapshot["assets"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate materials.")
+    parser.add_argument("dirs", nargs="*", default=DEFAULT_DIRS)
+    parser.add_argument("--radius", type=int, default=PHASH_RADIUS, help="max pHash distance (bits)")
+    parser.add_argument("--merge", action="store_true", help="relink timeline elements and drop duplicate assets")
+    parser.add_argument("--delete", action="store_true", help="delete duplicate files that were not kept")
+    args = parser.parse_args()
+
+    index = PerceptualIndex()
+    signatures = index.update(collect_files(args.dirs))
+    index.save()
+    clusters = DuplicateFinder(signatures, args.radius).clusters()
+
+    snapshot = read_snapshot() or {}
+    media_ids = {el.get("mediaId") for t in snapshot.get("tracks", []) for el in t.get("elements", [])}
+    used_paths = {a.get("filePath") for a in snapshot.get("assets", []) if a.get("id") in media_ids}
+
+    replacements = {}
+    for n, group in enumerate(clusters, 1):
+        keeper = pick_keeper(group, used_paths)
+        print(f"[{n}] keep {keeper}")
+        for path in group:
+            if path != keeper:
+                print(f"      dup  {path}")
+                replacements[path] = keeper
+    print(f"{len(signatures)} files, {len(clusters)} groups, {len(replacements)} duplicates")
+
+    if args.merge and replacements and snapshot:
+        relinked, removed = merge_into_snapshot(snapshot, replacements)
+        write_snapshot(snapshot)
+        print(f"Merged: {relinked} elements relinked, {removed} assets removed")
+
+    if args.delete:
+        # 不删除当前工作区或任何归档项目快照仍在引用的文件
+        referenced = referenced_paths([snapshot, *project_snapshots()])
+        deleted = 0
+        for path in replacements:
+            if os.path.abspath(path) in referenced:
+                print(f"Kept {path}: still referenced by a project snapshot")
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Failed to delete {path}: {e}")
+                continue
+            deleted += 1
+        print(f"Deleted {deleted} files")
+
+
+if __name__ == "__main__":
+    main()